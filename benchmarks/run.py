@@ -0,0 +1,353 @@
+"""
+Offline benchmark for the analysis pipeline.
+
+Gemini is replaced by a scripted chat model, NewsAPI and ExchangeRate-API by a
+local HTTP stub, and Postgres by a seeded benchmark database, so runs are
+repeatable and cost nothing. Results are written to benchmarks/results/ and
+compared with the previous run.
+
+    python benchmarks/run.py --concurrency 1 4 16 --requests 64
+"""
+import os
+import sys
+import glob
+import json
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Settings that must match for two runs to be comparable
+COMPARABLE_SETTINGS = [
+    "requests", "warmup", "llm_latency", "http_latency", "suppliers", "shipments",
+    "countries", "llm_cache", "response_cache", "cold_caches", "tracemalloc", "fetch_mode",
+]
+
+GRAPH_QUERIES = [
+    "Check supply chain risks for {country} based on current data.",
+    "Which {country} suppliers have open shipments exposed to port delays and currency moves?",
+    "Analyze the risk impact of recent events on our {country} suppliers.",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["graph", "api"], choices=["graph", "api"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=48, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=3, help="unmeasured requests before each scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--http-latency", type=float, default=0.05, help="seconds per stubbed NewsAPI/FX call")
+    parser.add_argument("--suppliers", type=int, default=10000)
+    parser.add_argument("--shipments", type=int, default=1000000)
+    parser.add_argument("--countries", type=int, default=8)
+    parser.add_argument("--database", default=os.getenv("BENCH_POSTGRES_DB", "sentinel_bench"))
+    parser.add_argument("--reseed", action="store_true")
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--response-cache", action="store_true", help="keep the /analyze_risk response cache enabled")
+    parser.add_argument("--cold-caches", action="store_true", help="disable news/FX caching and the news index")
+    parser.add_argument("--fetch-mode", default="plan", choices=["plan", "react"], help="data-fetcher strategy (FETCH_MODE)")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report Python heap peaks (slower)")
+    parser.add_argument("--label", default="", help="free-form tag stored with the results")
+    parser.add_argument("--baseline", help="results file to compare against (default: previous run)")
+    parser.add_argument("--regression-threshold", type=float, default=0.10, help="relative p95 increase flagged as a regression")
+    parser.add_argument("--regression-min-ms", type=float, default=1.0, help="ignore p95 increases smaller than this")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    return parser.parse_args()
+
+def configure_environment(args, stub_url: str):
+    """
+    Must run before any src module is imported: they read their settings at import time.
+    """
+    os.environ.update({
+        "POSTGRES_DB": args.database,
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY") or "benchmark",
+        "NEWS_API_KEY": "benchmark",
+        "EXCHANGE_RATE_API_KEY": "benchmark",
+        "NEWS_API_URL": f"{stub_url}/news/v2/everything",
+        "FX_API_BASE_URL": f"{stub_url}/fx",
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "RESPONSE_CACHE_ENABLED": "true" if args.response_cache else "false",
+        "MONITOR_ENABLED": "false",
+        "CONTRACT_CONTEXT": "false",
+        "FETCH_MODE": args.fetch_mode,
+        # A fresh news index per run, so results don't depend on an earlier run's pulls
+        "NEWS_INDEX_PATH": os.path.join(tempfile.mkdtemp(prefix="sentinel-bench-"), "news_index.sqlite"),
+    })
+    if args.cold_caches:
+        os.environ.update({"NEWS_CACHE_TTL": "0", "FX_SNAPSHOT_TTL": "0", "NEWS_INDEX_ENABLED": "false"})
+
+# --- Measurement ---
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "mean_ms": round(float(values.mean()), 1),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+class NodeTimer(BaseCallbackHandler):
+    """
+    Callback handler that records wall time per graph node.
+    """
+    run_inline = True
+
+    def __init__(self):
+        self.started = {}
+        self.durations = defaultdict(list)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and (name or (serialized or {}).get("name")) == node:
+            self.started[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        entry = self.started.pop(run_id, None)
+        if entry:
+            self.durations[entry[0]].append(time.perf_counter() - entry[1])
+
+    on_chain_error = on_chain_end
+
+    def report(self) -> dict:
+        return {
+            node: {
+                "calls": len(values),
+                "mean_ms": round(1000 * float(np.mean(values)), 1),
+                "p95_ms": round(1000 * float(np.percentile(values, 95)), 1),
+                "total_ms": round(1000 * float(np.sum(values)), 1),
+            }
+            for node, values in sorted(self.durations.items())
+        }
+
+
+async def drive(make_call, total: int, concurrency: int, warmup: int = 0):
+    """
+    Runs `total` calls with at most `concurrency` in flight, after `warmup`
+    unmeasured ones. Returns (latencies, errors, elapsed).
+    """
+    for i in range(warmup):
+        try:
+            await make_call(i)
+        except Exception:
+            pass
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await make_call(i)
+            except Exception as e:
+                errors += 1
+                if errors <= 3:
+                    print(f"  request failed: {e!r}")
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies, errors, time.perf_counter() - start
+
+# --- Scenarios ---
+
+async def graph_scenario(args, countries) -> list:
+    from src.main import build_initial_state
+    from src.graph import get_graph
+
+    results = []
+    for concurrency in args.concurrency:
+        timer = NodeTimer()
+
+        async def call(i: int):
+            query = GRAPH_QUERIES[i % len(GRAPH_QUERIES)].format(country=countries[i % len(countries)])
+            await get_graph().ainvoke(build_initial_state(query), config={"callbacks": [timer]})
+
+        latencies, errors, elapsed = await drive(call, args.requests, concurrency, args.warmup)
+        results.append({
+            "scenario": "graph",
+            "concurrency": concurrency,
+            **summarize(latencies, errors, elapsed),
+            "nodes": timer.report(),
+            "peak_rss_mb": peak_rss_mb(),
+        })
+        print_row(results[-1])
+    return results
+
+async def api_scenario(args, countries) -> list:
+    import httpx
+    from src.main import app
+
+    endpoints = {
+        "analyze_risk": lambda client, i: client.post("/analyze_risk", json={
+            "query": GRAPH_QUERIES[i % len(GRAPH_QUERIES)].format(country=countries[i % len(countries)])
+        }),
+        "analyze_risk_stream": lambda client, i: client.post("/analyze_risk", json={
+            "query": GRAPH_QUERIES[i % len(GRAPH_QUERIES)].format(country=countries[i % len(countries)]),
+            "stream": True,
+        }),
+        "regions": lambda client, i: client.get("/regions"),
+        "exposure": lambda client, i: client.get("/exposure", params={"country": countries[i % len(countries)]}),
+    }
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for name, request in endpoints.items():
+            for concurrency in args.concurrency:
+                async def call(i: int):
+                    response = await request(client, i)
+                    response.raise_for_status()
+
+                latencies, errors, elapsed = await drive(call, args.requests, concurrency, args.warmup)
+                results.append({
+                    "scenario": f"api:{name}",
+                    "concurrency": concurrency,
+                    **summarize(latencies, errors, elapsed),
+                    "peak_rss_mb": peak_rss_mb(),
+                })
+                print_row(results[-1])
+    return results
+
+# --- Reporting ---
+
+def print_row(row: dict):
+    print(
+        f"  {row['scenario']:<24} c={row['concurrency']:<3} "
+        f"p50={row['p50_ms']:>8.1f}ms p95={row['p95_ms']:>8.1f}ms p99={row['p99_ms']:>8.1f}ms "
+        f"{row['throughput_rps']:>7.2f} req/s errors={row['errors']}"
+    )
+    for node, stats in row.get("nodes", {}).items():
+        print(f"      {node:<14} {stats['calls']:>4} calls  mean={stats['mean_ms']:>8.1f}ms  p95={stats['p95_ms']:>8.1f}ms")
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def save_results(report: dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(RESULTS_DIR, f"{stamp}-{report['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+def compare(report: dict, baseline_path: str, threshold: float, min_ms: float) -> int:
+    """
+    Prints p95/throughput changes against a previous run and returns the number
+    of regressions (p95 up by more than `threshold` and by at least `min_ms`).
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+
+    print(f"\nCompared with {os.path.basename(baseline_path)} ({baseline.get('commit')}):")
+    differing = [
+        key for key in COMPARABLE_SETTINGS
+        if baseline["config"].get(key) != report["config"].get(key)
+    ]
+    if differing:
+        print(f"  Note: settings differ from the baseline ({', '.join(differing)}); changes may not be regressions.")
+    regressions = 0
+    for row in report["results"]:
+        before = previous.get((row["scenario"], row["concurrency"]))
+        if not before or not before["p95_ms"] or not before["throughput_rps"]:
+            continue
+        p95_change = row["p95_ms"] / before["p95_ms"] - 1
+        rps_change = row["throughput_rps"] / before["throughput_rps"] - 1
+        regressed = p95_change > threshold and row["p95_ms"] - before["p95_ms"] >= min_ms
+        regressions += regressed
+        print(
+            f"  {row['scenario']:<24} c={row['concurrency']:<3} "
+            f"p95 {p95_change:+7.1%}  throughput {rps_change:+7.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+async def run(args) -> dict:
+    from src import db, fx
+    from src import graph
+    from benchmarks.fake_llm import ScriptedChatModel
+    from benchmarks.seed import seed
+    from src.llm_cache import get_llm_cache
+
+    seed(args.suppliers, args.shipments, args.countries, args.reseed)
+    graph.set_llm(ScriptedChatModel(latency=args.llm_latency, cache=get_llm_cache()))
+    countries = list(fx.COUNTRY_CURRENCIES)[:args.countries]
+
+    await db.open_pool()
+    if args.tracemalloc:
+        tracemalloc.start()
+    results = []
+    try:
+        if "graph" in args.scenarios:
+            print("Graph (graph_app.ainvoke):")
+            results += await graph_scenario(args, countries)
+        if "api" in args.scenarios:
+            print("API (FastAPI app over ASGI):")
+            results += await api_scenario(args, countries)
+    finally:
+        await db.close_pool()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "label": args.label,
+        "config": {key: value for key, value in vars(args).items() if key not in ("baseline", "fail_on_regression")},
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if args.tracemalloc:
+        report["python_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+    return report
+
+def main():
+    args = parse_args()
+
+    from benchmarks.stubs import StubServer, free_port
+
+    previous = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+    port = free_port()
+    configure_environment(args, f"http://127.0.0.1:{port}")
+    with StubServer(latency=args.http_latency, port=port):
+        from benchmarks.seed import ensure_database
+        ensure_database(args.database)
+        report = asyncio.run(run(args))
+
+    path = save_results(report)
+    print(f"\nPeak RSS {report['peak_rss_mb']} MB. Results saved to {os.path.relpath(path, ROOT)}")
+
+    baseline = args.baseline or (previous[-1] if previous else None)
+    if baseline:
+        regressions = compare(report, baseline, args.regression_threshold, args.regression_min_ms)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import time
+
+import psycopg
+from psycopg import sql
+from psycopg.conninfo import make_conninfo
+
+from src import db, exposure, fx
+
+CATEGORIES = ["Electronics", "Raw Materials", "Logistics"]
+STATUSES = ["Pending", "In Transit", "Delayed", "Delivered", "Cancelled"]
+
+
+def ensure_database(name: str):
+    """
+    Creates the benchmark database next to the configured one if it doesn't exist.
+    """
+    # Connect to the maintenance database; the benchmark one may not exist yet
+    conninfo = make_conninfo(db.get_conninfo(), dbname=os.getenv("BENCH_MAINTENANCE_DB", "postgres"))
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        exists = conn.execute("SELECT 1 FROM pg_database WHERE datname = %s", (name,)).fetchone()
+        if not exists:
+            conn.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+
+def seed(suppliers: int, shipments: int, countries: int, reseed: bool = False):
+    """
+    Fills the schema with a deterministic synthetic dataset of the requested
+    size. An existing dataset of the same size is reused unless `reseed` is set.
+    Expects POSTGRES_DB to already point at the benchmark database.
+    """
+    from scripts.setup_db import create_tables
+    create_tables()
+
+    country_names = list(fx.COUNTRY_CURRENCIES)[:countries]
+    with db.get_sync_pool().connection() as conn:
+        current = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM suppliers), (SELECT COUNT(*) FROM shipments)"
+        ).fetchone()
+        if current == (suppliers, shipments) and not reseed:
+            print(f"Reusing seeded data: {suppliers} suppliers, {shipments} shipments.")
+            return
+
+        start = time.perf_counter()
+        conn.execute("TRUNCATE shipments, suppliers, region_snapshots RESTART IDENTITY CASCADE")
+        conn.execute("SELECT setseed(0.42)")
+        conn.execute(
+            """
+            INSERT INTO suppliers (name, country, category, risk_tolerance_score)
+            SELECT 'Supplier ' || g,
+                   (%(countries)s::text[])[1 + g %% cardinality(%(countries)s::text[])],
+                   (%(categories)s::text[])[1 + g %% cardinality(%(categories)s::text[])],
+                   1 + (g * 7) %% 10
+            FROM generate_series(1, %(n)s) AS g
+            """,
+            {"countries": country_names, "categories": CATEGORIES, "n": suppliers},
+        )
+        conn.execute(
+            """
+            INSERT INTO shipments (supplier_id, value_usd, status, due_date)
+            SELECT 1 + (g * 7919) %% %(suppliers)s,
+                   round((random() * 100000)::numeric, 2),
+                   (%(statuses)s::text[])[1 + g %% cardinality(%(statuses)s::text[])],
+                   CURRENT_DATE + (g %% 120) - 30
+            FROM generate_series(1, %(n)s) AS g
+            """,
+            {"suppliers": suppliers, "statuses": STATUSES, "n": shipments},
+        )
+        conn.execute("ANALYZE suppliers")
+        conn.execute("ANALYZE shipments")
+        exposure.refresh_exposure_summary(conn)
+        print(f"Seeded {suppliers} suppliers and {shipments} shipments in {time.perf_counter() - start:.1f}s.")
@@ -0,0 +1,150 @@
+"""
+Import-time and cold-start measurement for the API.
+
+Measures, each in a fresh interpreter:
+  - how long `import src.main` takes, and which modules dominate it;
+  - how long uvicorn takes from launch until /health answers, i.e. until the
+    lifespan pre-warm has finished;
+  - the latency of the first request to each endpoint against the median of
+    the following ones.
+
+    python benchmarks/startup.py --runs 5 --requests 100
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmarks.stubs import free_port
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results", "startup")
+ENDPOINTS = ["/regions", "/exposure", "/snapshots", "/health"]
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint after startup")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    parser.add_argument("--no-prewarm", action="store_true", help="start the API with STARTUP_PREWARM=false")
+    return parser.parse_args()
+
+def child_env(**overrides) -> dict:
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    # A background scan would skew the request timings
+    env["MONITOR_ENABLED"] = "false"
+    env.update(overrides)
+    return env
+
+def import_time(runs: int) -> float:
+    code = "import time; t = time.perf_counter(); import src.main; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=child_env(),
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def slowest_imports(top: int) -> list:
+    """
+    Cumulative import time of top-level packages and src modules.
+    """
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import src.main"], cwd=ROOT,
+                         env=child_env(), capture_output=True, text=True, check=True)
+    totals = {}
+    for line in out.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            _, cumulative, _, module = match.groups()
+            if "." not in module or module.startswith("src."):
+                totals[module] = max(totals.get(module, 0), int(cumulative))
+    slowest = sorted(totals.items(), key=lambda item: -item[1])[:top]
+    return [{"module": module, "ms": round(us / 1000, 1)} for module, us in slowest]
+
+def cold_start(requests: int, prewarm: bool) -> dict:
+    port = free_port()
+    env = child_env(STARTUP_PREWARM="true" if prewarm else "false")
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(base_url=base, timeout=30) as client:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"API exited during startup:\n{server.stderr.read()}")
+                try:
+                    health = client.get("/health")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.02)
+            ready = time.perf_counter() - start
+
+            endpoints = {}
+            for path in ENDPOINTS:
+                if path == "/health":
+                    # Already warmed by the readiness poll; listed for the steady-state number only
+                    first = None
+                else:
+                    t = time.perf_counter()
+                    client.get(path)
+                    first = time.perf_counter() - t
+                steady = []
+                for _ in range(requests):
+                    t = time.perf_counter()
+                    client.get(path)
+                    steady.append(time.perf_counter() - t)
+                median = statistics.median(steady)
+                endpoints[path] = {
+                    "first_ms": round(1000 * first, 2) if first is not None else None,
+                    "median_ms": round(1000 * median, 2),
+                    "first_to_median": round(first / median, 1) if first is not None and median else None,
+                }
+        return {"ready_s": round(ready, 3), "startup_steps": health.json().get("startup", {}), "endpoints": endpoints}
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def main():
+    args = parse_args()
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "prewarm": not args.no_prewarm,
+        "import_s": round(import_time(args.runs), 3),
+        "slowest_imports": slowest_imports(args.top),
+    }
+    print(f"import src.main: {report['import_s']:.3f}s (median of {args.runs})")
+    for entry in report["slowest_imports"]:
+        print(f"  {entry['module']:<32} {entry['ms']:>8.1f}ms")
+
+    runs = [cold_start(args.requests, not args.no_prewarm) for _ in range(args.runs)]
+    report["ready_s"] = round(statistics.median(r["ready_s"] for r in runs), 3)
+    report["runs"] = runs
+    print(f"launch to ready: {report['ready_s']:.3f}s (median of {args.runs}); steps: {runs[-1]['startup_steps']}")
+    for path, stats in runs[-1]["endpoints"].items():
+        first = f"{stats['first_ms']:>8.2f}ms" if stats["first_ms"] is not None else "       -  "
+        ratio = f"  ({stats['first_to_median']}x)" if stats["first_to_median"] is not None else ""
+        print(f"  {path:<12} first={first} median={stats['median_ms']:>8.2f}ms{ratio}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {os.path.relpath(path, ROOT)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import time
+import asyncio
+import socket
+import threading
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI
+
+
+def build_stub_app(latency: float) -> FastAPI:
+    """
+    Local stand-in for NewsAPI (/news/v2/everything) and ExchangeRate-API
+    (/fx/{key}/latest/{base}) returning well-formed payloads after `latency` seconds.
+    """
+    # Imported here: src modules read their settings at import time, after the runner configures them
+    from src import fx
+
+    app = FastAPI()
+    currencies = sorted(set(fx.COUNTRY_CURRENCIES.values()))
+
+    @app.get("/news/v2/everything")
+    async def everything(q: str, pageSize: int = 5):
+        await asyncio.sleep(latency)
+        now = datetime.now(timezone.utc).isoformat()
+        return {
+            "status": "ok",
+            "totalResults": pageSize,
+            "articles": [
+                {
+                    "title": f"Port delays reported ({q}) #{i}",
+                    "source": {"name": "Benchmark Wire"},
+                    "description": "Shipping schedules slip as weather and labour issues affect regional ports.",
+                    "url": f"https://example.com/news/{abs(hash(q))}/{i}",
+                    "publishedAt": now,
+                }
+                for i in range(pageSize)
+            ],
+        }
+
+    @app.get("/fx/{api_key}/latest/{base}")
+    async def latest(api_key: str, base: str):
+        await asyncio.sleep(latency)
+        rates = {currency: 1.0 + 10.0 * i for i, currency in enumerate(currencies)}
+        rates[base] = 1.0
+        return {"result": "success", "base_code": base, "conversion_rates": rates}
+
+    return app
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubServer:
+    """
+    Runs the stub app in a background thread for the duration of a `with` block.
+    """
+    def __init__(self, latency: float = 0.05, port: int = 0):
+        self.port = port or free_port()
+        config = uvicorn.Config(build_stub_app(latency), host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.time() + 10
+        while not self.server.started:
+            if time.time() > deadline:
+                raise RuntimeError("Stub server did not start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
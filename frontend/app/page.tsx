@@ -67,12 +67,33 @@ const RiskGauge = ({ score }: { score: number }) => {
   );
 };
 
+// Tiny line chart of a region's recent scores (0-100)
+const Sparkline = ({ points }: { points: number[] }) => {
+  if (points.length < 2) return null;
+  const width = 64;
+  const height = 20;
+  const step = width / (points.length - 1);
+  const path = points.map((p, i) => `${(i * step).toFixed(1)},${(height - (p / 100) * height).toFixed(1)}`).join(" ");
+  const rising = points[points.length - 1] > points[0];
+
+  return (
+    <svg width={width} height={height} className="ml-11 mt-1">
+      <polyline points={path} fill="none" strokeWidth="1.5" stroke="currentColor" className={rising ? "text-red-400" : "text-green-400"} />
+    </svg>
+  );
+};
+
+// Snapshots are refreshed server-side, so polling them costs no graph runs
+const SNAPSHOT_POLL_MS = 60000;
+const SPARKLINE_POINTS = 24;
+
 interface MonitoredRegion {
   name: string;
   status: 'safe' | 'warning' | 'critical';
   scanning?: boolean;
   riskScore?: number;
   suppliers?: Supplier[];
+  history?: number[];
 }
 
 export default function Home() {
@@ -85,6 +106,8 @@ export default function Home() {
   const [monitoredRegions, setMonitoredRegions] = useState<MonitoredRegion[]>([]);
   
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  // One conversation per page load, so follow-ups reuse the data already fetched
+  const threadIdRef = useRef<string>(crypto.randomUUID());
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -94,41 +117,99 @@ export default function Home() {
     scrollToBottom();
   }, [messages, loading]);
 
+  // Reads a newline-delimited JSON stream, handing each parsed line to onEvent as it arrives
+  const readNdjson = async (res: Response, onEvent: (event: any) => void) => {
+    if (!res.ok || !res.body) throw new Error(`Request failed with status ${res.status}`);
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split("\n");
+      buffer = lines.pop() || "";
+      for (const line of lines) {
+        if (line.trim()) onEvent(JSON.parse(line));
+      }
+    }
+    if (buffer.trim()) onEvent(JSON.parse(buffer));
+  };
+
+  const applyRegionResult = (result: any) => {
+    if (result.status !== "success") {
+      console.error(`Error scanning ${result.region}:`, result.detail);
+      setMonitoredRegions(prev => prev.map(r => r.name === result.region ? { ...r, scanning: false } : r));
+      return;
+    }
+
+    const suppliers = result.impacted_suppliers || [];
+    const regionScore = result.risk_score || 0;
+    
+    const hasHigh = suppliers.some((s: any) => s.risk_level === 'High');
+    const hasMedium = suppliers.some((s: any) => s.risk_level === 'Medium');
+    
+    let status: 'safe' | 'warning' | 'critical' = 'safe';
+    if (hasHigh) status = 'critical';
+    else if (hasMedium) status = 'warning';
+    else if (regionScore > 50) status = 'warning'; // Fallback based on score
+    
+    // Update status and store data LOCALLY in the region object
+    setMonitoredRegions(prev => prev.map(r => r.name === result.region ? { 
+      ...r, 
+      status, 
+      scanning: false,
+      riskScore: regionScore,
+      suppliers: suppliers
+    } : r));
+  };
+
   const scanAllRegions = async (regions: MonitoredRegion[]) => {
-    for (const region of regions) {
-      // Mark as scanning
-      setMonitoredRegions(prev => prev.map(r => r.name === region.name ? { ...r, scanning: true } : r));
-      
+    // Mark all as scanning; the backend analyzes them concurrently
+    const names = regions.map(r => r.name);
+    setMonitoredRegions(prev => prev.map(r => names.includes(r.name) ? { ...r, scanning: true } : r));
+
+    try {
+      // Results arrive as NDJSON, one line per region, in completion order
+      const res = await fetch("http://localhost:8000/scan_regions", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ regions: names })
+      });
+      await readNdjson(res, applyRegionResult);
+    } catch (e) {
+      console.error("Error scanning regions:", e);
+    } finally {
+      setMonitoredRegions(prev => prev.map(r => names.includes(r.name) ? { ...r, scanning: false } : r));
+    }
+  };
+
+  // Score history comes from stored scans, so sparklines never trigger graph runs
+  const loadHistory = async (regions: string[]) => {
+    await Promise.all(regions.map(async (region) => {
       try {
-        // Call backend silently
-        const res = await axios.post("http://localhost:8000/analyze_risk", {
-          query: `Check supply chain risks for ${region.name} based on current data.`
-        });
-        
-        const suppliers = res.data.impacted_suppliers || [];
-        const regionScore = res.data.risk_score || 0;
-        
-        const hasHigh = suppliers.some((s: any) => s.risk_level === 'High');
-        const hasMedium = suppliers.some((s: any) => s.risk_level === 'Medium');
-        
-        let status: 'safe' | 'warning' | 'critical' = 'safe';
-        if (hasHigh) status = 'critical';
-        else if (hasMedium) status = 'warning';
-        else if (regionScore > 50) status = 'warning'; // Fallback based on score
-        
-        // Update status and store data LOCALLY in the region object
-        setMonitoredRegions(prev => prev.map(r => r.name === region.name ? { 
-          ...r, 
-          status, 
-          scanning: false,
-          riskScore: regionScore,
-          suppliers: suppliers
-        } : r));
-        
-      } catch (e) {
-        console.error(`Error scanning ${region.name}:`, e);
-        setMonitoredRegions(prev => prev.map(r => r.name === region.name ? { ...r, scanning: false } : r));
+        const res = await axios.get("http://localhost:8000/history", { params: { region, points: SPARKLINE_POINTS } });
+        const history = (res.data.series || []).map((point: any) => point.score);
+        setMonitoredRegions(prev => prev.map(r => r.name === region ? { ...r, history } : r));
+      } catch (error) {
+        console.error(`Error fetching history for ${region}:`, error);
       }
+    }));
+  };
+
+  // Applies the latest server-side snapshots; returns the regions they cover
+  const loadSnapshots = async (): Promise<string[]> => {
+    try {
+      const res = await axios.get("http://localhost:8000/snapshots");
+      const snapshots = res.data.snapshots || [];
+      snapshots.forEach((snapshot: any) => applyRegionResult({ ...snapshot, status: "success" }));
+      const covered = snapshots.map((snapshot: any) => snapshot.region);
+      loadHistory(covered);
+      return covered;
+    } catch (error) {
+      console.error("Error fetching snapshots:", error);
+      return [];
     }
   };
 
@@ -144,9 +225,11 @@ export default function Home() {
         }));
         setMonitoredRegions(regions);
         
-        // Start automatic scanning
-        if (regions.length > 0) {
-          scanAllRegions(regions);
+        // The backend monitor keeps snapshots fresh; only scan regions it hasn't covered yet
+        const covered = await loadSnapshots();
+        const missing = regions.filter((r: MonitoredRegion) => !covered.includes(r.name));
+        if (missing.length > 0) {
+          scanAllRegions(missing);
         }
       } catch (error) {
         console.error("Error fetching regions:", error);
@@ -159,8 +242,31 @@ export default function Home() {
       }
     };
     fetchRegions();
+    const poll = setInterval(loadSnapshots, SNAPSHOT_POLL_MS);
+    return () => clearInterval(poll);
   }, []);
 
+  const applySuppliers = (newSuppliers: Supplier[]) => {
+    setImpactedSuppliers(newSuppliers); // Note: This replaces the list for specific queries
+
+    // Update region status based on new findings
+    if (newSuppliers.length > 0) {
+      setMonitoredRegions(prev => prev.map(region => {
+        const regionSuppliers = newSuppliers.filter(s => s.country === region.name);
+        if (regionSuppliers.length === 0) return region;
+
+        const hasHighRisk = regionSuppliers.some(s => s.risk_level === 'High');
+        const hasMediumRisk = regionSuppliers.some(s => s.risk_level === 'Medium');
+
+        let newStatus: 'safe' | 'warning' | 'critical' = region.status;
+        if (hasHighRisk) newStatus = 'critical';
+        else if (hasMediumRisk && region.status !== 'critical') newStatus = 'warning';
+        
+        return { ...region, status: newStatus };
+      }));
+    }
+  };
+
   const handleAnalyze = async () => {
     if (!query.trim()) return;
 
@@ -169,37 +275,39 @@ export default function Home() {
     setLoading(true);
     setQuery("");
 
+    // The report is streamed token by token into a single AI message
+    let streamed = "";
+    let started = false;
+    const showReport = (content: string) => {
+      const aiMsg: Message = { role: "ai", content };
+      setMessages((prev) => started ? [...prev.slice(0, -1), aiMsg] : [...prev, aiMsg]);
+      started = true;
+    };
+
     try {
-      const res = await axios.post("http://localhost:8000/analyze_risk", {
-        query: userMsg.content,
+      const res = await fetch("http://localhost:8000/analyze_risk", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ query: userMsg.content, stream: true, thread_id: threadIdRef.current })
       });
 
-      const reportContent = res.data.report || "Analysis complete. No specific report generated.";
-      const aiMsg: Message = { role: "ai", content: reportContent };
-      
-      setMessages((prev) => [...prev, aiMsg]);
-      setRiskScore(res.data.risk_score);
-      
-      const newSuppliers: Supplier[] = res.data.impacted_suppliers || [];
-      setImpactedSuppliers(newSuppliers); // Note: This replaces the list for specific queries
-      setReport(res.data.report);
-
-      // Update region status based on new findings
-      if (newSuppliers.length > 0) {
-        setMonitoredRegions(prev => prev.map(region => {
-          const regionSuppliers = newSuppliers.filter(s => s.country === region.name);
-          if (regionSuppliers.length === 0) return region;
-
-          const hasHighRisk = regionSuppliers.some(s => s.risk_level === 'High');
-          const hasMediumRisk = regionSuppliers.some(s => s.risk_level === 'Medium');
-
-          let newStatus: 'safe' | 'warning' | 'critical' = region.status;
-          if (hasHighRisk) newStatus = 'critical';
-          else if (hasMediumRisk && region.status !== 'critical') newStatus = 'warning';
-          
-          return { ...region, status: newStatus };
-        }));
-      }
+      await readNdjson(res, (event) => {
+        if (event.event === "analysis") {
+          // Gauge and supplier cards update as soon as the analyst finishes
+          setRiskScore(event.risk_score);
+          applySuppliers(event.impacted_suppliers || []);
+        } else if (event.event === "token") {
+          streamed += event.content;
+          showReport(streamed);
+        } else if (event.event === "done") {
+          showReport(event.report || "Analysis complete. No specific report generated.");
+          setRiskScore(event.risk_score);
+          applySuppliers(event.impacted_suppliers || []);
+          setReport(event.report);
+        } else if (event.event === "error") {
+          throw new Error(event.detail);
+        }
+      });
 
     } catch (error) {
       console.error(error);
@@ -417,6 +525,7 @@ export default function Home() {
                       Score: {region.riskScore}
                     </span>
                   )}
+                  {region.history && <Sparkline points={region.history} />}
                 </div>
                 
                 <div className={`w-2 h-2 rounded-full shadow-[0_0_8px] ${
@@ -1,66 +1,233 @@
 import os
-import pandas as pd
+import csv
+import sys
+import time
 import random
+import argparse
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
 from faker import Faker
 from fpdf import FPDF
 
-fake = Faker()
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.fx import COUNTRY_CURRENCIES
 
 # Configuration
-NUM_SUPPLIERS = 20
-COUNTRIES = ['Taiwan', 'Japan', 'Ukraine', 'USA']
+DEFAULT_COUNTRIES = ['Taiwan', 'Japan', 'Ukraine', 'USA']
 CATEGORIES = ['Electronics', 'Raw Materials', 'Logistics']
 DATA_DIR = "data"
-CONTRACTS_DIR = os.path.join(DATA_DIR, "contracts")
-
-os.makedirs(DATA_DIR, exist_ok=True)
-os.makedirs(CONTRACTS_DIR, exist_ok=True)
-
-def generate_suppliers():
-    suppliers = []
-    for i in range(1, NUM_SUPPLIERS + 1):
-        country = random.choice(COUNTRIES)
-        suppliers.append({
-            "id": i,
-            "name": fake.company(),
-            "country": country,
-            "category": random.choice(CATEGORIES),
-            "risk_tolerance_score": random.randint(1, 10)
-        })
-    
-    df = pd.DataFrame(suppliers)
-    df.to_csv(os.path.join(DATA_DIR, "suppliers.csv"), index=False)
-    print(f"Generated {NUM_SUPPLIERS} suppliers in {DATA_DIR}/suppliers.csv")
-    return suppliers
-
-def generate_contracts(suppliers):
+
+# Shipment status mix, and the due-date window (days from today) for each status:
+# settled shipments are in the past, open ones mostly ahead, delayed ones mostly overdue.
+STATUSES = ['Pending', 'In Transit', 'Delayed', 'Delivered', 'Cancelled']
+STATUS_WEIGHTS = [0.12, 0.20, 0.08, 0.55, 0.05]
+STATUS_DUE_DAYS = {
+    'Pending': (15, 120),
+    'In Transit': (-5, 45),
+    'Delayed': (-30, 10),
+    'Delivered': (-365, 0),
+    'Cancelled': (-365, 30),
+}
+
+# Shipment values are log-normal; the median (USD) depends on the supplier's category.
+CATEGORY_MEDIAN_VALUE = {'Electronics': 40000, 'Raw Materials': 75000, 'Logistics': 12000}
+VALUE_SIGMA = 1.0
+
+# Distinct Faker company names; larger supplier counts reuse them with a branch number.
+NAME_POOL_SIZE = 20000
+
+COUNTRY_CLAUSES = {
+    'Japan': "If the JPY/USD exchange rate drops below 140, Supplier can renegotiate pricing.",
+    'Taiwan': "Force Majeure applies for typhoons and earthquakes.",
+    'Ukraine': "Shipping routes subject to change based on conflict zones.",
+}
+GENERIC_CLAUSES = [
+    "Force Majeure applies for natural disasters, strikes and government action that prevent delivery.",
+    "Late deliveries incur a penalty of {penalty}% of the shipment value per week, capped at 10%.",
+    "Either party may terminate with {notice} days written notice.",
+    "Supplier shall maintain safety stock covering {stock} weeks of forecast demand.",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic suppliers, shipments and contract PDFs.")
+    parser.add_argument("--suppliers", type=int, default=20)
+    parser.add_argument("--shipments-per-supplier", type=float, default=25,
+                        help="mean shipments per supplier (Poisson-distributed)")
+    parser.add_argument("--countries", type=int, default=len(DEFAULT_COUNTRIES),
+                        help=f"number of supplier countries, at most {len(COUNTRY_CURRENCIES)}")
+    parser.add_argument("--categories", type=int, default=len(CATEGORIES),
+                        help=f"number of supplier categories, at most {len(CATEGORIES)}")
+    parser.add_argument("--contracts", type=int, default=None,
+                        help="suppliers that get a contract PDF (default: all, 0 to skip)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=20000, help="suppliers generated per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="contract rendering processes")
+    parser.add_argument("--out-dir", default=DATA_DIR)
+    return parser.parse_args()
+
+def pick_countries(n):
+    # The original four first, so small datasets look like the sample data
+    ordered = DEFAULT_COUNTRIES + [c for c in COUNTRY_CURRENCIES if c not in DEFAULT_COUNTRIES]
+    return ordered[:max(1, min(n, len(ordered)))]
+
+def name_pool(size, seed):
+    fake = Faker()
+    fake.seed_instance(seed)
+    return np.array([fake.company() for _ in range(size)], dtype=object)
+
+def supplier_chunk(rng, first_id, count, countries, categories, names):
+    """
+    One chunk of suppliers as column arrays.
+    """
+    ids = np.arange(first_id, first_id + count, dtype=np.int64)
+    branch = (ids - 1) // len(names)
+    base = names[(ids - 1) % len(names)]
+    supplier_names = np.where(branch == 0, base, base + " " + (branch + 1).astype(str))
+    return {
+        "id": ids,
+        "name": supplier_names,
+        "country": np.array(countries, dtype=object)[rng.integers(0, len(countries), count)],
+        "category": np.array(categories, dtype=object)[rng.integers(0, len(categories), count)],
+        "risk_tolerance_score": rng.integers(1, 11, count),
+    }
+
+def shipment_chunk(rng, first_id, suppliers, per_supplier, today):
+    """
+    Shipments for one chunk of suppliers as column arrays.
+    """
+    counts = rng.poisson(per_supplier, len(suppliers["id"]))
+    supplier_index = np.repeat(np.arange(len(counts)), counts)
+    n = len(supplier_index)
+
+    status_index = rng.choice(len(STATUSES), size=n, p=STATUS_WEIGHTS)
+    low = np.array([STATUS_DUE_DAYS[s][0] for s in STATUSES])[status_index]
+    high = np.array([STATUS_DUE_DAYS[s][1] for s in STATUSES])[status_index]
+    due = np.datetime64(today) + rng.integers(low, high + 1).astype("timedelta64[D]")
+
+    medians = np.array([CATEGORY_MEDIAN_VALUE.get(c, 30000) for c in suppliers["category"]], dtype=np.float64)
+    values = np.round(rng.lognormal(np.log(medians[supplier_index]), VALUE_SIGMA), 2)
+
+    return {
+        "id": np.arange(first_id, first_id + n, dtype=np.int64),
+        "supplier_id": suppliers["id"][supplier_index],
+        "value_usd": values,
+        "status": np.array(STATUSES, dtype=object)[status_index],
+        "due_date": due.astype(str),
+    }
+
+def write_rows(writer, columns):
+    writer.writerows(zip(*(values.tolist() for values in columns.values())))
+
+# --- Contracts ---
+
+def contract_text(supplier, seed):
+    supplier_id, name, country, category = supplier
+    rng = random.Random(seed * 1_000_003 + supplier_id)
+    start = date.fromordinal(date.today().toordinal() - rng.randint(0, 365))
+    currency = COUNTRY_CURRENCIES.get(country, "USD")
+
+    clauses = [COUNTRY_CLAUSES.get(country) or (
+        f"If the {currency}/USD exchange rate moves more than {rng.randint(5, 15)}% from the rate on the "
+        "contract date, either party can renegotiate pricing."
+        if currency != "USD" else "Standard delivery terms apply."
+    )]
+    clauses += [
+        clause.format(penalty=rng.randint(1, 3), notice=rng.choice([30, 60, 90]), stock=rng.randint(2, 8))
+        for clause in rng.sample(GENERIC_CLAUSES, k=2)
+    ]
+
+    text = f"Contract for {name}\n\n"
+    text += f"Country: {country}\n"
+    text += f"Category: {category}\n"
+    text += f"Date: {start}\n\n"
+    text += "Terms and Conditions:\n"
+    text += "".join(f"{i}. {clause}\n" for i, clause in enumerate(clauses, start=1))
+    text += "\nThis contract is valid for 12 months."
+    return text
+
+def render_contracts(suppliers, contracts_dir, seed):
+    """
+    Runs in a worker process; renders one PDF per (id, name, country, category).
+    """
     for supplier in suppliers:
         pdf = FPDF()
         pdf.add_page()
         pdf.set_font("Arial", size=12)
-        
-        text = f"Contract for {supplier['name']}\n\n"
-        text += f"Country: {supplier['country']}\n"
-        text += f"Date: {fake.date_this_year()}\n\n"
-        text += "Terms and Conditions:\n"
-        
-        # Add some risk-related clauses
-        if supplier['country'] == 'Japan':
-            text += "If the JPY/USD exchange rate drops below 140, Supplier can renegotiate pricing.\n"
-        elif supplier['country'] == 'Taiwan':
-            text += "Force Majeure applies for typhoons and earthquakes.\n"
-        elif supplier['country'] == 'Ukraine':
-            text += "Shipping routes subject to change based on conflict zones.\n"
-        else:
-            text += "Standard delivery terms apply.\n"
-            
-        text += "\nThis contract is valid for 12 months."
-        
+        # The core PDF fonts are Latin-1 only
+        text = contract_text(supplier, seed).encode("latin-1", "replace").decode("latin-1")
         pdf.multi_cell(0, 10, text)
-        pdf.output(os.path.join(CONTRACTS_DIR, f"contract_{supplier['id']}.pdf"))
-    
-    print(f"Generated {len(suppliers)} contracts in {CONTRACTS_DIR}/")
+        pdf.output(os.path.join(contracts_dir, f"contract_{supplier[0]}.pdf"))
+    return len(suppliers)
+
+def remove_stale_contracts(contracts_dir, supplier_count):
+    # Contracts left over from a larger run would otherwise be ingested for suppliers that no longer exist
+    for filename in os.listdir(contracts_dir):
+        if filename.startswith("contract_") and filename.endswith(".pdf"):
+            supplier_id = filename[len("contract_"):-len(".pdf")]
+            if supplier_id.isdigit() and int(supplier_id) > supplier_count:
+                os.remove(os.path.join(contracts_dir, filename))
+
+# --- Main ---
+
+def generate(args):
+    rng = np.random.default_rng(args.seed)
+    countries = pick_countries(args.countries)
+    categories = CATEGORIES[:max(1, min(args.categories, len(CATEGORIES)))]
+    names = name_pool(min(args.suppliers, NAME_POOL_SIZE), args.seed)
+    contract_limit = args.suppliers if args.contracts is None else min(args.contracts, args.suppliers)
+    contracts_dir = os.path.join(args.out_dir, "contracts")
+    os.makedirs(contracts_dir, exist_ok=True)
+    # A run that skips contracts leaves existing PDFs alone
+    if contract_limit > 0:
+        remove_stale_contracts(contracts_dir, args.suppliers)
+    today = date.today().isoformat()
+
+    start = time.perf_counter()
+    supplier_count = shipment_count = contract_count = 0
+    pending = set()
+
+    with open(os.path.join(args.out_dir, "suppliers.csv"), "w", newline="") as suppliers_file, \
+            open(os.path.join(args.out_dir, "shipments.csv"), "w", newline="") as shipments_file, \
+            ProcessPoolExecutor(max_workers=args.workers) as pool:
+        supplier_writer = csv.writer(suppliers_file)
+        shipment_writer = csv.writer(shipments_file)
+        supplier_writer.writerow(["id", "name", "country", "category", "risk_tolerance_score"])
+        shipment_writer.writerow(["id", "supplier_id", "value_usd", "status", "due_date"])
+
+        # Only one chunk's arrays are alive at a time, plus the contract batches in flight
+        for first_id in range(1, args.suppliers + 1, args.chunk_size):
+            count = min(args.chunk_size, args.suppliers - first_id + 1)
+            suppliers = supplier_chunk(rng, first_id, count, countries, categories, names)
+            shipments = shipment_chunk(rng, shipment_count + 1, suppliers, args.shipments_per_supplier, today)
+            write_rows(supplier_writer, suppliers)
+            write_rows(shipment_writer, shipments)
+            supplier_count += count
+            shipment_count += len(shipments["id"])
+
+            with_contract = max(0, min(count, contract_limit - first_id + 1))
+            rows = list(zip(
+                suppliers["id"][:with_contract].tolist(), suppliers["name"][:with_contract].tolist(),
+                suppliers["country"][:with_contract].tolist(), suppliers["category"][:with_contract].tolist(),
+            ))
+            batch_size = max(1, min(1000, len(rows) // args.workers + 1))
+            for i in range(0, len(rows), batch_size):
+                if len(pending) >= 2 * args.workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    contract_count += sum(f.result() for f in done)
+                pending.add(pool.submit(render_contracts, rows[i:i + batch_size], contracts_dir, args.seed))
+
+            print(f"  {supplier_count}/{args.suppliers} suppliers, {shipment_count} shipments "
+                  f"({time.perf_counter() - start:.1f}s)")
+
+        contract_count += sum(f.result() for f in pending)
+
+    elapsed = time.perf_counter() - start
+    print(f"Generated {supplier_count} suppliers in {args.out_dir}/suppliers.csv")
+    print(f"Generated {shipment_count} shipments in {args.out_dir}/shipments.csv")
+    print(f"Generated {contract_count} contracts in {contracts_dir}/ ({elapsed:.1f}s total)")
 
 if __name__ == "__main__":
-    suppliers = generate_suppliers()
-    generate_contracts(suppliers)
+    generate(parse_args())
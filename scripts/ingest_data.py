@@ -1,106 +1,298 @@
 import os
-import pandas as pd
-import psycopg2
-from langchain_qdrant import QdrantVectorStore
+import re
+import sys
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_core.documents import Document
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams
+from qdrant_client.http.models import (
+    Distance, FieldCondition, Filter, MatchAny, PointStruct, VectorParams,
+)
 from dotenv import load_dotenv
 import PyPDF2
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import db, exposure
+from src.contracts import COLLECTION_NAME, EMBEDDING_MODEL, PAYLOAD_INDEXES, VECTOR_SIZE, contract_point_id, qdrant_url
+
 load_dotenv()
 
 # Configuration
 DATA_DIR = "data"
 SUPPLIERS_FILE = os.path.join(DATA_DIR, "suppliers.csv")
+SHIPMENTS_FILE = os.path.join(DATA_DIR, "shipments.csv")
 CONTRACTS_DIR = os.path.join(DATA_DIR, "contracts")
 
-def ingest_suppliers():
+# CSV files are streamed to COPY in blocks of this size, never loaded whole.
+COPY_BLOCK_BYTES = 1024 * 1024
+
+# Contract pipeline tuning
+CLAUSE_MIN_CHARS = 80      # shorter clauses are merged into the next one
+CLAUSE_MAX_CHARS = 1200    # longer clauses are split on sentence boundaries
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+
+CLAUSE_START = re.compile(r"^(\d+(\.\d+)*[.)]\s|(clause|section|article)\s+\d+|terms and conditions)", re.IGNORECASE)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+COUNTRY_LINE = re.compile(r"^\s*Country:\s*(.+?)\s*$", re.MULTILINE)
+
+SUPPLIER_COLUMNS = ["id", "name", "country", "category", "risk_tolerance_score"]
+SHIPMENT_COLUMNS = ["id", "supplier_id", "value_usd", "status", "due_date"]
+
+def copy_upsert(conn, table, allowed_columns, csv_path):
+    """
+    Streams a CSV file into a temporary staging table with COPY, then upserts
+    it into `table` on `id`. Rows whose values are unchanged are left alone,
+    so re-running the load is idempotent and cheap.
+    Returns (rows_in_file, rows_written).
+    """
+    cur = conn.cursor()
+    staging = f"{table}_staging"
+
+    with open(csv_path, "rb") as f:
+        columns = f.readline().decode("utf-8").strip().split(",")
+        unknown = set(columns) - set(allowed_columns)
+        if "id" not in columns or unknown:
+            raise ValueError(f"{csv_path}: unexpected header {columns}")
+        column_list = ", ".join(columns)
+
+        cur.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+        with cur.copy(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)") as copy:
+            while block := f.read(COPY_BLOCK_BYTES):
+                copy.write(block)
+
+    cur.execute(f"SELECT COUNT(*) FROM {staging}")
+    rows_in_file = cur.fetchone()[0]
+
+    updates = [c for c in columns if c != "id"]
+    set_clause = ", ".join(f"{c} = EXCLUDED.{c}" for c in updates)
+    changed = " OR ".join(f"{table}.{c} IS DISTINCT FROM EXCLUDED.{c}" for c in updates)
+    cur.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {staging}
+        ON CONFLICT (id) DO UPDATE SET {set_clause}
+        WHERE {changed}
+    """)
+    rows_written = cur.rowcount
+
+    # Explicit ids bypass the SERIAL sequence; move it past the loaded range
+    cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST((SELECT MAX(id) FROM {table}), 1))")
+    cur.close()
+    return rows_in_file, rows_written
+
+def ingest_table(table, columns, csv_path):
+    if not os.path.exists(csv_path):
+        print(f"No {table} file at {csv_path}. Skipping.")
+        return
     try:
-        conn = psycopg2.connect(
-            host=os.getenv("POSTGRES_HOST"),
-            database=os.getenv("POSTGRES_DB"),
-            user=os.getenv("POSTGRES_USER"),
-            password=os.getenv("POSTGRES_PASSWORD"),
-            port=os.getenv("POSTGRES_PORT")
-        )
-        cur = conn.cursor()
+        start = time.perf_counter()
+        with db.get_sync_pool().connection() as conn:
+            rows_in_file, rows_written = copy_upsert(conn, table, columns, csv_path)
+            if rows_written:
+                exposure.publish_change(conn, table)
+        elapsed = time.perf_counter() - start
+        print(f"Loaded {rows_in_file} {table} rows ({rows_written} inserted or changed) in {elapsed:.1f}s.")
         
-        df = pd.read_csv(SUPPLIERS_FILE)
-        
-        # Check if data already exists to avoid duplicates
-        cur.execute("SELECT COUNT(*) FROM suppliers")
-        count = cur.fetchone()[0]
-        if count > 0:
-            print(f"Suppliers table already has {count} rows. Skipping ingestion.")
-            return
+    except Exception as e:
+        print(f"Error ingesting {table}: {e}")
 
-        for _, row in df.iterrows():
-            cur.execute("""
-                INSERT INTO suppliers (id, name, country, category, risk_tolerance_score)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (row['id'], row['name'], row['country'], row['category'], row['risk_tolerance_score']))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-        print(f"Successfully ingested {len(df)} suppliers into PostgreSQL.")
-        
+def ingest_suppliers():
+    ingest_table("suppliers", SUPPLIER_COLUMNS, SUPPLIERS_FILE)
+
+def ingest_shipments():
+    # Shipments reference suppliers, so this must run after ingest_suppliers
+    ingest_table("shipments", SHIPMENT_COLUMNS, SHIPMENTS_FILE)
+
+def refresh_exposure():
+    try:
+        start = time.perf_counter()
+        with db.get_sync_pool().connection() as conn:
+            exposure.refresh_exposure_summary(conn)
+        print(f"Refreshed supplier exposure summary in {time.perf_counter() - start:.1f}s.")
     except Exception as e:
-        print(f"Error ingesting suppliers: {e}")
+        print(f"Error refreshing exposure summary: {e}")
+
+# --- Contracts ---
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(COPY_BLOCK_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+def extract_pdf_text(path):
+    """
+    Runs in a worker process; PDF parsing is CPU-bound.
+    """
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+def chunk_contract(text):
+    """
+    Splits a contract into clause-level chunks. Each chunk is prefixed with the
+    contract title so it still identifies the contract when retrieved on its own.
+    """
+    clauses, current = [], []
+    for line in text.splitlines():
+        line = line.strip()
+        if (not line or CLAUSE_START.match(line)) and current:
+            clauses.append(" ".join(current))
+            current = []
+        if line:
+            current.append(line)
+    if current:
+        clauses.append(" ".join(current))
+    if not clauses:
+        return []
+
+    title = next(line.strip() for line in text.splitlines() if line.strip())
+    chunks, pending = [], ""
+    for clause in clauses[1:] or clauses:
+        clause = f"{pending} {clause}".strip()
+        if len(clause) < CLAUSE_MIN_CHARS:
+            pending = clause
+            continue
+        pending = ""
+        while len(clause) > CLAUSE_MAX_CHARS:
+            # Cut at the last sentence boundary that fits
+            sentences = SENTENCE_END.split(clause[:CLAUSE_MAX_CHARS])
+            head = " ".join(sentences[:-1]) if len(sentences) > 1 else clause[:CLAUSE_MAX_CHARS]
+            chunks.append(head)
+            clause = clause[len(head):].strip()
+        chunks.append(clause)
+    if pending:
+        if chunks:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return [chunk if chunk.startswith(title) else f"{title}\n{chunk}" for chunk in chunks]
+
+def existing_contract_hashes(client):
+    """
+    Maps each ingested contract file to the content hash stored with its points.
+    A contract whose points disagree on the hash, or number fewer than the
+    chunk_count they record, was left half-written by a failed run; it maps to
+    None so it is treated as changed and ingested again.
+    """
+    hashes, counts, expected = {}, {}, {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=COLLECTION_NAME,
+            with_payload=["metadata.source", "metadata.content_hash", "metadata.chunk_count"],
+            with_vectors=False,
+            limit=1000,
+            offset=offset,
+        )
+        for point in points:
+            metadata = (point.payload or {}).get("metadata", {})
+            source = metadata.get("source")
+            content_hash = metadata.get("content_hash")
+            hashes[source] = content_hash if hashes.get(source, content_hash) == content_hash else None
+            counts[source] = counts.get(source, 0) + 1
+            expected[source] = metadata.get("chunk_count")
+        if offset is None:
+            break
+    return {source: h if counts[source] == expected[source] else None for source, h in hashes.items()}
+
+def delete_contract_points(client, sources):
+    if sources:
+        client.delete(
+            collection_name=COLLECTION_NAME,
+            points_selector=Filter(must=[FieldCondition(key="metadata.source", match=MatchAny(any=list(sources)))]),
+        )
+
+def embed_and_upsert(client, embeddings, batch):
+    vectors = embeddings.embed_documents([payload["page_content"] for _, payload in batch])
+    client.upsert(
+        collection_name=COLLECTION_NAME,
+        points=[PointStruct(id=point_id, vector=vector, payload=payload) for (point_id, payload), vector in zip(batch, vectors)],
+        wait=False,
+    )
+    return len(batch)
 
 def ingest_contracts():
+    """
+    Incremental contract pipeline: hash every PDF, skip those whose hash is
+    already in Qdrant with all of their chunks, extract the rest in a process pool, chunk per clause and
+    embed in batches with bounded concurrency. Changed contracts have their old
+    points replaced; contracts whose files are gone are removed.
+    """
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key or "your_google_api_key" in api_key:
         print("Skipping Contract Ingestion: GOOGLE_API_KEY not found or invalid.")
         return
 
     try:
-        # Initialize Qdrant Client
-        client = QdrantClient(url=os.getenv("QDRANT_URL"))
-        collection_name = "supplier_contracts"
+        start = time.perf_counter()
+        client = QdrantClient(url=qdrant_url())
         
         # Create collection if not exists
-        if not client.collection_exists(collection_name):
+        if not client.collection_exists(COLLECTION_NAME):
             client.create_collection(
-                collection_name=collection_name,
-                vectors_config=VectorParams(size=768, distance=Distance.COSINE),
+                collection_name=COLLECTION_NAME,
+                vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
             )
-            print(f"Created Qdrant collection: {collection_name}")
-
-        # Initialize Embeddings
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-        vector_store = QdrantVectorStore(
-            client=client,
-            collection_name=collection_name,
-            embedding=embeddings,
-        )
+            print(f"Created Qdrant collection: {COLLECTION_NAME}")
+        for field, schema in PAYLOAD_INDEXES.items():
+            client.create_payload_index(COLLECTION_NAME, field_name=field, field_schema=schema)
 
-        documents = []
-        pdf_files = [f for f in os.listdir(CONTRACTS_DIR) if f.endswith('.pdf')]
-        
-        for pdf_file in pdf_files:
-            file_path = os.path.join(CONTRACTS_DIR, pdf_file)
-            supplier_id = pdf_file.split('_')[1].split('.')[0]
-            
-            with open(file_path, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text()
-            
-            doc = Document(
-                page_content=text,
-                metadata={"supplier_id": int(supplier_id), "source": pdf_file}
-            )
-            documents.append(doc)
+        pdf_files = sorted(f for f in os.listdir(CONTRACTS_DIR) if f.endswith('.pdf'))
+        with ThreadPoolExecutor() as pool:
+            current = dict(zip(pdf_files, pool.map(file_hash, (os.path.join(CONTRACTS_DIR, f) for f in pdf_files))))
+        stored = existing_contract_hashes(client)
 
-        if documents:
-            vector_store.add_documents(documents)
-            print(f"Successfully ingested {len(documents)} contracts into Qdrant.")
-        else:
-            print("No contract documents found to ingest.")
+        changed = [f for f in pdf_files if stored.get(f) != current[f]]
+        removed = [source for source in stored if source not in current]
+        print(f"Contracts: {len(pdf_files)} on disk, {len(changed)} new or changed, {len(removed)} removed.")
+
+        # Old chunks of changed contracts go too, in case the clause count shrank
+        delete_contract_points(client, [f for f in changed if f in stored] + removed)
+        if changed or removed:
+            with db.get_sync_pool().connection() as conn:
+                exposure.publish_change(conn, "contracts")
+        if not changed:
+            return
+
+        embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+        chunk_count = 0
+        batch, pending = [], set()
+
+        with ProcessPoolExecutor(max_workers=PDF_WORKERS) as pdf_pool, \
+                ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY) as embed_pool:
+            paths = [os.path.join(CONTRACTS_DIR, f) for f in changed]
+            texts = pdf_pool.map(extract_pdf_text, paths, chunksize=16)
+            for pdf_file, text in zip(changed, texts):
+                supplier_id = int(pdf_file.split('_')[1].split('.')[0])
+                country_match = COUNTRY_LINE.search(text)
+                chunks = chunk_contract(text)
+                for index, chunk in enumerate(chunks):
+                    metadata = {
+                        "supplier_id": supplier_id,
+                        "country": country_match.group(1) if country_match else None,
+                        "source": pdf_file,
+                        "chunk_index": index,
+                        "chunk_count": len(chunks),
+                        "content_hash": current[pdf_file],
+                    }
+                    batch.append((contract_point_id(pdf_file, index), {"page_content": chunk, "metadata": metadata}))
+                    if len(batch) >= EMBED_BATCH_SIZE:
+                        # Keep a bounded number of embedding calls in flight
+                        if len(pending) >= EMBED_CONCURRENCY:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            chunk_count += sum(f.result() for f in done)
+                        pending.add(embed_pool.submit(embed_and_upsert, client, embeddings, batch))
+                        batch = []
+            if batch:
+                pending.add(embed_pool.submit(embed_and_upsert, client, embeddings, batch))
+            chunk_count += sum(f.result() for f in pending)
+
+        elapsed = time.perf_counter() - start
+        print(f"Successfully ingested {len(changed)} contracts ({chunk_count} clause chunks) into Qdrant in {elapsed:.1f}s.")
 
     except Exception as e:
         print(f"Error ingesting contracts: {e}")
@@ -108,5 +300,8 @@ def ingest_contracts():
 if __name__ == "__main__":
     print("Starting Data Ingestion...")
     ingest_suppliers()
+    ingest_shipments()
+    refresh_exposure()
     ingest_contracts()
+    db.close_sync_pool()
     print("Data Ingestion Complete.")
@@ -1,52 +1,157 @@
 import os
-import psycopg2
+import sys
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import db, history
+
 load_dotenv()
 print(f"User: {os.getenv('POSTGRES_USER')}")
 print(f"DB: {os.getenv('POSTGRES_DB')}")
 
 def create_tables():
     try:
-        conn = psycopg2.connect(
-            host=os.getenv("POSTGRES_HOST"),
-            database=os.getenv("POSTGRES_DB"),
-            user=os.getenv("POSTGRES_USER"),
-            password=os.getenv("POSTGRES_PASSWORD"),
-            port=os.getenv("POSTGRES_PORT")
-        )
-        cur = conn.cursor()
-
-        # Create Suppliers Table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS suppliers (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(100),
-                country VARCHAR(50),
-                category VARCHAR(50),
-                risk_tolerance_score INT
-            );
-        """)
-
-        # Create Shipments Table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS shipments (
-                id SERIAL PRIMARY KEY,
-                supplier_id INT,
-                value_usd DECIMAL,
-                status VARCHAR(20),
-                due_date DATE,
-                FOREIGN KEY (supplier_id) REFERENCES suppliers(id)
-            );
-        """)
-
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db.get_sync_pool().connection() as conn:
+            cur = conn.cursor()
+
+            # Create Suppliers Table
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS suppliers (
+                    id SERIAL PRIMARY KEY,
+                    name VARCHAR(100),
+                    country VARCHAR(50),
+                    category VARCHAR(50),
+                    risk_tolerance_score INT
+                );
+            """)
+
+            # Create Shipments Table
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS shipments (
+                    id SERIAL PRIMARY KEY,
+                    supplier_id INT,
+                    value_usd DECIMAL,
+                    status VARCHAR(20),
+                    due_date DATE,
+                    FOREIGN KEY (supplier_id) REFERENCES suppliers(id)
+                );
+            """)
+
+            # Secondary indexes for the supplier/shipment joins analysts run
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_suppliers_country ON suppliers (lower(country));")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_suppliers_category ON suppliers (category);")
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_shipments_supplier_status
+                ON shipments (supplier_id, status) INCLUDE (value_usd, due_date);
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_shipments_open_due
+                ON shipments (due_date) WHERE status IN ('Pending', 'In Transit', 'Delayed');
+            """)
+
+            # Exposure summary per country and category; refreshed by ingest_data.py
+            cur.execute("""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS supplier_exposure_summary AS
+                WITH per_supplier AS (
+                    SELECT s.id, s.country, s.category, s.risk_tolerance_score,
+                           COUNT(sh.id) AS shipments,
+                           COUNT(sh.id) FILTER (WHERE sh.status IN ('Pending', 'In Transit', 'Delayed')) AS open_shipments,
+                           COUNT(sh.id) FILTER (WHERE sh.status = 'Delayed') AS delayed_shipments,
+                           COALESCE(SUM(sh.value_usd) FILTER (WHERE sh.status IN ('Pending', 'In Transit', 'Delayed')), 0) AS open_value,
+                           MIN(sh.due_date) FILTER (WHERE sh.status IN ('Pending', 'In Transit', 'Delayed')) AS next_due
+                    FROM suppliers s
+                    LEFT JOIN shipments sh ON sh.supplier_id = s.id
+                    GROUP BY s.id
+                )
+                SELECT country, category,
+                       COUNT(*) AS supplier_count,
+                       SUM(shipments) AS shipment_count,
+                       SUM(open_shipments) AS open_shipments,
+                       SUM(delayed_shipments) AS delayed_shipments,
+                       SUM(open_value) AS open_value_usd,
+                       MIN(next_due) AS next_due_date,
+                       ROUND(AVG(risk_tolerance_score), 2) AS avg_risk_tolerance,
+                       MIN(risk_tolerance_score) AS min_risk_tolerance,
+                       MAX(risk_tolerance_score) AS max_risk_tolerance
+                FROM per_supplier
+                GROUP BY country, category;
+            """)
+            # REFRESH ... CONCURRENTLY requires a unique index
+            cur.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_exposure_summary_key
+                ON supplier_exposure_summary (country, category);
+            """)
+
+            # Bumped by ingestion so API processes know when cached data is stale
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    source VARCHAR(50) PRIMARY KEY,
+                    version BIGINT NOT NULL,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+            """)
+
+            # Latest risk picture per region, written by the background monitor
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS region_snapshots (
+                    id BIGSERIAL PRIMARY KEY,
+                    region VARCHAR(50) NOT NULL,
+                    risk_score REAL,
+                    impacted_suppliers JSONB,
+                    report TEXT,
+                    fingerprint VARCHAR(64),
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_region_snapshots_latest
+                ON region_snapshots (region, created_at DESC);
+            """)
+
+            # One row per conversation; checkpoints themselves live in the checkpointer's tables
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS agent_sessions (
+                    thread_id VARCHAR(100) PRIMARY KEY,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    last_used_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    turns INT NOT NULL DEFAULT 1
+                );
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_agent_sessions_last_used ON agent_sessions (last_used_at);")
+
+            # Every scan's region and supplier scores, partitioned by month for cheap retention.
+            # supplier_id is NULL on the row holding the region's overall score.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS risk_history (
+                    recorded_at TIMESTAMPTZ NOT NULL,
+                    region VARCHAR(50) NOT NULL,
+                    supplier_id INT,
+                    score REAL NOT NULL,
+                    level VARCHAR(6) NOT NULL,
+                    inputs_digest CHAR(16)
+                ) PARTITION BY RANGE (recorded_at);
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_risk_history_supplier
+                ON risk_history (supplier_id, recorded_at DESC);
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_risk_history_region
+                ON risk_history (region, recorded_at DESC);
+            """)
+            # Later months are created on first write
+            month = history.month_start(datetime.now(timezone.utc))
+            cur.execute(history.partition_ddl(month))
+            cur.execute(history.partition_ddl(history.next_month(month)))
+
+            cur.close()
         print("Database schema initialized successfully.")
 
     except Exception as e:
         print(f"Error initializing database: {e}")
+    finally:
+        db.close_sync_pool()
 
 if __name__ == "__main__":
     create_tables()
@@ -0,0 +1,303 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+
+from src import metrics
+
+# Priority classes: lower runs first. Interactive requests overtake queued background scans.
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Per-provider budgets; a value <= 0 disables that bucket.
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "1000"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+NEWS_API_RPM = float(os.getenv("NEWS_API_RPM", "60"))
+FX_API_RPM = float(os.getenv("FX_API_RPM", "60"))
+EXTERNAL_API_CONCURRENCY = int(os.getenv("EXTERNAL_API_CONCURRENCY", "4"))
+
+# Queued calls per provider before new interactive calls are shed; background calls shed at half.
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+# Longest a call may wait for a slot. Calls whose estimated wait is already longer are shed up front.
+MAX_WAIT = {
+    INTERACTIVE: float(os.getenv("ADMISSION_MAX_WAIT", "20")),
+    BACKGROUND: float(os.getenv("ADMISSION_BACKGROUND_MAX_WAIT", "120")),
+}
+
+# Retries of rate-limited or unavailable upstream calls, with full-jitter exponential backoff.
+RETRY_ATTEMPTS = int(os.getenv("ADMISSION_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("ADMISSION_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("ADMISSION_RETRY_MAX_DELAY", "8"))
+
+# Output tokens reserved per LLM call until the provider reports actual usage.
+EXPECTED_OUTPUT_TOKENS = 500
+
+# Exception class names (anywhere in the MRO) that mean "try again later"
+RETRYABLE_ERRORS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError"}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_priority: ContextVar[int] = ContextVar("sentinel_priority", default=INTERACTIVE)
+
+
+class Overloaded(Exception):
+    """
+    Raised instead of queueing when a provider can't take the call in time.
+    The API maps it to 503 with a Retry-After header.
+    """
+    def __init__(self, provider: str, reason: str, retry_after: float):
+        super().__init__(f"{provider} is overloaded ({reason}); retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = max(1.0, retry_after)
+
+
+@contextmanager
+def priority(level: int):
+    """
+    Runs the block, and every task it starts, at the given priority class.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute` / 60 per second up to `per_minute`.
+    The level may go negative when actual usage exceeds what was reserved.
+    """
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` can be taken (amounts above capacity wait for a full bucket).
+        """
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        need = min(amount, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+    def take(self, amount: float):
+        if not self.unlimited:
+            self.level -= amount
+
+    def drain(self):
+        if not self.unlimited:
+            self.level = min(self.level, 0.0)
+
+
+class Limiter:
+    """
+    Admission for one upstream provider: requests/min and tokens/min buckets,
+    a concurrency cap and a priority queue. Waiters are granted strictly by
+    (priority, arrival), so a queued interactive call always goes next.
+    """
+    def __init__(self, name: str, rpm: float, tpm: float = 0, concurrency: int = 4):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = max(1, concurrency)
+        self.in_flight = 0
+        # Moving average of how long a granted call holds its slot
+        self.average_hold = 0.0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def queue_depth(self, up_to_priority: Optional[int] = None) -> int:
+        return sum(
+            1 for prio, _, _, future in self._waiters
+            if not future.done() and (up_to_priority is None or prio <= up_to_priority)
+        )
+
+    def _update_gauges(self):
+        for prio, name in PRIORITY_NAMES.items():
+            metrics.admission_queue_depth.set(
+                sum(1 for p, _, _, f in self._waiters if p == prio and not f.done()), self.name, name
+            )
+        metrics.admission_in_flight.set(self.in_flight, self.name)
+
+    def estimated_wait(self, prio: int, tokens: float = 0) -> float:
+        """
+        Rough time until a new call at `prio` would be granted, from the calls
+        queued ahead of it and the buckets' refill rates.
+        """
+        ahead = [(t, f) for p, _, t, f in self._waiters if p <= prio and not f.done()]
+        now = time.monotonic()
+        slots = 0.0
+        if self.in_flight + len(ahead) >= self.concurrency:
+            slots = (self.in_flight + len(ahead) + 1 - self.concurrency) / self.concurrency * self.average_hold
+        return max(
+            slots,
+            self.requests.wait_time(len(ahead) + 1, now),
+            self.tokens.wait_time(sum(t for t, _ in ahead) + tokens, now),
+        )
+
+    def check(self, prio: Optional[int] = None, tokens: float = 0):
+        """
+        Raises Overloaded if a call at `prio` would be shed; lets callers refuse work early.
+        """
+        prio = current_priority() if prio is None else prio
+        limit = ADMISSION_MAX_QUEUE if prio == INTERACTIVE else ADMISSION_MAX_QUEUE // 2
+        depth = self.queue_depth(prio)
+        if depth >= limit:
+            self._shed(prio, "queue_full", self.estimated_wait(prio, tokens))
+        wait = self.estimated_wait(prio, tokens)
+        if wait > MAX_WAIT[prio]:
+            self._shed(prio, "wait", wait)
+
+    def _shed(self, prio: int, reason: str, retry_after: float):
+        metrics.admission_shed.inc(self.name, PRIORITY_NAMES[prio], reason)
+        raise Overloaded(self.name, reason, retry_after)
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            prio, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= self.concurrency:
+                break
+            now = time.monotonic()
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                break
+            heapq.heappop(self._waiters)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            future.set_result(None)
+        self._update_gauges()
+
+    async def acquire(self, tokens: float = 0):
+        prio = current_priority()
+        self.check(prio, tokens)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [prio, next(self._sequence), tokens, future])
+        self._dispatch()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(future, MAX_WAIT[prio])
+        except asyncio.TimeoutError:
+            self._update_gauges()
+            self._shed(prio, "timeout", self.estimated_wait(prio, tokens))
+        except BaseException:
+            # Granted just as the caller was cancelled: hand the slot back
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        metrics.admission_wait.observe(time.monotonic() - start, self.name, PRIORITY_NAMES[prio])
+
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def settle(self, reserved: float, actual: Optional[float]):
+        """
+        Corrects the token bucket once the provider reports actual usage.
+        """
+        if actual is not None:
+            self.tokens.take(actual - reserved)
+
+    @asynccontextmanager
+    async def slot(self, tokens: float = 0):
+        await self.acquire(tokens)
+        start = time.monotonic()
+        try:
+            yield self
+        finally:
+            self.average_hold = 0.8 * self.average_hold + 0.2 * (time.monotonic() - start)
+            self.release()
+
+
+gemini = Limiter("gemini", GEMINI_RPM, GEMINI_TPM, GEMINI_CONCURRENCY)
+newsapi = Limiter("newsapi", NEWS_API_RPM, concurrency=EXTERNAL_API_CONCURRENCY)
+fx_api = Limiter("fx", FX_API_RPM, concurrency=EXTERNAL_API_CONCURRENCY)
+LIMITERS = {limiter.name: limiter for limiter in (gemini, newsapi, fx_api)}
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, httpx.TransportError):
+        return True
+    if any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status in RETRYABLE_STATUS
+
+async def call(
+    limiter: Limiter,
+    fn: Callable[[], Awaitable],
+    tokens: float = 0,
+    usage: Optional[Callable[[object], Optional[float]]] = None,
+):
+    """
+    Runs `fn` under `limiter`, retrying transient upstream errors with
+    full-jitter backoff. A provider that is still rate limiting after the
+    last retry surfaces as Overloaded rather than a generic error. An httpx
+    response with a retryable status counts as a transient error too.
+    `usage` extracts actual token usage from the result to settle the reservation.
+    """
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        try:
+            async with limiter.slot(tokens):
+                result = await fn()
+                # httpx hands back 429s and 5xx as responses instead of raising them
+                if isinstance(result, httpx.Response) and result.status_code in RETRYABLE_STATUS:
+                    result.raise_for_status()
+                if usage is not None:
+                    limiter.settle(tokens, usage(result))
+                return result
+        except Overloaded:
+            raise
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            # Everyone backs off, not just this caller
+            limiter.requests.drain()
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+            if attempt == RETRY_ATTEMPTS:
+                metrics.admission_shed.inc(limiter.name, PRIORITY_NAMES[current_priority()], "upstream")
+                raise Overloaded(limiter.name, f"upstream error: {type(e).__name__}", RETRY_MAX_DELAY) from e
+            metrics.admission_retries.inc(limiter.name)
+            await asyncio.sleep(delay)
+
+def stats() -> dict:
+    return {
+        name: {
+            "in_flight": limiter.in_flight,
+            "queued": {label: sum(1 for p, _, _, f in limiter._waiters if p == prio and not f.done())
+                       for prio, label in PRIORITY_NAMES.items()},
+        }
+        for name, limiter in LIMITERS.items()
+    }
@@ -0,0 +1,413 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+_MISSING = object()
+
+# Every named cache registers itself here so its counters can be exposed by the API.
+CACHES: Dict[str, "TTLCache"] = {}
+
+
+class CacheStats:
+    """
+    Hit/miss counters for a single cache. Increments are not locked; the
+    numbers are for dashboards, not accounting.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+# --- Backends ---
+
+class MemoryBackend:
+    """
+    In-process LRU store. Entries are (expires_at, value) tuples.
+    """
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, expires_at: float) -> int:
+        """
+        Stores a value and returns how many entries were evicted to make room.
+        """
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """
+    On-disk store in a local SQLite file, so a restarted process or a second
+    worker on the same host starts warm. Values must be JSON-serializable.
+    LRU order is tracked with an access timestamp; the store is bounded by
+    entry count and, optionally, by total payload bytes.
+    """
+    def __init__(self, path: str, max_entries: int = 1024, max_bytes: Optional[int] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        # WAL lets several worker processes read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+        return row[1], json.loads(row[0])
+
+    def set(self, key: str, value: Any, expires_at: float) -> int:
+        payload = json.dumps(value, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, time.time()),
+            )
+            evicted = self._evict()
+            self._conn.commit()
+        return evicted
+
+    def _evict(self) -> int:
+        evicted = self._conn.execute(
+            "DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),)
+        ).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute("""
+                DELETE FROM cache_entries WHERE key IN (
+                    SELECT key FROM cache_entries ORDER BY accessed_at ASC LIMIT ?
+                )
+            """, (excess,))
+            evicted += excess
+        if self.max_bytes:
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM cache_entries"
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                victims = []
+                for key, size in self._conn.execute(
+                    "SELECT key, LENGTH(value) FROM cache_entries ORDER BY accessed_at ASC"
+                ):
+                    if total <= self.max_bytes:
+                        break
+                    victims.append((key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM cache_entries WHERE key = ?", victims)
+                evicted += len(victims)
+        return evicted
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+
+class TieredBackend:
+    """
+    Memory in front of disk: hits are served from memory, misses fall through
+    to disk and are promoted.
+    """
+    def __init__(self, front: MemoryBackend, back: SQLiteBackend):
+        self.front = front
+        self.back = back
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        entry = self.front.get(key)
+        if entry is None:
+            entry = self.back.get(key)
+            if entry is not None:
+                self.front.set(key, entry[1], entry[0])
+        return entry
+
+    def set(self, key: str, value: Any, expires_at: float) -> int:
+        self.front.set(key, value, expires_at)
+        return self.back.set(key, value, expires_at)
+
+    def delete(self, key: str):
+        self.front.delete(key)
+        self.back.delete(key)
+
+    def clear(self):
+        self.front.clear()
+        self.back.clear()
+
+    def __len__(self):
+        return len(self.back)
+
+
+def make_backend(name: str, kind: str = "memory", max_entries: int = 256):
+    """
+    Builds a backend by kind: "memory" (default) or "disk" (memory in front of
+    a SQLite file under CACHE_DIR).
+    """
+    if kind == "disk":
+        path = os.path.join(CACHE_DIR, f"{name}.sqlite")
+        return TieredBackend(MemoryBackend(max_entries), SQLiteBackend(path, max_entries))
+    return MemoryBackend(max_entries)
+
+# --- Cache ---
+
+class TTLCache:
+    """
+    A named TTL cache over a pluggable backend with single-flight loading:
+    concurrent misses for the same key share one loader call.
+    """
+    def __init__(self, name: str, ttl: float, backend=None):
+        self.name = name
+        self.ttl = ttl
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.stats = CacheStats()
+        self._inflight: Dict[str, Future] = {}
+        self._loads: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    def _lookup(self, key: str) -> Any:
+        try:
+            entry = self.backend.get(key)
+        except Exception:
+            self.stats.errors += 1
+            return _MISSING
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at < time.time():
+            return _MISSING
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        return value
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        """
+        Like get, but doesn't count towards the hit/miss stats.
+        """
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        try:
+            expires_at = time.time() + (self.ttl if ttl is None else ttl)
+            self.stats.evictions += self.backend.set(key, value, expires_at)
+        except Exception:
+            # A broken disk cache must never fail the request it was meant to speed up
+            self.stats.errors += 1
+
+    def invalidate(self, key: Optional[str] = None):
+        if key is None:
+            self.backend.clear()
+        else:
+            self.backend.delete(key)
+
+    def _join_or_lead(self, key: str) -> Tuple[bool, Future]:
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        return leader, future
+
+    def _finish(self, key: str):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _lead(self, key: str, future: Future, load: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        Runs `load` as its own task and settles `future` with the outcome. The
+        leader awaits the task through asyncio.shield, so a leader that is
+        cancelled or times out leaves the load running for its waiters.
+        """
+        async def run():
+            try:
+                value = await load()
+            except asyncio.CancelledError:
+                self._finish(key)
+                future.cancel()
+                raise
+            except BaseException as e:
+                self._finish(key)
+                future.set_exception(e)
+                raise
+            self._finish(key)
+            future.set_result(value)
+            return value
+
+        task = asyncio.ensure_future(run())
+        # The loop only holds weak references to tasks
+        self._loads.add(task)
+        task.add_done_callback(self._loads.discard)
+        return task
+
+    async def _follow(self, future: Future) -> Any:
+        """
+        Waits for another caller's load. Returns _MISSING if the load itself was
+        cancelled, so the caller can take over as leader.
+        """
+        try:
+            # Shielded so a waiter giving up doesn't cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            if future.cancelled():
+                return _MISSING
+            raise
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for `key`, or calls `loader` once and caches its
+        result. Exceptions from the loader are propagated to every waiter and
+        are not cached.
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.stats.hits += 1
+            return value
+
+        leader, future = self._join_or_lead(key)
+        if not leader:
+            self.stats.coalesced += 1
+            return future.result()
+
+        try:
+            # Another leader may have filled the cache between our lookup and the lock
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.stats.misses += 1
+                value = loader()
+                self.set(key, value)
+            else:
+                self.stats.hits += 1
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._finish(key)
+
+    async def aget_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async counterpart of get_or_load: `loader` is a coroutine function, and
+        waiters on the same key (from any task or thread) share its result.
+        Cancelling one waiter, the leader included, never cancels the others.
+        """
+        while True:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.stats.hits += 1
+                return value
+
+            leader, future = self._join_or_lead(key)
+            if leader:
+                return await asyncio.shield(self._lead(key, future, lambda: self._load(key, loader)))
+
+            self.stats.coalesced += 1
+            value = await self._follow(future)
+            if value is not _MISSING:
+                return value
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        # Another leader may have filled the cache between our lookup and the lock
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.stats.misses += 1
+            value = await loader()
+            self.set(key, value)
+        else:
+            self.stats.hits += 1
+        return value
+
+    def info(self) -> dict:
+        return {"ttl": self.ttl, "entries": len(self.backend), **self.stats.as_dict()}
+
+
+def normalize_key(text: str) -> str:
+    """
+    Case- and whitespace-insensitive cache key for free-text queries.
+    """
+    return " ".join(text.lower().split())
+
+def cache_stats() -> dict:
+    return {name: cache.info() for name, cache in CACHES.items()}
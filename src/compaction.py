@@ -0,0 +1,144 @@
+import os
+import json
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, AnyMessage, ToolMessage
+
+# Token budget for the whole message history sent to the LLM.
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "8000"))
+# Any single tool output is digested down to this many tokens; sql_tool caps its results to fit.
+TOOL_OUTPUT_MAX_TOKENS = int(os.getenv("TOOL_OUTPUT_MAX_TOKENS", "4500"))
+# Older tool outputs shrink to this size when the history is over budget.
+TOOL_OUTPUT_STUB_TOKENS = 100
+
+# Rough but stable estimate; good enough for budgeting without a tokenizer round trip.
+CHARS_PER_TOKEN = 4
+
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part if isinstance(part, str) else str(part.get("text", ""))
+        for part in content or [] if isinstance(part, (str, dict))
+    )
+
+def estimate_tokens(messages: List[AnyMessage]) -> int:
+    total = 0
+    for message in messages:
+        total += len(_text(message.content))
+        for call in getattr(message, "tool_calls", None) or []:
+            total += len(json.dumps(call.get("args", {}), default=str))
+    return total // CHARS_PER_TOKEN + len(messages)
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """
+    Keeps the head and tail of `text` with an explicit marker in between.
+    """
+    if len(text) <= max_chars:
+        return text
+    head = int(max_chars * 0.7)
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n[... {omitted} characters omitted ...]\n{text[-tail:]}"
+
+def digest_sql_output(text: str, max_chars: int) -> str:
+    """
+    Keeps the CSV header, as many whole rows as fit and any status footer,
+    and states how many rows were dropped.
+    """
+    lines = text.split("\n")
+    footer = []
+    while len(lines) > 1 and lines[-1].startswith(("[", "(")):
+        footer.insert(0, lines.pop())
+    if len(lines) < 2:
+        return truncate_text(text, max_chars)
+
+    header, rows = lines[0], lines[1:]
+    kept = []
+    size = len(header) + sum(len(line) + 1 for line in footer) + 80
+    for row in rows:
+        if size + len(row) + 1 > max_chars:
+            break
+        kept.append(row)
+        size += len(row) + 1
+    if len(kept) == len(rows):
+        return text
+    marker = f"[{len(rows) - len(kept)} of {len(rows)} returned rows omitted to save context]"
+    return "\n".join([header] + kept + [marker] + footer)
+
+def compact_tool_message(message: ToolMessage, max_tokens: int) -> ToolMessage:
+    text = _text(message.content)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return message
+    if message.name == "sql_tool":
+        compacted = digest_sql_output(text, max_chars)
+    else:
+        compacted = truncate_text(text, max_chars)
+    return message.model_copy(update={"content": compacted})
+
+def drop_superseded_rounds(messages: List[AnyMessage]) -> List[AnyMessage]:
+    """
+    Removes tool calls (and their results) that were repeated later with
+    identical arguments; only the latest result is kept.
+    """
+    latest = {}
+    for message in messages:
+        if isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                key = (call["name"], json.dumps(call.get("args", {}), sort_keys=True, default=str))
+                latest[key] = call.get("id")
+
+    keep_ids = set(latest.values())
+    result = []
+    for message in messages:
+        if isinstance(message, AIMessage) and message.tool_calls:
+            calls = [call for call in message.tool_calls if call.get("id") in keep_ids]
+            if len(calls) == len(message.tool_calls):
+                result.append(message)
+            elif calls or _text(message.content):
+                result.append(message.model_copy(update={"tool_calls": calls}))
+        elif isinstance(message, ToolMessage) and message.tool_call_id not in keep_ids:
+            continue
+        else:
+            result.append(message)
+    return result
+
+def compact_history(
+    messages: List[AnyMessage],
+    budget_tokens: int = HISTORY_TOKEN_BUDGET,
+    tool_max_tokens: int = TOOL_OUTPUT_MAX_TOKENS,
+) -> List[AnyMessage]:
+    """
+    Bounds the history: drops superseded tool rounds, digests oversized tool
+    outputs, then shrinks the oldest tool outputs until the estimate fits the budget.
+    The most recent tool results are never shrunk below `tool_max_tokens`.
+    """
+    messages = drop_superseded_rounds(messages)
+    messages = [
+        compact_tool_message(m, tool_max_tokens) if isinstance(m, ToolMessage) else m
+        for m in messages
+    ]
+
+    # Tool results after the last AIMessage are what the next turn is about to read
+    last_ai = max((i for i, m in enumerate(messages) if isinstance(m, AIMessage)), default=-1)
+    for i, message in enumerate(messages):
+        if estimate_tokens(messages) <= budget_tokens:
+            break
+        if i < last_ai and isinstance(message, ToolMessage):
+            messages[i] = compact_tool_message(message, TOOL_OUTPUT_STUB_TOKENS)
+    return messages
+
+def turn_usage(node: str, sent: List[AnyMessage], response: Optional[AIMessage] = None) -> dict:
+    """
+    Per-LLM-call token report: our estimate of what was sent plus the provider's counts.
+    """
+    usage = (getattr(response, "usage_metadata", None) or {}) if response is not None else {}
+    return {
+        "node": node,
+        "messages": len(sent),
+        "estimated_input_tokens": estimate_tokens(sent),
+        "input_tokens": usage.get("input_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+    }
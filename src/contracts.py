@@ -0,0 +1,175 @@
+import os
+import uuid
+from typing import Dict, Iterable, List, Sequence
+
+from dotenv import load_dotenv
+
+from src.cache import TTLCache, make_backend, normalize_key
+
+load_dotenv()
+
+COLLECTION_NAME = "supplier_contracts"
+EMBEDDING_MODEL = "models/text-embedding-004"
+VECTOR_SIZE = 768
+
+# Fixed namespace so a (source, chunk) pair always maps to the same point id.
+POINT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "supply-chain-sentinel/supplier_contracts")
+
+# Payload fields searches filter on; indexed so filtering happens before the vector scan.
+PAYLOAD_INDEXES = {
+    "metadata.supplier_id": "integer",
+    "metadata.country": "keyword",
+}
+
+# Query embeddings are deterministic, so repeated questions skip the embedding API.
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "1024"))
+EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "memory")
+# Clauses returned per supplier in a batched lookup.
+CONTRACT_CLAUSES_PER_SUPPLIER = int(os.getenv("CONTRACT_CLAUSES_PER_SUPPLIER", "2"))
+
+embedding_cache = TTLCache(
+    "embeddings",
+    ttl=EMBEDDING_CACHE_TTL,
+    backend=make_backend("embeddings", EMBEDDING_CACHE_BACKEND, EMBEDDING_CACHE_MAX_ENTRIES),
+)
+
+# qdrant_client and the Gemini embeddings client are imported on first use;
+# together they account for most of the API's import time.
+_client = None
+_embeddings = None
+_indexes_ready = False
+
+
+def contract_point_id(source: str, chunk_index: int) -> str:
+    """
+    Deterministic Qdrant point id for one chunk of one contract file, so
+    re-ingesting a contract overwrites its points instead of duplicating them.
+    """
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{source}:{chunk_index}"))
+
+def qdrant_url() -> str:
+    return os.getenv("QDRANT_URL", "http://localhost:6333")
+
+def get_client():
+    """
+    Returns the process-wide async Qdrant client.
+    """
+    global _client
+    if _client is None:
+        from qdrant_client import AsyncQdrantClient
+        _client = AsyncQdrantClient(url=qdrant_url())
+    return _client
+
+async def close_client():
+    global _client, _indexes_ready
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _indexes_ready = False
+
+async def ensure_payload_indexes():
+    """
+    Creates the payload indexes once per process; creating an existing index is a no-op.
+    """
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    client = get_client()
+    for field, schema in PAYLOAD_INDEXES.items():
+        await client.create_payload_index(COLLECTION_NAME, field_name=field, field_schema=schema)
+    _indexes_ready = True
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        _embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+    return _embeddings
+
+async def embed_query(text: str) -> List[float]:
+    """
+    Embeds a search query through the embedding cache.
+    """
+    embeddings = get_embeddings()
+    return await embedding_cache.aget_or_load(normalize_key(text), lambda: embeddings.aembed_query(text))
+
+def contract_filter(supplier_ids: Iterable[int] = (), countries: Iterable[str] = ()):
+    from qdrant_client import models
+
+    must = []
+    supplier_ids = list(supplier_ids)
+    countries = list(countries)
+    if supplier_ids:
+        must.append(models.FieldCondition(key="metadata.supplier_id", match=models.MatchAny(any=supplier_ids)))
+    if countries:
+        must.append(models.FieldCondition(key="metadata.country", match=models.MatchAny(any=countries)))
+    return models.Filter(must=must) if must else None
+
+def _clause(point) -> dict:
+    payload = point.payload or {}
+    metadata = payload.get("metadata", {})
+    return {
+        "supplier_id": metadata.get("supplier_id"),
+        "country": metadata.get("country"),
+        "source": metadata.get("source"),
+        "score": round(point.score, 3),
+        "text": payload.get("page_content", ""),
+    }
+
+async def search_contracts(
+    query: str,
+    supplier_ids: Sequence[int] = (),
+    countries: Sequence[str] = (),
+    limit: int = 5,
+) -> List[dict]:
+    """
+    One vector search, pre-filtered to the given suppliers and/or countries.
+    """
+    await ensure_payload_indexes()
+    vector = await embed_query(query)
+    response = await get_client().query_points(
+        COLLECTION_NAME,
+        query=vector,
+        query_filter=contract_filter(supplier_ids, countries),
+        limit=limit,
+        with_payload=True,
+    )
+    return [_clause(point) for point in response.points]
+
+async def search_contracts_by_supplier(
+    query: str,
+    supplier_ids: Sequence[int],
+    per_supplier: int = CONTRACT_CLAUSES_PER_SUPPLIER,
+) -> Dict[int, List[dict]]:
+    """
+    Top clauses for each supplier, fetched in a single batched request so every
+    supplier is represented regardless of how the others score.
+    """
+    from qdrant_client import models
+
+    supplier_ids = list(dict.fromkeys(int(s) for s in supplier_ids))
+    if not supplier_ids:
+        return {}
+    await ensure_payload_indexes()
+    vector = await embed_query(query)
+    requests = [
+        models.QueryRequest(
+            query=vector,
+            filter=contract_filter([supplier_id]),
+            limit=per_supplier,
+            with_payload=True,
+        )
+        for supplier_id in supplier_ids
+    ]
+    responses = await get_client().query_batch_points(COLLECTION_NAME, requests=requests)
+    return {
+        supplier_id: [_clause(point) for point in response.points]
+        for supplier_id, response in zip(supplier_ids, responses)
+    }
+
+def format_clauses(clauses: Iterable[dict]) -> str:
+    return "\n\n".join(
+        f"[supplier {c['supplier_id']}, {c['country']}, {c['source']}, score {c['score']}]\n{c['text']}"
+        for c in clauses
+    )
@@ -0,0 +1,164 @@
+import os
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Optional, Sequence
+
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pool sizing is configurable per deployment; defaults suit a single API worker.
+POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", "2"))
+POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "10"))
+POOL_MAX_IDLE = float(os.getenv("POSTGRES_POOL_MAX_IDLE", "300"))
+
+_pool: Optional[AsyncConnectionPool] = None
+_sync_pool: Optional[ConnectionPool] = None
+_open_lock = asyncio.Lock()
+
+
+def get_conninfo() -> str:
+    """
+    Builds the libpq connection string from the POSTGRES_* environment variables.
+    """
+    return make_conninfo(
+        host=os.getenv("POSTGRES_HOST"),
+        dbname=os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        port=os.getenv("POSTGRES_PORT"),
+    )
+
+# --- Async pool (API server) ---
+
+def get_pool() -> AsyncConnectionPool:
+    """
+    Returns the process-wide async connection pool, creating it (closed) on first use.
+    """
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            conninfo=get_conninfo(),
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            timeout=POOL_TIMEOUT,
+            max_idle=POOL_MAX_IDLE,
+            # Validate connections before handing them out so a restarted
+            # Postgres doesn't surface as a failed tool call.
+            check=AsyncConnectionPool.check_connection,
+            name="sentinel",
+            open=False,
+        )
+    return _pool
+
+async def open_pool(wait: bool = True) -> AsyncConnectionPool:
+    """
+    Opens the async pool and, when `wait` is set, blocks until `min_size`
+    connections are established so the first request doesn't pay for the handshake.
+    A pool that fails to open can't be reopened, so it is discarded and the
+    next call starts a fresh one.
+    """
+    global _pool
+    async with _open_lock:
+        pool = get_pool()
+        if pool.closed:
+            try:
+                await pool.open(wait=wait, timeout=POOL_TIMEOUT)
+            except BaseException:
+                await pool.close()
+                _pool = None
+                raise
+        return pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None and not _pool.closed:
+        await _pool.close()
+    _pool = None
+
+@asynccontextmanager
+async def connection():
+    """
+    Borrows a connection from the async pool. The transaction is committed on
+    a clean exit and rolled back on error before the connection is returned.
+    """
+    pool = get_pool()
+    if pool.closed:
+        pool = await open_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+async def fetch_all(query: str, params: Optional[Sequence[Any]] = None):
+    """
+    Runs a query and returns (column_names, rows).
+    """
+    async with connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, params)
+            colnames = [desc[0] for desc in cur.description] if cur.description else []
+            rows = await cur.fetchall() if cur.description else []
+    return colnames, rows
+
+@asynccontextmanager
+async def server_cursor(query: str, params: Optional[Sequence[Any]] = None, itersize: int = 500, read_only: bool = True):
+    """
+    Executes `query` through a named (server-side) cursor and yields it, so
+    rows are pulled from Postgres in `itersize` batches as the caller iterates
+    instead of materializing the whole result set.
+    """
+    async with connection() as conn:
+        if read_only:
+            await conn.execute("SET TRANSACTION READ ONLY")
+        async with conn.cursor(name=f"sentinel_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            await cur.execute(query, params)
+            yield cur
+
+async def check_health() -> dict:
+    """
+    Round-trips a trivial query through the pool and reports pool statistics.
+    """
+    pool = get_pool()
+    if pool.closed:
+        return {"status": "closed"}
+    try:
+        await fetch_all("SELECT 1")
+        status = "ok"
+    except Exception as e:
+        status = f"error: {e}"
+    stats = pool.get_stats()
+    return {
+        "status": status,
+        "pool_size": stats.get("pool_size", 0),
+        "pool_available": stats.get("pool_available", 0),
+        "requests_waiting": stats.get("requests_waiting", 0),
+    }
+
+# --- Sync pool (scripts) ---
+
+def get_sync_pool() -> ConnectionPool:
+    """
+    Returns a blocking connection pool for the setup/ingestion scripts.
+    """
+    global _sync_pool
+    if _sync_pool is None:
+        _sync_pool = ConnectionPool(
+            conninfo=get_conninfo(),
+            min_size=1,
+            max_size=POOL_MAX_SIZE,
+            timeout=POOL_TIMEOUT,
+            check=ConnectionPool.check_connection,
+            name="sentinel-scripts",
+            open=True,
+        )
+    return _sync_pool
+
+def close_sync_pool():
+    global _sync_pool
+    if _sync_pool is not None:
+        _sync_pool.close()
+    _sync_pool = None
@@ -0,0 +1,115 @@
+import os
+import asyncio
+from typing import Dict, List, Optional
+
+import psycopg
+
+from src import db
+from src.cache import TTLCache
+
+# Ingestion NOTIFYs this channel after it changes data; the API drops its cached reference data.
+DATA_CHANGED_CHANNEL = "sentinel_data_changed"
+# Upper bound on staleness if a notification is missed (e.g. while the listener reconnects).
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+LISTEN_RETRY_SECONDS = 5
+
+EXPOSURE_COLUMNS = [
+    "country", "category", "supplier_count", "shipment_count", "open_shipments",
+    "delayed_shipments", "open_value_usd", "next_due_date",
+    "avg_risk_tolerance", "min_risk_tolerance", "max_risk_tolerance",
+]
+
+reference_cache = TTLCache("reference", ttl=REFERENCE_CACHE_TTL)
+
+
+async def _load_regions() -> List[str]:
+    _, rows = await db.fetch_all(
+        "SELECT DISTINCT country FROM supplier_exposure_summary WHERE country IS NOT NULL ORDER BY country ASC"
+    )
+    return [row[0] for row in rows]
+
+async def _load_exposure() -> List[dict]:
+    _, rows = await db.fetch_all(
+        f"SELECT {', '.join(EXPOSURE_COLUMNS)} FROM supplier_exposure_summary ORDER BY open_value_usd DESC"
+    )
+    summary = []
+    for row in rows:
+        entry = dict(zip(EXPOSURE_COLUMNS, row))
+        entry["open_value_usd"] = float(entry["open_value_usd"] or 0)
+        if entry["avg_risk_tolerance"] is not None:
+            entry["avg_risk_tolerance"] = float(entry["avg_risk_tolerance"])
+        if entry["next_due_date"] is not None:
+            entry["next_due_date"] = entry["next_due_date"].isoformat()
+        summary.append(entry)
+    return summary
+
+async def _load_data_versions() -> Dict[str, int]:
+    _, rows = await db.fetch_all("SELECT source, version FROM data_versions")
+    return {source: version for source, version in rows}
+
+async def get_regions() -> List[str]:
+    """
+    Supplier countries, served from memory until ingestion reports a change.
+    """
+    return await reference_cache.aget_or_load("regions", _load_regions)
+
+async def get_exposure(country: Optional[str] = None) -> List[dict]:
+    """
+    Per-country/per-category exposure rows from the materialized summary,
+    largest open shipment value first.
+    """
+    summary = await reference_cache.aget_or_load("exposure", _load_exposure)
+    if country is None:
+        return summary
+    country = country.lower()
+    return [row for row in summary if (row["country"] or "").lower() == country]
+
+async def get_data_versions() -> Dict[str, int]:
+    """
+    Ingestion version per data source (suppliers, shipments, contracts, exposure).
+    """
+    return await reference_cache.aget_or_load("data_versions", _load_data_versions)
+
+def invalidate():
+    reference_cache.invalidate()
+
+async def listen_for_changes():
+    """
+    Runs for the life of the API. LISTENs on a dedicated connection (not a pooled
+    one, which would be handed to other requests) and clears the reference cache
+    on every notification, reconnecting after errors.
+    """
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(db.get_conninfo(), autocommit=True) as conn:
+                await conn.execute(f"LISTEN {DATA_CHANGED_CHANNEL}")
+                # Changes made while we weren't listening would otherwise go unnoticed
+                invalidate()
+                async for _ in conn.notifies():
+                    invalidate()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Data change listener error: {e}; retrying in {LISTEN_RETRY_SECONDS}s")
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+# --- Ingestion side (sync connections) ---
+
+def publish_change(conn, source: str):
+    """
+    Bumps the version of `source` and notifies API processes. Both take effect
+    when the caller's transaction commits.
+    """
+    conn.execute(
+        """
+        INSERT INTO data_versions (source, version, updated_at) VALUES (%s, 1, now())
+        ON CONFLICT (source) DO UPDATE SET version = data_versions.version + 1, updated_at = now()
+        """,
+        (source,),
+    )
+    conn.execute("SELECT pg_notify(%s, %s)", (DATA_CHANGED_CHANNEL, source))
+
+def refresh_exposure_summary(conn):
+    # CONCURRENTLY keeps the summary readable while it is rebuilt
+    conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY supplier_exposure_summary")
+    publish_change(conn, "exposure")
@@ -0,0 +1,115 @@
+import os
+import time
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+
+from src import admission
+from src.cache import TTLCache, make_backend
+from src.http_client import get_client
+
+load_dotenv()
+
+# One full rate table is fetched against this currency; every other pair is derived from it.
+FX_PIVOT_CURRENCY = os.getenv("FX_PIVOT_CURRENCY", "USD")
+# How long a fetched table is considered fresh, in seconds.
+FX_SNAPSHOT_TTL = float(os.getenv("FX_SNAPSHOT_TTL", "3600"))
+FX_CACHE_BACKEND = os.getenv("FX_CACHE_BACKEND", "memory")
+# Overridable so benchmarks can point at a local stub.
+FX_API_BASE_URL = os.getenv("FX_API_BASE_URL", "https://v6.exchangerate-api.com/v6")
+
+# Local currency per supplier country, used to turn rate moves into country risk signals.
+COUNTRY_CURRENCIES = {
+    "USA": "USD", "Japan": "JPY", "Taiwan": "TWD", "Ukraine": "UAH",
+    "China": "CNY", "South Korea": "KRW", "Vietnam": "VND", "India": "INR",
+    "Germany": "EUR", "France": "EUR", "Italy": "EUR", "Netherlands": "EUR",
+    "Mexico": "MXN", "Brazil": "BRL", "Thailand": "THB", "Malaysia": "MYR",
+    "Indonesia": "IDR", "Turkey": "TRY", "United Kingdom": "GBP", "Canada": "CAD",
+}
+
+fx_snapshots = TTLCache(
+    "fx",
+    ttl=FX_SNAPSHOT_TTL,
+    backend=make_backend("fx", FX_CACHE_BACKEND, max_entries=8),
+)
+
+
+async def fetch_snapshot(base_currency: str, api_key: str) -> dict:
+    """
+    Downloads the whole conversion table for `base_currency`.
+    Raises ValueError on API errors so they are never cached.
+    """
+    url = f"{FX_API_BASE_URL}/{api_key}/latest/{base_currency}"
+    response = await admission.call(admission.fx_api, lambda: get_client().get(url))
+    data = response.json()
+
+    if data.get("result") != "success":
+        raise ValueError(f"FX API Error: {data.get('error-type')}")
+
+    return {
+        "base": base_currency,
+        "rates": data.get("conversion_rates", {}),
+        "fetched_at": time.time(),
+    }
+
+# The two most recent tables fetched by this process, for computing rate moves.
+_latest_snapshot = None
+_previous_snapshot = None
+
+async def _load_snapshot(api_key: str) -> dict:
+    global _latest_snapshot, _previous_snapshot
+    snapshot = await fetch_snapshot(FX_PIVOT_CURRENCY, api_key)
+    if _latest_snapshot is not None:
+        _previous_snapshot = _latest_snapshot
+    _latest_snapshot = snapshot
+    return snapshot
+
+async def get_snapshot(api_key: str) -> dict:
+    """
+    Returns the current pivot-currency snapshot, fetching it at most once per freshness window.
+    """
+    return await fx_snapshots.aget_or_load(FX_PIVOT_CURRENCY, lambda: _load_snapshot(api_key))
+
+def snapshot_time() -> Optional[float]:
+    """
+    When the current pivot-currency snapshot was fetched, or None if there is no fresh one.
+    """
+    snapshot = fx_snapshots.peek(FX_PIVOT_CURRENCY)
+    return snapshot["fetched_at"] if snapshot else None
+
+def rate_change(currency: str) -> float:
+    """
+    Relative move of `currency` against the pivot between the two latest
+    snapshots (0.05 = 5% weaker). Zero until a second table has been fetched.
+    """
+    if _latest_snapshot is None or _previous_snapshot is None:
+        return 0.0
+    current = _latest_snapshot["rates"].get(currency)
+    previous = _previous_snapshot["rates"].get(currency)
+    if not current or not previous:
+        return 0.0
+    return (current - previous) / previous
+
+def cross_rate(snapshot: dict, base_currency: str, target_currency: str):
+    """
+    Derives base→target through the snapshot's pivot currency. Returns None if
+    either currency is missing from the table.
+    """
+    rates = snapshot["rates"]
+    base_rate = 1.0 if base_currency == snapshot["base"] else rates.get(base_currency)
+    target_rate = 1.0 if target_currency == snapshot["base"] else rates.get(target_currency)
+    if not base_rate or not target_rate:
+        return None
+    return target_rate / base_rate
+
+def parse_pairs(base_currency: str, target_currency: str, pairs: str = "") -> List[Tuple[str, str]]:
+    """
+    Expands the fx_tool arguments into (base, target) pairs. `target_currency`
+    may be a comma-separated list; `pairs` accepts "JPY/TWD, EUR/USD".
+    """
+    base_currency = base_currency.strip().upper()
+    result = [(base_currency, t.strip().upper()) for t in target_currency.split(",") if t.strip()]
+    for pair in pairs.split(","):
+        if "/" in pair:
+            base, target = pair.split("/", 1)
+            result.append((base.strip().upper(), target.strip().upper()))
+    return list(dict.fromkeys(result))
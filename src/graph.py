@@ -1,19 +1,116 @@
+import io
 import os
-from typing import Literal
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+import re
+import csv
+import time
+import asyncio
+from typing import Dict, List, Literal, Optional
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 
 from src.state import AgentState
-from src.tools import sql_tool, news_tool, fx_tool
+from src.tools import sql_tool, news_tool, fx_tool, contract_search
+from src.llm_cache import get_llm_cache
+from src import admission, contracts, exposure, fx, history, metrics, scoring
+from src.compaction import estimate_tokens, turn_usage
 
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
+_llm = None
+_graph = None
+
+# Routine region scans are scored locally; the LLM only writes the narrative.
+SCORING_FAST_PATH = os.getenv("SCORING_FAST_PATH", "true").lower() == "true"
+
+# Wall-clock limit per tool call, in seconds. A timed-out call becomes an error
+# result for the model instead of stalling the whole turn.
+TOOL_TIMEOUTS = {
+    "sql_tool": float(os.getenv("SQL_TOOL_TIMEOUT", "15")),
+    "news_tool": float(os.getenv("NEWS_TOOL_TIMEOUT", "10")),
+    "fx_tool": float(os.getenv("FX_TOOL_TIMEOUT", "10")),
+    "contract_search": float(os.getenv("CONTRACT_TOOL_TIMEOUT", "5")),
+}
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+
+# Contract clauses for suppliers in the SQL results are attached to the analyst
+# prompt directly, so the analyst sees them without another tool round.
+CONTRACT_CONTEXT = os.getenv("CONTRACT_CONTEXT", "true").lower() == "true"
+CONTRACT_CONTEXT_MAX_SUPPLIERS = int(os.getenv("CONTRACT_CONTEXT_MAX_SUPPLIERS", "20"))
+CONTRACT_CONTEXT_TIMEOUT = float(os.getenv("CONTRACT_CONTEXT_TIMEOUT", "2"))
+# Supplier trends come from stored scan history rather than the LLM's guess.
+TREND_CONTEXT_TIMEOUT = float(os.getenv("TREND_CONTEXT_TIMEOUT", "2"))
+# Reported for suppliers without stored history, on both the analyst and scorer paths.
+NO_HISTORY_TREND = "Stable"
+
+# In a session, follow-ups that don't ask for fresh data are answered from the
+# tool results already in the conversation instead of fetching again.
+FRESH_DATA_PATTERN = re.compile(r"\b(latest|refresh|update[ds]?|today|now|news|exchange rates?|fx)\b", re.IGNORECASE)
+
+# "plan": the fetcher issues every tool call it needs in one response and the
+# results go straight to the analyst. "react": the fetcher sees each round of
+# results and may ask for more, up to FETCH_MAX_LLM_CALLS.
+FETCH_MODE = os.getenv("FETCH_MODE", "plan").lower()
+FETCH_MAX_LLM_CALLS = int(os.getenv("FETCH_MAX_LLM_CALLS", "3"))
+# Templated region queries get a fixed sql/news/fx plan without a planning LLM call.
+FETCH_TEMPLATE_PLANS = os.getenv("FETCH_TEMPLATE_PLANS", "true").lower() == "true"
+
+# Matches the dashboard's templated per-region query; the region must also be a known supplier country.
+REGION_QUERY_PATTERN = re.compile(
+    r"^\s*check (?:supply chain )?risks? for (?P<region>.+?)(?: based on current data)?\s*\.?\s*$",
+    re.IGNORECASE,
+)
+
+def get_llm():
+    """
+    Returns the shared chat model, creating it on first use. The Gemini client
+    is imported here rather than at module level so importing the graph stays cheap.
+    """
+    global _llm
+    if _llm is None:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        # temperature=0 makes responses reproducible, so identical prompts are served from the local cache.
+        # Retries belong to the admission scheduler, which backs off without blocking the event loop.
+        _llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0, cache=get_llm_cache(), max_retries=1)
+    return _llm
+
+def set_llm(model):
+    """
+    Replaces the shared chat model, e.g. with the benchmarks' scripted stand-in.
+    """
+    global _llm
+    _llm = model
+
+async def call_llm(runnable, messages):
+    """
+    Invokes the model through the Gemini admission scheduler: rate limits,
+    the concurrency cap and the caller's priority class all apply.
+    """
+    return await admission.call(
+        admission.gemini,
+        lambda: runnable.ainvoke(messages),
+        tokens=estimate_tokens(messages) + admission.EXPECTED_OUTPUT_TOKENS,
+        usage=lambda response: (getattr(response, "usage_metadata", None) or {}).get("total_tokens"),
+    )
+
+async def match_region(text: str) -> Optional[str]:
+    """
+    The supplier country a templated region query names, spelled as in the
+    data, or None. "check risks for electronics suppliers in Japan" is not a
+    region query and goes through normal routing.
+    """
+    match = REGION_QUERY_PATTERN.match(text)
+    if not match:
+        return None
+    candidate = match.group("region").strip().lower()
+    try:
+        regions = await exposure.get_regions()
+    except Exception as e:
+        print(f"Region list unavailable for routing: {e}")
+        return None
+    return next((region for region in regions if region.lower() == candidate), None)
 
 # --- Nodes ---
 
-def supervisor_node(state: AgentState):
+async def supervisor_node(state: AgentState):
     """
     Routes the query to the appropriate agent.
     """
@@ -33,36 +130,160 @@ def supervisor_node(state: AgentState):
     # Simple keyword-based routing for robustness, can be upgraded to LLM call
     content = last_message.content.lower()
     
+    region = await match_region(last_message.content)
+    if region:
+        # Without the scoring fast path the region still gets a templated fetch plan
+        next_step = "scorer" if SCORING_FAST_PATH else "data_fetcher"
+        return {"next_step": next_step, "region": region}
+    
+    has_prior_data = any(isinstance(m, ToolMessage) for m in messages[:-1])
+    
     if "report" in content or "summary" in content:
         next_step = "reporter"
     elif "risk" in content or "impact" in content or "analyze" in content:
         next_step = "risk_analyst"
+    elif has_prior_data and not FRESH_DATA_PATTERN.search(content):
+        next_step = "risk_analyst"
     else:
         next_step = "data_fetcher"
         
     return {"next_step": next_step}
 
-def data_fetcher_node(state: AgentState):
+PLANNER_PROMPT = """You are a Data Fetcher for supply chain risk analysis.
+    Decide on EVERY tool call needed to answer the user's latest request and issue them all
+    in this one response; they run in parallel and you will not see their results, so do not
+    hold a call back waiting for another one's output.
+    - sql_tool for suppliers and shipments (prefer aggregates over selecting every row)
+    - news_tool for disruption events in the countries involved
+    - fx_tool for the currencies of those countries against USD
+    - contract_search for contract terms, only if the request is about contracts
+    If the conversation already holds the data needed, make no tool calls.
+    """
+
+def template_plan(region: str) -> AIMessage:
+    """
+    The fixed tool plan for a "check risks for <region>" query: the region's
+    suppliers with their open shipment exposure, risk news, and its currency.
     """
-    Uses tools to fetch data.
+    country = region.replace("'", "''")
+    statuses = ", ".join(f"'{status}'" for status in scoring.OPEN_SHIPMENT_STATUSES)
+    calls = [
+        {
+            "name": "sql_tool",
+            "args": {"query": (
+                "SELECT s.id AS supplier_id, s.name, s.country, s.category, s.risk_tolerance_score, "
+                "COUNT(sh.id) AS open_shipments, COALESCE(SUM(sh.value_usd), 0) AS open_value_usd, "
+                "MIN(sh.due_date) AS next_due_date "
+                "FROM suppliers s LEFT JOIN shipments sh "
+                f"ON sh.supplier_id = s.id AND sh.status IN ({statuses}) "
+                f"WHERE lower(s.country) = lower('{country}') "
+                "GROUP BY s.id ORDER BY open_value_usd DESC"
+            )},
+        },
+        {"name": "news_tool", "args": {"query": f"{region} {scoring.RISK_NEWS_TERMS}"}},
+    ]
+    currency = next((c for name, c in fx.COUNTRY_CURRENCIES.items() if name.lower() == region.lower()), None)
+    if currency:
+        calls.append({"name": "fx_tool", "args": {"base_currency": "USD", "target_currency": currency}})
+    return AIMessage(content="", tool_calls=[
+        {**call, "id": f"plan_{i}_{call['name']}", "type": "tool_call"} for i, call in enumerate(calls)
+    ])
+
+async def data_fetcher_node(state: AgentState):
+    """
+    Uses tools to fetch data. Templated region queries use a fixed plan; otherwise
+    the LLM plans the calls (all at once in "plan" mode, round by round in "react").
     """
     messages = state['messages']
+    rounds = state.get('fetch_rounds', 0) + 1
+
+    if FETCH_TEMPLATE_PLANS and state.get('region') and rounds == 1:
+        return {"messages": [template_plan(state['region'])], "fetch_rounds": rounds}
+
     # This agent has access to tools
-    tools = [sql_tool, news_tool, fx_tool]
-    llm_with_tools = llm.bind_tools(tools)
+    tools = [sql_tool, news_tool, fx_tool, contract_search]
+    llm_with_tools = get_llm().bind_tools(tools)
     
-    response = llm_with_tools.invoke(messages)
+    sent = [SystemMessage(content=PLANNER_PROMPT)] + messages if FETCH_MODE == "plan" else messages
+    response = await call_llm(llm_with_tools, sent)
     
-    return {"messages": [response]}
+    return {
+        "messages": [response],
+        "fetch_rounds": rounds,
+        "token_usage": [turn_usage("data_fetcher", sent, response)]
+    }
+
+def suppliers_from_results(messages) -> Dict[int, Optional[str]]:
+    """
+    Suppliers appearing in sql_tool results, id -> name (None when the result
+    has no name column). Ids come from the supplier_id column, or the id column
+    of rows that came from the suppliers table.
+    """
+    suppliers = {}
+    for message in messages:
+        if not isinstance(message, ToolMessage) or message.name != "sql_tool" or not isinstance(message.content, str):
+            continue
+        rows = csv.reader(io.StringIO(message.content))
+        header = next(rows, [])
+        if "supplier_id" in header:
+            column = header.index("supplier_id")
+        elif "id" in header and "name" in header:
+            column = header.index("id")
+        else:
+            continue
+        name_column = header.index("name") if "name" in header else None
+        for row in rows:
+            try:
+                supplier_id = int(row[column])
+            except (IndexError, ValueError):
+                continue
+            name = row[name_column] if name_column is not None and name_column < len(row) else None
+            if suppliers.get(supplier_id) is None:
+                suppliers[supplier_id] = name
+    return suppliers
 
-def risk_analyst_node(state: AgentState):
+def supplier_ids_from_results(messages) -> List[int]:
+    return list(suppliers_from_results(messages))
+
+async def contract_context(messages) -> str:
+    """
+    Fetches the best-matching contract clauses for every supplier in the SQL
+    results in one batched search. Returns "" when there is nothing to add.
+    """
+    supplier_ids = supplier_ids_from_results(messages)[:CONTRACT_CONTEXT_MAX_SUPPLIERS]
+    question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+    if not supplier_ids or not isinstance(question, str):
+        return ""
+    try:
+        by_supplier = await asyncio.wait_for(
+            contracts.search_contracts_by_supplier(question, supplier_ids), CONTRACT_CONTEXT_TIMEOUT
+        )
+    except Exception as e:
+        print(f"Contract context unavailable: {e!r}")
+        return ""
+    clauses = [clause for found in by_supplier.values() for clause in found]
+    return contracts.format_clauses(clauses)
+
+async def computed_trends(supplier_ids) -> Dict[int, dict]:
+    """
+    Trends from stored scan history for the given suppliers; {} if unavailable.
+    """
+    if not supplier_ids:
+        return {}
+    try:
+        return await asyncio.wait_for(history.supplier_trends(supplier_ids), TREND_CONTEXT_TIMEOUT)
+    except Exception as e:
+        print(f"Trend history unavailable: {e!r}")
+        return {}
+
+async def risk_analyst_node(state: AgentState):
     """
     Analyzes the data and calculates risk.
     """
     messages = state['messages']
     
     prompt = """You are a Risk Analyst.
-    Review the conversation history, which includes data from SQL, News, and FX.
+    Review the conversation history, which includes data from SQL, News, FX and supplier contracts.
     
     Your goal is to:
     1. Identify any risks (e.g., natural disasters, financial instability, political unrest).
@@ -93,7 +314,25 @@ def risk_analyst_node(state: AgentState):
     - Do NOT use "Supplier A" or "Supplier B" unless they are in the actual data.
     """
     
-    response = llm.invoke([SystemMessage(content=prompt)] + messages)
+    suppliers = suppliers_from_results(messages)
+    clauses, trends = await asyncio.gather(
+        contract_context(messages) if CONTRACT_CONTEXT else asyncio.sleep(0, ""),
+        computed_trends(list(suppliers)),
+    )
+    if trends:
+        prompt += f"""
+    COMPUTED TRENDS from stored scan history, by supplier id. Use these for "trend" and
+    use "{NO_HISTORY_TREND}" for suppliers not listed; do not infer trends yourself:
+    {history.format_trends(trends)}
+    """
+    if clauses:
+        prompt += f"""
+    CONTRACT CLAUSES for the suppliers above (e.g. FX renegotiation thresholds, force majeure):
+    {clauses}
+    """
+
+    sent = [SystemMessage(content=prompt)] + messages
+    response = await call_llm(get_llm(), sent)
     
     import json
     import re
@@ -112,6 +351,15 @@ def risk_analyst_node(state: AgentState):
         risk_score = float(data.get("risk_score", 0))
         impacted_suppliers = data.get("impacted_suppliers", [])
         analysis = data.get("analysis", "")
+        # The stored history is authoritative wherever it covers a supplier
+        ids_by_name = {name: supplier_id for supplier_id, name in suppliers.items() if name}
+        for supplier in impacted_suppliers:
+            supplier_id = supplier.get("id") or ids_by_name.get(supplier.get("name"))
+            if supplier_id in trends:
+                supplier["id"] = supplier_id
+                supplier["trend"] = trends[supplier_id]["trend"]
+            else:
+                supplier["trend"] = NO_HISTORY_TREND
         
     except Exception as e:
         print(f"Error parsing JSON: {e}")
@@ -128,10 +376,38 @@ def risk_analyst_node(state: AgentState):
         "messages": [response],
         "risk_score": risk_score,
         "impacted_suppliers": impacted_suppliers,
+        "analysis": analysis,
+        "token_usage": [turn_usage("risk_analyst", sent, response)]
+    }
+
+async def scorer_node(state: AgentState):
+    """
+    Scores a single region with the deterministic engine instead of the LLM analyst.
+    """
+    assessment = await scoring.assess_region(state['region'])
+    impacted = assessment["impacted_suppliers"]
+    trends = await computed_trends([supplier["id"] for supplier in impacted])
+    for supplier in impacted:
+        supplier["trend"] = trends.get(supplier["id"], {}).get("trend", NO_HISTORY_TREND)
+
+    analysis = assessment["analysis"]
+    try:
+        region_trend = (await asyncio.wait_for(history.region_history(state['region']), TREND_CONTEXT_TIMEOUT))["trend"]
+    except Exception as e:
+        print(f"Region trend unavailable: {e!r}")
+        region_trend = None
+    if region_trend and region_trend["scans"] >= 2:
+        analysis += (
+            f" Over the last {region_trend['scans']} scans the region's score is {region_trend['trend'].lower()} "
+            f"({region_trend['slope_per_day'] or 0:+.1f} points/day, rolling average {region_trend['rolling_avg']})."
+        )
+    return {
+        "risk_score": assessment["risk_score"],
+        "impacted_suppliers": impacted,
         "analysis": analysis
     }
 
-def reporter_node(state: AgentState):
+async def reporter_node(state: AgentState):
     """
     Generates the final report.
     """
@@ -158,43 +434,58 @@ def reporter_node(state: AgentState):
     """
     
     # Invoke with a single HumanMessage containing the prompt
-    response = llm.invoke([HumanMessage(content=prompt)])
+    sent = [HumanMessage(content=prompt)]
+    response = await call_llm(get_llm(), sent)
     
     return {
         "messages": [response],
-        "report_draft": response.content
+        "report_draft": response.content,
+        "token_usage": [turn_usage("reporter", sent, response)]
     }
 
-# --- Graph Definition ---
+# --- Tools ---
+
+tools = [sql_tool, news_tool, fx_tool, contract_search]
+tools_by_name = {t.name: t for t in tools}
 
-workflow = StateGraph(AgentState)
+async def run_tool_call(call: dict, config: RunnableConfig) -> ToolMessage:
+    """
+    Executes one tool call under its timeout and wraps the outcome in a ToolMessage.
+    """
+    name = call["name"]
+    selected_tool = tools_by_name.get(name)
+    if selected_tool is None:
+        return ToolMessage(content=f"Error: unknown tool '{name}'.", tool_call_id=call["id"], name=name, status="error")
 
-workflow.add_node("supervisor", supervisor_node)
-workflow.add_node("data_fetcher", data_fetcher_node)
-workflow.add_node("risk_analyst", risk_analyst_node)
-workflow.add_node("reporter", reporter_node)
+    timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+    start = time.perf_counter()
+    try:
+        content = str(await asyncio.wait_for(selected_tool.ainvoke(call["args"], config), timeout))
+        # Tools report failures as text rather than raising
+        failed = content.startswith(("Error", "Database Error", "NewsAPI Error", "FX API Error"))
+        metrics.record_tool(name, start, "error" if failed else "ok")
+        return ToolMessage(content=content, tool_call_id=call["id"], name=name)
+    except asyncio.TimeoutError:
+        metrics.record_tool(name, start, "timeout")
+        return ToolMessage(content=f"Error: {name} timed out after {timeout:g}s.", tool_call_id=call["id"], name=name, status="error")
+    except Exception as e:
+        metrics.record_tool(name, start, "error")
+        return ToolMessage(content=f"Error: {e}", tool_call_id=call["id"], name=name, status="error")
 
-# Tool Node for Data Fetcher
-tools = [sql_tool, news_tool, fx_tool]
-tool_node = ToolNode(tools)
-workflow.add_node("tools", tool_node)
+async def tools_node(state: AgentState, config: RunnableConfig):
+    """
+    Runs every tool call from the fetcher's last message concurrently, so a turn
+    costs the slowest call rather than the sum of all of them.
+    """
+    last_message = state['messages'][-1]
+    results = await asyncio.gather(*(run_tool_call(call, config) for call in last_message.tool_calls))
+    return {"messages": list(results)}
 
-# Edges
-workflow.set_entry_point("supervisor")
+# --- Routing ---
 
 def supervisor_router(state: AgentState):
     return state['next_step']
 
-workflow.add_conditional_edges(
-    "supervisor",
-    supervisor_router,
-    {
-        "data_fetcher": "data_fetcher",
-        "risk_analyst": "risk_analyst",
-        "reporter": "reporter"
-    }
-)
-
 def data_fetcher_router(state: AgentState):
     messages = state['messages']
     last_message = messages[-1]
@@ -202,17 +493,67 @@ def data_fetcher_router(state: AgentState):
         return "tools"
     return "risk_analyst" # After fetching data, go to analysis
 
-workflow.add_conditional_edges(
-    "data_fetcher",
-    data_fetcher_router,
-    {
-        "tools": "tools",
-        "risk_analyst": "risk_analyst"
-    }
-)
+def tools_router(state: AgentState):
+    # A plan executes in one wave; a ReAct loop returns to the fetcher until its budget is spent
+    if FETCH_MODE == "plan" or state.get('fetch_rounds', 0) >= FETCH_MAX_LLM_CALLS:
+        return "risk_analyst"
+    return "data_fetcher"
 
-workflow.add_edge("tools", "data_fetcher") # Return to fetcher to process tool output
-workflow.add_edge("risk_analyst", "reporter")
-workflow.add_edge("reporter", END)
+# --- Graph Definition ---
+
+def build_graph(checkpointer=None):
+    workflow = StateGraph(AgentState)
+
+    workflow.add_node("supervisor", metrics.instrument_node("supervisor", supervisor_node))
+    workflow.add_node("data_fetcher", metrics.instrument_node("data_fetcher", data_fetcher_node))
+    workflow.add_node("risk_analyst", metrics.instrument_node("risk_analyst", risk_analyst_node))
+    workflow.add_node("scorer", metrics.instrument_node("scorer", scorer_node))
+    workflow.add_node("reporter", metrics.instrument_node("reporter", reporter_node))
+    # Tool Node for Data Fetcher
+    workflow.add_node("tools", metrics.instrument_node("tools", tools_node))
+
+    # Edges
+    workflow.set_entry_point("supervisor")
+
+    workflow.add_conditional_edges(
+        "supervisor",
+        supervisor_router,
+        {
+            "data_fetcher": "data_fetcher",
+            "risk_analyst": "risk_analyst",
+            "scorer": "scorer",
+            "reporter": "reporter"
+        }
+    )
 
-app = workflow.compile()
+    workflow.add_conditional_edges(
+        "data_fetcher",
+        data_fetcher_router,
+        {
+            "tools": "tools",
+            "risk_analyst": "risk_analyst"
+        }
+    )
+
+    workflow.add_conditional_edges(
+        "tools",
+        tools_router,
+        {
+            "data_fetcher": "data_fetcher",
+            "risk_analyst": "risk_analyst"
+        }
+    )
+    workflow.add_edge("risk_analyst", "reporter")
+    workflow.add_edge("scorer", "reporter")
+    workflow.add_edge("reporter", END)
+
+    return workflow.compile(checkpointer=checkpointer)
+
+def get_graph():
+    """
+    Returns the compiled graph, compiling it once on first use.
+    """
+    global _graph
+    if _graph is None:
+        _graph = build_graph()
+    return _graph
@@ -0,0 +1,242 @@
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from psycopg import sql
+
+from src import db, scoring
+from src.cache import TTLCache
+
+# Monthly partitions older than this are dropped whole instead of deleted row by row.
+HISTORY_RETENTION_MONTHS = int(os.getenv("HISTORY_RETENTION_MONTHS", "12"))
+# Trends are fitted over this many days of scans.
+TREND_WINDOW_DAYS = float(os.getenv("TREND_WINDOW_DAYS", "14"))
+# Score change per day (0-100 scale) beyond which a trend is Worsening or Improving.
+TREND_SLOPE_THRESHOLD = float(os.getenv("TREND_SLOPE_THRESHOLD", "1.0"))
+# Points in a /history sparkline.
+SPARKLINE_POINTS = int(os.getenv("SPARKLINE_POINTS", "48"))
+# Scans used for the rolling average.
+ROLLING_SCANS = 5
+
+# Scores for suppliers the LLM analyst rated by level only
+LEVEL_SCORES = {"High": 80.0, "Medium": 45.0, "Low": 15.0}
+
+# Serializes partition creation across API workers and the standalone monitor
+HISTORY_LOCK_ID = 0x5E47_0002
+PARTITION_NAME = re.compile(r"^risk_history_(\d{4})_(\d{2})$")
+
+history_cache = TTLCache("history", ttl=60)
+_partitions = set()
+
+# One row per supplier per scan, grouped by supplier_id (NULL = the region as a whole).
+# The slope is per day; the latest score, rolling average and last change come from the newest scan.
+TREND_QUERY = """
+    WITH recent AS (
+        SELECT supplier_id, region, recorded_at, score,
+               row_number() OVER (PARTITION BY supplier_id ORDER BY recorded_at DESC) AS newest,
+               avg(score) OVER (
+                   PARTITION BY supplier_id ORDER BY recorded_at
+                   ROWS BETWEEN {rolling} PRECEDING AND CURRENT ROW
+               ) AS rolling_avg,
+               score - lag(score) OVER (PARTITION BY supplier_id ORDER BY recorded_at) AS change
+        FROM risk_history
+        WHERE recorded_at >= now() - make_interval(secs => %(window)s) AND {where}
+    )
+    SELECT supplier_id,
+           max(region) AS region,
+           count(*) AS scans,
+           regr_slope(score, extract(epoch FROM recorded_at) / 86400.0) AS slope,
+           max(score) FILTER (WHERE newest = 1) AS latest,
+           max(rolling_avg) FILTER (WHERE newest = 1) AS rolling_avg,
+           max(change) FILTER (WHERE newest = 1) AS last_change,
+           min(score) AS low,
+           max(score) AS high
+    FROM recent
+    GROUP BY supplier_id
+"""
+
+SERIES_QUERY = """
+    SELECT date_bin(make_interval(secs => %(bucket)s), recorded_at, TIMESTAMPTZ '2000-01-01') AS t,
+           round(avg(score)::numeric, 1) AS score
+    FROM risk_history
+    WHERE region = %(region)s AND supplier_id IS NULL
+      AND recorded_at >= now() - make_interval(secs => %(window)s)
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+
+def month_start(when: datetime) -> date:
+    return date(when.year, when.month, 1)
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def partition_ddl(month: date) -> sql.Composed:
+    """
+    CREATE TABLE statement for the partition holding `month`.
+    """
+    return sql.SQL(
+        "CREATE TABLE IF NOT EXISTS {} PARTITION OF risk_history FOR VALUES FROM ({}) TO ({})"
+    ).format(
+        sql.Identifier(f"risk_history_{month:%Y_%m}"),
+        sql.Literal(month.isoformat()),
+        sql.Literal(next_month(month).isoformat()),
+    )
+
+def level_for(score: float) -> str:
+    if score >= scoring.HIGH_THRESHOLD:
+        return "High"
+    return "Medium" if score >= scoring.MEDIUM_THRESHOLD else "Low"
+
+async def record_scan(region: str, result: dict, inputs_digest: str = ""):
+    """
+    Appends one scan's region score and per-supplier scores. Suppliers the LLM
+    analyst named without an id are matched by name within the region; those
+    that don't match a supplier are skipped.
+    """
+    region_score = float(result.get("risk_score") or 0)
+    ids: List[Optional[int]] = [None]
+    names: List[Optional[str]] = [None]
+    scores = [region_score]
+    levels = [level_for(region_score)]
+    for supplier in result.get("impacted_suppliers") or []:
+        if supplier.get("id") is None and not supplier.get("name"):
+            continue
+        level = supplier.get("risk_level") or "Low"
+        score = supplier.get("risk_score")
+        ids.append(supplier.get("id"))
+        names.append(supplier.get("name"))
+        scores.append(float(score) if score is not None else LEVEL_SCORES.get(level, 0.0))
+        levels.append(level)
+
+    now = datetime.now(timezone.utc)
+    month = month_start(now)
+    async with db.connection() as conn:
+        if month not in _partitions:
+            await conn.execute("SELECT pg_advisory_xact_lock(%s)", (HISTORY_LOCK_ID,))
+            await conn.execute(partition_ddl(month))
+        await conn.execute(
+            """
+            INSERT INTO risk_history (recorded_at, region, supplier_id, score, level, inputs_digest)
+            SELECT %(now)s, %(region)s, COALESCE(r.supplier_id, s.id), r.score, r.level, %(digest)s
+            FROM unnest(%(ids)s::int[], %(names)s::text[], %(scores)s::real[], %(levels)s::text[])
+                 AS r(supplier_id, name, score, level)
+            LEFT JOIN LATERAL (
+                SELECT id FROM suppliers
+                WHERE r.supplier_id IS NULL AND r.name IS NOT NULL
+                  AND name = r.name AND lower(country) = lower(%(region)s)
+                LIMIT 1
+            ) s ON true
+            WHERE r.name IS NULL OR COALESCE(r.supplier_id, s.id) IS NOT NULL
+            """,
+            {"now": now, "region": region, "ids": ids, "names": names, "scores": scores,
+             "levels": levels, "digest": inputs_digest[:16]},
+        )
+    _partitions.add(month)
+    history_cache.invalidate()
+
+def classify(slope: np.ndarray, scans: np.ndarray) -> np.ndarray:
+    """
+    Vectorized trend labels: "New" until there are two scans, then by score slope per day.
+    """
+    slope = np.nan_to_num(slope.astype(np.float64))
+    labels = np.where(
+        slope >= TREND_SLOPE_THRESHOLD, "Worsening",
+        np.where(slope <= -TREND_SLOPE_THRESHOLD, "Improving", "Stable"),
+    ).astype(object)
+    labels[scans < 2] = "New"
+    return labels
+
+async def _trends(where: str, params: dict, window_days: float) -> Dict[Optional[int], dict]:
+    query = TREND_QUERY.format(rolling=ROLLING_SCANS - 1, where=where)
+    columns, rows = await db.fetch_all(query, {**params, "window": window_days * 86400})
+    if not rows:
+        return {}
+    records = [dict(zip(columns, row)) for row in rows]
+    slopes = np.array([np.nan if r["slope"] is None else r["slope"] for r in records], dtype=np.float64)
+    labels = classify(slopes, np.array([r["scans"] for r in records]))
+    trends = {}
+    for record, slope, label in zip(records, slopes, labels):
+        trends[record["supplier_id"]] = {
+            "supplier_id": record["supplier_id"],
+            "region": record["region"],
+            "trend": label,
+            "slope_per_day": None if np.isnan(slope) else round(float(slope), 2),
+            "scans": record["scans"],
+            "latest": record["latest"],
+            "rolling_avg": None if record["rolling_avg"] is None else round(float(record["rolling_avg"]), 1),
+            "last_change": record["last_change"],
+            "low": record["low"],
+            "high": record["high"],
+        }
+    return trends
+
+async def supplier_trends(supplier_ids: Sequence[int], window_days: float = TREND_WINDOW_DAYS) -> Dict[int, dict]:
+    """
+    Computed trend per supplier id; suppliers without history are absent.
+    """
+    supplier_ids = [int(s) for s in supplier_ids]
+    if not supplier_ids:
+        return {}
+    return await _trends("supplier_id = ANY(%(ids)s)", {"ids": supplier_ids}, window_days)
+
+async def _load_region_history(region: str, window_days: float, points: int) -> dict:
+    trends = await _trends("region = %(region)s", {"region": region}, window_days)
+    bucket = max(window_days * 86400 / max(points, 1), 60)
+    _, rows = await db.fetch_all(SERIES_QUERY, {"region": region, "window": window_days * 86400, "bucket": bucket})
+    suppliers = sorted(
+        (t for key, t in trends.items() if key is not None),
+        key=lambda t: -(t["latest"] or 0),
+    )
+    return {
+        "region": region,
+        "days": window_days,
+        "series": [{"t": t, "score": float(score)} for t, score in rows],
+        "trend": trends.get(None),
+        "suppliers": suppliers,
+    }
+
+async def region_history(region: str, window_days: float = TREND_WINDOW_DAYS, points: int = SPARKLINE_POINTS) -> dict:
+    """
+    Sparkline series of the region's score plus computed trends for the region
+    and each of its scored suppliers.
+    """
+    return await history_cache.aget_or_load(
+        f"{region}|{window_days}|{points}", lambda: _load_region_history(region, window_days, points)
+    )
+
+async def drop_expired_partitions() -> List[str]:
+    """
+    Drops monthly partitions entirely older than HISTORY_RETENTION_MONTHS.
+    """
+    cutoff = month_start(datetime.now(timezone.utc))
+    for _ in range(HISTORY_RETENTION_MONTHS):
+        cutoff = date(cutoff.year - (cutoff.month == 1), (cutoff.month - 2) % 12 + 1, 1)
+
+    dropped = []
+    async with db.connection() as conn:
+        cur = await conn.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'risk_history'::regclass"
+        )
+        for (name,) in await cur.fetchall():
+            match = PARTITION_NAME.match(name)
+            if match and date(int(match.group(1)), int(match.group(2)), 1) < cutoff:
+                await conn.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(name)))
+                dropped.append(name)
+    if dropped:
+        _partitions.difference_update(
+            date(int(m.group(1)), int(m.group(2)), 1) for m in map(PARTITION_NAME.match, dropped)
+        )
+        history_cache.invalidate()
+    return dropped
+
+def format_trends(trends: Dict[int, dict]) -> str:
+    return "\n".join(
+        f"supplier {supplier_id}: {t['trend']} (latest {t['latest']:.0f}, "
+        f"{t['slope_per_day'] if t['slope_per_day'] is not None else 0:+.1f}/day over {t['scans']} scans)"
+        for supplier_id, t in trends.items()
+    )
@@ -0,0 +1,97 @@
+import os
+import json
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+
+from src.cache import CACHE_DIR, SQLiteBackend, TTLCache
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000"))
+
+# Message fields that differ between otherwise identical runs (generated ids,
+# provider metadata) and must not influence the cache key.
+VOLATILE_MESSAGE_FIELDS = {"id", "tool_call_id", "response_metadata", "usage_metadata"}
+
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_cache(enabled: bool = True):
+    """
+    Skips the LLM cache (both lookup and store) for calls made inside the block.
+    The flag is a context variable, so it follows a request through the graph.
+    """
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+def _canonical(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        result = {}
+        for key, value in obj.items():
+            if key == "kwargs" and isinstance(value, dict):
+                value = {k: v for k, v in value.items() if k not in VOLATILE_MESSAGE_FIELDS}
+            elif key == "tool_calls" and isinstance(value, list):
+                value = [{k: v for k, v in call.items() if k != "id"} if isinstance(call, dict) else call for call in value]
+            result[key] = _canonical(value)
+        return result
+    if isinstance(obj, list):
+        return [_canonical(item) for item in obj]
+    return obj
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Hashes the serialized messages together with the model string, which
+    LangChain builds from the model name, parameters and any bound tools.
+    """
+    try:
+        canonical_prompt = json.dumps(_canonical(json.loads(prompt)), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        canonical_prompt = prompt
+    return hashlib.sha256(f"{llm_string}\x00{canonical_prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache(BaseCache):
+    """
+    Content-addressed LangChain cache persisted to a local SQLite file with a
+    TTL and size-based eviction.
+    """
+    def __init__(self, ttl: float = LLM_CACHE_TTL, path: Optional[str] = None):
+        backend = SQLiteBackend(
+            path or os.path.join(CACHE_DIR, "llm.sqlite"),
+            max_entries=LLM_CACHE_MAX_ENTRIES,
+            max_bytes=LLM_CACHE_MAX_BYTES,
+        )
+        self.cache = TTLCache("llm", ttl=ttl, backend=backend)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if _bypass.get():
+            return None
+        payload = self.cache.get(cache_key(prompt, llm_string))
+        if payload is None:
+            return None
+        try:
+            return [loads(generation) for generation in payload]
+        except Exception:
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if _bypass.get():
+            return
+        self.cache.set(cache_key(prompt, llm_string), [dumps(generation) for generation in return_val])
+
+    def clear(self, **kwargs: Any) -> None:
+        self.cache.invalidate()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    return LLMResponseCache() if LLM_CACHE_ENABLED else None
@@ -1,12 +1,104 @@
-from fastapi import FastAPI, HTTPException
+import os
+import json
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, List, NamedTuple, Optional
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from src.graph import app as graph_app
+from src import admission, contracts, db, exposure, history, metrics, monitor, news_index, sessions
+from src.response_cache import RESPONSE_CACHE_ENABLED, input_versions, responses
+from src.http_client import close_client, get_client
+from src.cache import cache_stats
+from src.llm_cache import bypass_cache
+from src.graph import get_graph, get_llm
 from src.state import AgentState
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, AIMessage
 import uvicorn
 
-app = FastAPI(title="Supply Chain Risk Sentinel API")
+# Upper bound on graph runs in flight for a single /scan_regions sweep.
+SCAN_CONCURRENCY = int(os.getenv("SCAN_CONCURRENCY", "4"))
+
+# Tool outputs can be large; progress events only carry a preview.
+STREAM_TOOL_PREVIEW_CHARS = 1000
+
+# Same templated prompt the dashboard used to send per region.
+REGION_QUERY_TEMPLATE = "Check supply chain risks for {region} based on current data."
+
+# Do first-request work (pools, clients, graph, caches) before accepting traffic.
+STARTUP_PREWARM = os.getenv("STARTUP_PREWARM", "true").lower() == "true"
+PREWARM_TIMEOUT = float(os.getenv("PREWARM_TIMEOUT", "20"))
+
+# Seconds spent per pre-warm step, reported by /health.
+startup_timings = {}
+
+async def prime_database():
+    await db.open_pool()
+    # Tables created by a newer setup_db.py may be missing; priming is best-effort
+    await asyncio.gather(
+        exposure.get_regions(), exposure.get_exposure(), exposure.get_data_versions(),
+        monitor.latest_snapshots(), return_exceptions=True,
+    )
+
+def build_clients():
+    # Importing the Gemini and Qdrant clients is CPU-bound; it runs in a thread
+    # so it overlaps with the database handshake.
+    get_llm()
+    get_graph()
+    contracts.get_client()
+    contracts.get_embeddings()
+    get_client()
+
+async def prewarm():
+    """
+    Runs the pre-warm steps concurrently. Each step is best-effort: a failure
+    is logged and the work is simply left to the first request.
+    """
+    async def step(name: str, work):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(work, PREWARM_TIMEOUT)
+        except Exception as e:
+            print(f"Warning: pre-warm step '{name}' failed: {e!r}")
+        startup_timings[name] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        step("database", prime_database()),
+        step("clients", asyncio.to_thread(build_clients)),
+        step("sessions", sessions.get_saver()),
+    )
+    startup_timings["total"] = round(time.perf_counter() - start, 3)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if STARTUP_PREWARM:
+        await prewarm()
+    else:
+        # Warm the connection pool so the first request doesn't pay for the handshake.
+        try:
+            await db.open_pool()
+        except Exception as e:
+            print(f"Warning: database pool warm-up failed: {e}")
+    # Drops cached regions/exposure whenever ingestion changes the data
+    listener = asyncio.create_task(exposure.listen_for_changes())
+    # Re-scans regions in the background; dashboards read the snapshots
+    scheduler = asyncio.create_task(monitor.run_forever(scan_region)) if monitor.MONITOR_ENABLED else None
+    eviction = asyncio.create_task(sessions.run_eviction())
+    yield
+    if scheduler is not None:
+        scheduler.cancel()
+    eviction.cancel()
+    listener.cancel()
+    await close_client()
+    await contracts.close_client()
+    await sessions.close()
+    await db.close_pool()
+
+app = FastAPI(title="Supply Chain Risk Sentinel API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,72 +108,394 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Route templates keep label cardinality bounded
+    route = request.scope.get("route")
+    endpoint = getattr(route, "path", "unmatched")
+    metrics.record_request(endpoint, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
 class RiskRequest(BaseModel):
     query: str
+    stream: bool = False
+    # Forces fresh LLM calls for this request instead of cached responses
+    no_cache: bool = False
+    # Includes per-node and per-tool timing spans in the response
+    trace: bool = False
+    # Continues a conversation: follow-ups reuse its fetched data and prior analysis
+    thread_id: Optional[str] = None
+
+class ScanRequest(BaseModel):
+    regions: Optional[List[str]] = None
+    concurrency: Optional[int] = None
+
+def build_initial_state(query: str) -> AgentState:
+    return AgentState(
+        messages=[HumanMessage(content=query)],
+        risk_score=0.0,
+        impacted_suppliers=[],
+        analysis="",
+        report_draft="",
+        next_step="",
+        region="",
+        fetch_rounds=0,
+        token_usage=[]
+    )
+
+def build_followup_input(query: str) -> dict:
+    # Messages are appended to the checkpointed history; analysis fields carry over
+    return {"messages": [HumanMessage(content=query)], "next_step": "", "region": "", "fetch_rounds": 0, "report_draft": ""}
+
+class GraphRun(NamedTuple):
+    graph: Any
+    input: dict
+    config: dict
+    turn: int = 1
+    # token_usage accumulates across a session's turns; entries before this index belong to earlier turns
+    usage_offset: int = 0
+
+@asynccontextmanager
+async def graph_run(query: str, thread_id: Optional[str] = None):
+    """
+    Prepares one graph run. Without a thread_id it is a fresh, stateless run.
+    With one, it continues that session's checkpointed state and holds the
+    session's turn lock until the run finishes.
+    """
+    if not thread_id:
+        yield GraphRun(get_graph(), build_initial_state(query), {})
+        return
+
+    graph = await sessions.get_session_graph()
+    config = {"configurable": {"thread_id": thread_id}}
+    async with sessions.turn(thread_id) as turn:
+        snapshot = await graph.aget_state(config)
+        if snapshot.values:
+            usage_offset = len(snapshot.values.get("token_usage", []))
+            yield GraphRun(graph, build_followup_input(query), config, turn, usage_offset)
+        else:
+            yield GraphRun(graph, build_initial_state(query), config, turn)
+
+def message_text(content) -> str:
+    """
+    Flattens message content, which Gemini may return as a list of parts, to text.
+    """
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content or []:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            parts.append(part.get("text", ""))
+    return "".join(parts)
+
+async def run_analysis(query: str, no_cache: bool = False, trace: bool = False, thread_id: Optional[str] = None) -> dict:
+    """
+    Runs the full graph for a single query and returns the dashboard payload.
+    """
+    async with graph_run(query, thread_id) as run:
+        with bypass_cache(no_cache), metrics.trace_run() as spans:
+            final_state = await run.graph.ainvoke(run.input, run.config)
+    
+    result = {
+        "report": final_state.get("report_draft", "No report generated."),
+        "risk_score": final_state.get("risk_score", 0),
+        "impacted_suppliers": final_state.get("impacted_suppliers", []),
+        "token_usage": final_state.get("token_usage", [])[run.usage_offset:]
+    }
+    if thread_id:
+        result.update(thread_id=thread_id, turn=run.turn)
+
+    if trace or metrics.TRACE_SPANS:
+        result["trace"] = spans.spans
+    return result
+
+async def scan_region(region: str, cached: bool = False) -> dict:
+    """
+    Analyzes one region and appends the result to its risk history. Region scans
+    run at background priority, so interactive queries overtake them for LLM slots.
+    The result is stored in the response cache; with `cached`, a region whose
+    inputs haven't changed is answered from it instead (and not recorded again).
+    """
+    query = REGION_QUERY_TEMPLATE.format(region=region)
+
+    async def scan() -> dict:
+        with admission.priority(admission.BACKGROUND):
+            digest = await monitor.region_fingerprint(region, await exposure.get_data_versions())
+            result = await run_analysis(query)
+        try:
+            await history.record_scan(region, result, digest)
+        except Exception as e:
+            print(f"Could not record risk history for {region}: {e}")
+        return result
+
+    return await responses.get_or_compute(query, scan, force=not cached)
+
+async def stream_analysis(
+    query: str, no_cache: bool = False, trace: bool = False, thread_id: Optional[str] = None, cached: bool = False
+):
+    """
+    Runs the graph and yields progress events as they happen: supervisor routing,
+    tool calls and results, the analyst's parsed score/suppliers, reporter tokens,
+    and a final "done" event carrying the same payload as the non-streaming response.
+    With `cached`, the result is stored in the response cache.
+    """
+    if cached:
+        before = await input_versions(query)
+
+    result = {"report": "", "risk_score": 0, "impacted_suppliers": [], "token_usage": []}
+
+    # Held for the whole iteration: nodes read the flag from this generator's context
+    async with graph_run(query, thread_id) as run:
+        with bypass_cache(no_cache), metrics.trace_run() as spans:
+            async for mode, chunk in run.graph.astream(
+                run.input, run.config, stream_mode=["updates", "messages"]
+            ):
+                if mode == "messages":
+                    message, metadata = chunk
+                    # Only the reporter's output is user-facing prose worth streaming token by token.
+                    # A cached reply arrives as one whole message instead of chunks.
+                    if metadata.get("langgraph_node") == "reporter" and isinstance(message, AIMessage):
+                        text = message_text(message.content)
+                        if text:
+                            yield {"event": "token", "content": text}
+                    continue
+
+                for node, update in chunk.items():
+                    if not update:
+                        continue
+                    result["token_usage"].extend(update.get("token_usage", []))
+                    if node == "supervisor":
+                        yield {"event": "route", "next_step": update.get("next_step")}
+                    elif node == "data_fetcher":
+                        for message in update.get("messages", []):
+                            for call in getattr(message, "tool_calls", None) or []:
+                                yield {"event": "tool_call", "id": call.get("id"), "name": call["name"], "args": call["args"]}
+                    elif node == "tools":
+                        for message in update.get("messages", []):
+                            content = message_text(message.content)
+                            yield {
+                                "event": "tool_result",
+                                "id": getattr(message, "tool_call_id", None),
+                                "name": getattr(message, "name", None),
+                                "content": content[:STREAM_TOOL_PREVIEW_CHARS],
+                                "truncated": len(content) > STREAM_TOOL_PREVIEW_CHARS,
+                            }
+                    elif node in ("risk_analyst", "scorer"):
+                        result["risk_score"] = update.get("risk_score", 0)
+                        result["impacted_suppliers"] = update.get("impacted_suppliers", [])
+                        yield {
+                            "event": "analysis",
+                            "risk_score": result["risk_score"],
+                            "impacted_suppliers": result["impacted_suppliers"],
+                            "analysis": update.get("analysis", ""),
+                        }
+                    elif node == "reporter":
+                        result["report"] = update.get("report_draft", "No report generated.")
+
+    if cached:
+        await responses.store(query, result, before)
+        result["cache"] = "miss"
+    if thread_id:
+        result.update(thread_id=thread_id, turn=run.turn)
+    if trace or metrics.TRACE_SPANS:
+        result["trace"] = spans.spans
+    yield {"event": "done", "status": "success", **result}
+
+def cacheable(request: RiskRequest) -> bool:
+    # Sessions need their turn checkpointed, and traces describe a run that a cached answer didn't make
+    return RESPONSE_CACHE_ENABLED and not request.thread_id and not (request.trace or metrics.TRACE_SPANS)
+
+def overloaded_error(e: admission.Overloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+def admit():
+    # Refuse up front rather than time out halfway through the graph; a stale refresh is checked at its own priority
+    admission.gemini.check()
 
 @app.post("/analyze_risk")
 async def analyze_risk(request: RiskRequest):
     """
     Triggers the agentic graph to analyze supply chain risks based on the user's query.
+    With `stream: true` the response is NDJSON progress events instead of a single object.
+    Returns 503 with Retry-After when the model is too backed up to answer in time.
+    Stateless requests are answered from the response cache while their inputs are unchanged.
     """
+    async def analyze() -> dict:
+        admit()
+        return await run_analysis(request.query, request.no_cache, request.trace, request.thread_id)
+
+    if request.stream:
+        # Only a query that will actually run the graph needs room at the model
+        stored = None
+        if cacheable(request) and not request.no_cache:
+            stored = await responses.lookup(request.query, analyze)
+        if stored is None:
+            try:
+                admit()
+            except admission.Overloaded as e:
+                raise overloaded_error(e)
+
+        async def events():
+            if stored is not None:
+                yield json.dumps({"event": "done", "status": "success", **stored}, default=str) + "\n"
+                return
+            try:
+                async for event in stream_analysis(
+                    request.query, request.no_cache, request.trace, request.thread_id, cacheable(request)
+                ):
+                    yield json.dumps(event, default=str) + "\n"
+            except admission.Overloaded as e:
+                yield json.dumps({"event": "error", "status": 503, "detail": str(e), "retry_after": e.retry_after}) + "\n"
+            except Exception as e:
+                yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
     try:
-        initial_state = AgentState(
-            messages=[HumanMessage(content=request.query)],
-            risk_score=0.0,
-            impacted_suppliers=[],
-            analysis="",
-            report_draft="",
-            next_step=""
-        )
-        
-        # Run the graph
-        # For simplicity in this MVP, we'll wait for the final result instead of streaming
-        # In a real app, we'd use StreamingResponse
-        final_state = await graph_app.ainvoke(initial_state)
-        
-        return {
-            "status": "success",
-            "report": final_state.get("report_draft", "No report generated."),
-            "risk_score": final_state.get("risk_score", 0),
-            "impacted_suppliers": final_state.get("impacted_suppliers", [])
-        }
+        if cacheable(request):
+            result = await responses.get_or_compute(request.query, analyze, force=request.no_cache)
+        else:
+            result = await analyze()
+        return {"status": "success", **result}
         
+    except admission.Overloaded as e:
+        raise overloaded_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/sessions/{thread_id}")
+async def end_session(thread_id: str):
+    """
+    Drops a conversation's checkpoints so its next query starts from scratch.
+    """
+    try:
+        await sessions.delete_session(thread_id)
+        return {"status": "success", "thread_id": thread_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/scan_regions")
+async def scan_regions(request: ScanRequest):
+    """
+    Analyzes several regions concurrently and streams one NDJSON line per region
+    as soon as that region's graph run finishes. Defaults to every supplier country.
+    """
+    regions = request.regions
+    if not regions:
+        regions = (await get_regions())["regions"]
+    # De-duplicate while keeping the caller's order
+    regions = list(dict.fromkeys(r.strip() for r in regions if r and r.strip()))
+
+    limit = max(1, min(request.concurrency or SCAN_CONCURRENCY, SCAN_CONCURRENCY))
+    semaphore = asyncio.Semaphore(limit)
+
+    async def scan(region: str) -> dict:
+        async with semaphore:
+            try:
+                result = await scan_region(region, cached=True)
+                return {"region": region, "status": "success", **result}
+            except Exception as e:
+                return {"region": region, "status": "error", "detail": str(e)}
+
+    async def stream():
+        tasks = [asyncio.create_task(scan(region)) for region in regions]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                yield json.dumps(result, default=str) + "\n"
+        finally:
+            # Client went away: don't keep burning LLM calls for nobody
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.get("/health")
-def health_check():
-    return {"status": "ok"}
+async def health_check():
+    return {
+        "status": "ok",
+        "database": await db.check_health(),
+        "admission": admission.stats(),
+        "startup": startup_timings,
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus text exposition: node/tool latency histograms, tool outcomes,
+    LLM tokens, tool-loop iterations, HTTP requests, cache counters and pool usage.
+    """
+    gauges = {}
+    pool = db.get_pool()
+    if not pool.closed:
+        stats = pool.get_stats()
+        gauges = {
+            "sentinel_db_pool_size": ("Open database connections.", stats.get("pool_size", 0)),
+            "sentinel_db_pool_available": ("Idle database connections.", stats.get("pool_available", 0)),
+            "sentinel_db_requests_waiting": ("Requests waiting for a connection.", stats.get("requests_waiting", 0)),
+        }
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Hit/miss counters for every in-process cache, plus the size and pull ages
+    of the local news index.
+    """
+    news = await asyncio.to_thread(news_index.get_index().stats) if news_index.NEWS_INDEX_ENABLED else None
+    return {"caches": cache_stats(), "news_index": news}
 
 @app.get("/regions")
-def get_regions():
+async def get_regions():
     """
     Fetches the list of unique countries (regions) where suppliers are located.
     """
-    import psycopg2
-    import os
-    
     try:
-        conn = psycopg2.connect(
-            host=os.getenv("POSTGRES_HOST"),
-            database=os.getenv("POSTGRES_DB"),
-            user=os.getenv("POSTGRES_USER"),
-            password=os.getenv("POSTGRES_PASSWORD"),
-            port=os.getenv("POSTGRES_PORT")
-        )
-        cur = conn.cursor()
-        cur.execute("SELECT DISTINCT country FROM suppliers ORDER BY country ASC")
-        rows = cur.fetchall()
-        countries = [row[0] for row in rows]
-        
-        cur.close()
-        conn.close()
-        return {"regions": countries}
+        return {"regions": await exposure.get_regions()}
     except Exception as e:
         import traceback
         traceback.print_exc()
         print(f"Error in /regions: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/snapshots")
+async def get_snapshots(region: Optional[str] = None):
+    """
+    Latest background-monitor snapshot per region. Serving these costs no graph runs.
+    """
+    try:
+        return {"snapshots": await monitor.latest_snapshots(region)}
+    except Exception as e:
+        print(f"Error in /snapshots: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/history")
+async def get_history(region: str, days: float = history.TREND_WINDOW_DAYS, points: int = history.SPARKLINE_POINTS):
+    """
+    Sparkline series of a region's score plus computed trends (slope, rolling
+    average, last change) for the region and its suppliers, from stored scans.
+    """
+    try:
+        return await history.region_history(region, days, max(1, min(points, 500)))
+    except Exception as e:
+        print(f"Error in /history: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/exposure")
+async def get_exposure(country: Optional[str] = None):
+    """
+    Open shipment value, shipment counts and risk tolerance stats per country
+    and category, from the precomputed exposure summary.
+    """
+    try:
+        return {"exposure": await exposure.get_exposure(country)}
+    except Exception as e:
+        print(f"Error in /exposure: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
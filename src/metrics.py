@@ -0,0 +1,266 @@
+import os
+import time
+import bisect
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.cache import CACHES
+
+# Attach per-request span lists to responses even when the request doesn't ask for them.
+TRACE_SPANS = os.getenv("TRACE_SPANS", "false").lower() == "true"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+ITERATION_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 12)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = tuple(_escape(label) for label in labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_format_labels(self.labels, key)} {value:g}" for key, value in items]
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *labels):
+        key = tuple(_escape(label) for label in labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_format_labels(self.labels, key)} {value:g}" for key, value in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        key = tuple(_escape(label) for label in labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _format_labels(self.labels, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+node_duration = Histogram("sentinel_node_duration_seconds", "Wall time per graph node execution.", ["node"])
+node_errors = Counter("sentinel_node_errors_total", "Graph node executions that raised.", ["node"])
+tool_duration = Histogram("sentinel_tool_duration_seconds", "Wall time per tool call.", ["tool"])
+tool_calls = Counter("sentinel_tool_calls_total", "Tool calls by outcome (ok, error, timeout).", ["tool", "status"])
+llm_tokens = Counter("sentinel_llm_tokens_total", "LLM tokens reported by the provider.", ["node", "direction"])
+tool_loop_iterations = Histogram(
+    "sentinel_tool_loop_iterations", "Data-fetcher tool rounds per graph run.", buckets=ITERATION_BUCKETS
+)
+request_duration = Histogram("sentinel_request_duration_seconds", "HTTP request wall time.", ["endpoint", "method"])
+requests_total = Counter("sentinel_requests_total", "HTTP requests by status code.", ["endpoint", "method", "status"])
+admission_queue_depth = Gauge(
+    "sentinel_admission_queue_depth", "Calls waiting for an upstream slot.", ["provider", "priority"]
+)
+admission_in_flight = Gauge("sentinel_admission_in_flight", "Upstream calls in progress.", ["provider"])
+admission_wait = Histogram(
+    "sentinel_admission_wait_seconds", "Time spent queued for an upstream slot.", ["provider", "priority"]
+)
+admission_shed = Counter(
+    "sentinel_admission_shed_total", "Calls rejected instead of queued (queue_full, wait, timeout, upstream).",
+    ["provider", "priority", "reason"],
+)
+admission_retries = Counter("sentinel_admission_retries_total", "Upstream calls retried after a transient error.", ["provider"])
+news_index_lookups = Counter(
+    "sentinel_news_index_lookups_total", "News lookups answered by the local index (hit) or sent upstream (miss, stale).",
+    ["outcome"],
+)
+news_index_articles = Counter(
+    "sentinel_news_index_articles_total", "Articles returned by index pulls, new or already indexed (duplicate).",
+    ["result"],
+)
+
+REGISTRY = [
+    node_duration, node_errors, tool_duration, tool_calls, llm_tokens,
+    tool_loop_iterations, request_duration, requests_total,
+    admission_queue_depth, admission_in_flight, admission_wait, admission_shed, admission_retries,
+    news_index_lookups, news_index_articles,
+]
+
+# --- Per-request traces ---
+
+class Trace:
+    """
+    Spans recorded for one graph run: (kind, name, start offset, duration, status, extra).
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[dict] = []
+
+    def add(self, kind: str, name: str, start: float, duration: float, status: str, **extra):
+        self.spans.append({
+            "kind": kind,
+            "name": name,
+            "start_ms": round(1000 * (start - self.started), 1),
+            "duration_ms": round(1000 * duration, 1),
+            "status": status,
+            **extra,
+        })
+
+    def count(self, kind: str, name: str) -> int:
+        return sum(1 for span in self.spans if span["kind"] == kind and span["name"] == name)
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("sentinel_trace", default=None)
+
+@contextmanager
+def trace_run():
+    """
+    Collects spans for the graph run executed inside the block and records
+    its tool-loop iteration count when it finishes.
+    """
+    trace = Trace()
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+        tool_loop_iterations.observe(trace.count("node", "tools"))
+
+# --- Instrumentation ---
+
+def _record_node(name: str, start: float, result, error: bool):
+    duration = time.perf_counter() - start
+    node_duration.observe(duration, name)
+    if error:
+        node_errors.inc(name)
+    tokens = {}
+    if isinstance(result, dict):
+        for usage in result.get("token_usage") or []:
+            for direction in ("input", "output"):
+                count = usage.get(f"{direction}_tokens")
+                if count:
+                    llm_tokens.inc(name, direction, amount=count)
+                    tokens[f"{direction}_tokens"] = tokens.get(f"{direction}_tokens", 0) + count
+    trace = _trace.get()
+    if trace is not None:
+        trace.add("node", name, start, duration, "error" if error else "ok", **tokens)
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """
+    Wraps a graph node (sync or async) to record its wall time, errors and token usage.
+    """
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except BaseException:
+                _record_node(name, start, None, error=True)
+                raise
+            _record_node(name, start, result, error=False)
+            return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            _record_node(name, start, None, error=True)
+            raise
+        _record_node(name, start, result, error=False)
+        return result
+    return wrapper
+
+def record_tool(name: str, start: float, status: str):
+    duration = time.perf_counter() - start
+    tool_duration.observe(duration, name)
+    tool_calls.inc(name, status)
+    trace = _trace.get()
+    if trace is not None:
+        trace.add("tool", name, start, duration, status)
+
+def record_request(endpoint: str, method: str, status: int, duration: float):
+    request_duration.observe(duration, endpoint, method)
+    requests_total.inc(endpoint, method, str(status))
+
+# --- Exposition ---
+
+def _cache_lines() -> List[str]:
+    # Read from the caches' own counters at scrape time, so lookups pay nothing extra
+    lines = []
+    for field, help in (
+        ("hits", "Cache hits."), ("misses", "Cache misses."),
+        ("coalesced", "Lookups that joined an in-flight load."),
+        ("evictions", "Entries evicted for space."), ("errors", "Backend errors."),
+    ):
+        metric = f"sentinel_cache_{field}_total"
+        lines += [f"# HELP {metric} {help}", f"# TYPE {metric} counter"]
+        for name, cache in sorted(CACHES.items()):
+            lines.append(f'{metric}{{cache="{_escape(name)}"}} {getattr(cache.stats, field)}')
+    return lines
+
+def render(extra_gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+    """
+    Prometheus text exposition of every metric. `extra_gauges` maps a metric
+    name to (help, value) for point-in-time values such as pool usage.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += _cache_lines()
+    for name, (help, value) in (extra_gauges or {}).items():
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value:g}"]
+    return "\n".join(lines) + "\n"
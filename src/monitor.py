@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import psycopg
+from psycopg.types.json import Jsonb
+
+from src import admission, db, exposure, fx, history, news_index, scoring
+from src.cache import TTLCache
+from src.tools import search_news
+
+# Background re-scans of every region; viewers read the stored snapshots.
+MONITOR_ENABLED = os.getenv("MONITOR_ENABLED", "true").lower() == "true"
+MONITOR_INTERVAL = float(os.getenv("MONITOR_INTERVAL", "900"))
+# Regions whose inputs haven't changed are still re-scanned once a snapshot is this old.
+MONITOR_MAX_AGE = float(os.getenv("MONITOR_MAX_AGE", "21600"))
+MONITOR_CONCURRENCY = int(os.getenv("MONITOR_CONCURRENCY", "2"))
+MONITOR_RETENTION_DAYS = int(os.getenv("MONITOR_RETENTION_DAYS", "7"))
+# Significant digits of the FX rate that count as a change
+FX_FINGERPRINT_DIGITS = 4
+# Only one API worker (or standalone monitor) scans per cycle
+MONITOR_LOCK_ID = 0x5E47_0001
+
+snapshot_cache = TTLCache("snapshots", ttl=30)
+
+Analyzer = Callable[[str], Awaitable[dict]]
+
+
+async def region_fingerprint(region: str, versions: Dict[str, int]) -> str:
+    """
+    Hashes what a scan of `region` depends on: ingested data versions, the
+    region's risk headlines and its currency's rate. Both lookups go through
+    the shared news/FX caches, so this costs no LLM calls.
+    """
+    parts = [json.dumps(versions, sort_keys=True)]
+
+    news_key = os.getenv("NEWS_API_KEY")
+    if news_key:
+        try:
+            parts.append(await search_news(f"{region} {scoring.RISK_NEWS_TERMS}", news_key))
+        except Exception:
+            parts.append("news unavailable")
+
+    fx_key = os.getenv("EXCHANGE_RATE_API_KEY")
+    currency = fx.COUNTRY_CURRENCIES.get(region)
+    if fx_key and currency:
+        try:
+            rate = (await fx.get_snapshot(fx_key))["rates"].get(currency)
+            parts.append(f"{currency}={rate:.{FX_FINGERPRINT_DIGITS}g}" if rate else currency)
+        except Exception:
+            parts.append("fx unavailable")
+
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+async def _load_latest_snapshots() -> List[dict]:
+    columns, rows = await db.fetch_all(
+        """
+        SELECT DISTINCT ON (region) region, risk_score, impacted_suppliers, report, fingerprint, created_at
+        FROM region_snapshots
+        ORDER BY region, created_at DESC
+        """
+    )
+    return [dict(zip(columns, row)) for row in rows]
+
+async def latest_snapshots(region: Optional[str] = None) -> List[dict]:
+    """
+    Most recent snapshot per region.
+    """
+    snapshots = await snapshot_cache.aget_or_load("latest", _load_latest_snapshots)
+    if region is None:
+        return snapshots
+    return [s for s in snapshots if s["region"].lower() == region.lower()]
+
+async def save_snapshot(region: str, result: dict, fingerprint: str):
+    async with db.connection() as conn:
+        await conn.execute(
+            """
+            INSERT INTO region_snapshots (region, risk_score, impacted_suppliers, report, fingerprint)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            (region, result.get("risk_score", 0), Jsonb(result.get("impacted_suppliers", [])),
+             result.get("report", ""), fingerprint),
+        )
+    snapshot_cache.invalidate()
+
+async def prune_snapshots():
+    async with db.connection() as conn:
+        await conn.execute(
+            "DELETE FROM region_snapshots WHERE created_at < now() - make_interval(days => %s)",
+            (MONITOR_RETENTION_DAYS,),
+        )
+
+def scan_order(regions: List[str], latest: Dict[str, dict], fingerprints: Dict[str, str]) -> List[str]:
+    """
+    Regions due for a scan: never scanned first, then those whose inputs
+    changed, then those past MONITOR_MAX_AGE; oldest first within each group.
+    Unchanged, fresh regions are skipped.
+    """
+    now = time.time()
+    due = []
+    for region in regions:
+        snapshot = latest.get(region)
+        if snapshot is None:
+            due.append(((0, 0.0), region))
+            continue
+        age = now - snapshot["created_at"].timestamp()
+        if snapshot["fingerprint"] != fingerprints[region]:
+            due.append(((1, -age), region))
+        elif age >= MONITOR_MAX_AGE:
+            due.append(((2, -age), region))
+    return [region for _, region in sorted(due)]
+
+async def run_cycle(analyze: Analyzer) -> int:
+    """
+    One monitoring pass. Returns the number of regions scanned.
+    """
+    with admission.priority(admission.BACKGROUND):
+        return await _run_cycle(analyze)
+
+@asynccontextmanager
+async def cycle_lock():
+    """
+    Yields whether this process won the cycle. The session-level advisory lock
+    lives on a dedicated autocommit connection, so a cycle pins neither a pool
+    slot nor an open transaction; if that connection drops, the lock goes with it.
+    """
+    async with await psycopg.AsyncConnection.connect(db.get_conninfo(), autocommit=True) as conn:
+        cur = await conn.execute("SELECT pg_try_advisory_lock(%s)", (MONITOR_LOCK_ID,))
+        acquired = (await cur.fetchone())[0]
+        try:
+            yield acquired
+        finally:
+            if acquired and not conn.closed:
+                await conn.execute("SELECT pg_advisory_unlock(%s)", (MONITOR_LOCK_ID,))
+
+async def _run_cycle(analyze: Analyzer) -> int:
+    async with cycle_lock() as acquired:
+        if not acquired:
+            return 0
+
+        regions = await exposure.get_regions()
+        versions = await exposure.get_data_versions()
+        # Batch news pull for every region before fingerprinting, so the lookups below hit the index
+        try:
+            await news_index.refresh(regions)
+        except Exception as e:
+            print(f"News index refresh failed: {e}")
+        latest = {s["region"]: s for s in await _load_latest_snapshots()}
+        fingerprints = dict(zip(regions, await asyncio.gather(*(region_fingerprint(r, versions) for r in regions))))
+        due = scan_order(regions, latest, fingerprints)
+
+        semaphore = asyncio.Semaphore(MONITOR_CONCURRENCY)
+
+        async def scan(region: str) -> bool:
+            async with semaphore:
+                try:
+                    result = await analyze(region)
+                except Exception as e:
+                    print(f"Monitor scan failed for {region}: {e}")
+                    return False
+                await save_snapshot(region, result, fingerprints[region])
+                return True
+
+        scanned = sum(await asyncio.gather(*(scan(region) for region in due)))
+        await prune_snapshots()
+        await history.drop_expired_partitions()
+        return scanned
+
+async def run_forever(analyze: Analyzer):
+    while True:
+        start = time.perf_counter()
+        try:
+            scanned = await run_cycle(analyze)
+            if scanned:
+                print(f"Monitor cycle: scanned {scanned} regions in {time.perf_counter() - start:.1f}s.")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Monitor cycle failed: {e}")
+        await asyncio.sleep(MONITOR_INTERVAL)
+
+async def _main():
+    # Standalone worker: same scans as the in-app scheduler, without serving HTTP
+    from src.main import scan_region
+    await db.open_pool()
+    try:
+        await run_forever(scan_region)
+    finally:
+        await db.close_pool()
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,469 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from src import admission, metrics
+from src.cache import CACHE_DIR
+from src.fx import COUNTRY_CURRENCIES
+from src.http_client import get_client
+
+# Serve news_tool from a local full-text index filled by batched pulls.
+NEWS_INDEX_ENABLED = os.getenv("NEWS_INDEX_ENABLED", "true").lower() == "true"
+# A country is re-pulled once its last pull is this old...
+NEWS_INDEX_PULL_INTERVAL = float(os.getenv("NEWS_INDEX_PULL_INTERVAL", "900"))
+# A country whose pull failed isn't tried again for this long, so a failing upstream isn't hit every refresh.
+NEWS_INDEX_PULL_BACKOFF = float(os.getenv("NEWS_INDEX_PULL_BACKOFF", "300"))
+# ...and the index stops answering for it (falling back to NewsAPI) once it is this old.
+NEWS_INDEX_MAX_AGE = float(os.getenv("NEWS_INDEX_MAX_AGE", "3600"))
+NEWS_INDEX_RETENTION_DAYS = float(os.getenv("NEWS_INDEX_RETENTION_DAYS", "14"))
+# Articles requested per combined-country pull (NewsAPI allows up to 100)
+NEWS_INDEX_PAGE_SIZE = int(os.getenv("NEWS_INDEX_PAGE_SIZE", "100"))
+NEWS_INDEX_PATH = os.getenv("NEWS_INDEX_PATH", os.path.join(CACHE_DIR, "news_index.sqlite"))
+# Overridable so benchmarks can point at a local stub.
+NEWS_API_URL = os.getenv("NEWS_API_URL", "https://newsapi.org/v2/everything")
+
+# Headlines matching these terms count as disruption signals for a country;
+# every region pull searches for them.
+RISK_NEWS_TERMS = "(typhoon OR earthquake OR flood OR strike OR conflict OR sanctions OR shortage OR port)"
+# NewsAPI rejects longer `q` values
+NEWS_QUERY_MAX_CHARS = 500
+# Countries per combined pull, so one busy country can't fill the whole page
+NEWS_PULL_MAX_COUNTRIES = int(os.getenv("NEWS_PULL_MAX_COUNTRIES", "5"))
+# Articles per answer, the same as a single upstream lookup returns
+NEWS_RESULTS = 5
+
+# Other names an article may use for a country; the country name itself always counts.
+COUNTRY_ALIASES = {
+    "USA": ("United States", "U.S.", "American"),
+    "United Kingdom": ("UK", "U.K.", "Britain", "British"),
+    "South Korea": ("Korea", "Korean"),
+    "Japan": ("Japanese",),
+    "Taiwan": ("Taiwanese",),
+    "Ukraine": ("Ukrainian",),
+    "China": ("Chinese",),
+    "Vietnam": ("Vietnamese",),
+    "India": ("Indian",),
+    "Germany": ("German",),
+    "France": ("French",),
+    "Italy": ("Italian",),
+    "Netherlands": ("Dutch",),
+    "Mexico": ("Mexican",),
+    "Brazil": ("Brazilian",),
+    "Thailand": ("Thai",),
+    "Malaysia": ("Malaysian",),
+    "Indonesia": ("Indonesian",),
+    "Turkey": ("Turkish", "Türkiye"),
+    "Canada": ("Canadian",),
+}
+
+# Query words that carry no topic of their own
+QUERY_STOPWORDS = {
+    "or", "and", "not", "the", "a", "an", "of", "in", "on", "for", "to", "at", "with", "about",
+    "news", "latest", "recent", "current", "today", "events", "event",
+}
+# URL query parameters that don't identify the article
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|ocid|cmpid|ref|src)$", re.IGNORECASE)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS articles (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL UNIQUE,
+        title TEXT NOT NULL,
+        source TEXT,
+        description TEXT,
+        published_at REAL NOT NULL,
+        fetched_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_articles_published ON articles (published_at);
+    CREATE TABLE IF NOT EXISTS article_countries (
+        country TEXT NOT NULL,
+        article_id INTEGER NOT NULL,
+        PRIMARY KEY (country, article_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS pulls (
+        country TEXT PRIMARY KEY,
+        pulled_at REAL NOT NULL,
+        articles INTEGER NOT NULL
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+        title, description, content='articles', content_rowid='id', tokenize='porter unicode61'
+    );
+    CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+        INSERT INTO articles_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+        INSERT INTO articles_fts (articles_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        DELETE FROM article_countries WHERE article_id = old.id;
+    END;
+"""
+
+
+class Article(NamedTuple):
+    url: str
+    title: str
+    source: str
+    description: str
+    published_at: float
+
+
+class SearchResult(NamedTuple):
+    articles: List[Article]
+    countries: List[str]
+    # Oldest pull among the countries searched, or the newest pull of any country
+    pulled_at: float
+
+
+def _country_pattern(country: str) -> re.Pattern:
+    names = sorted((country, *COUNTRY_ALIASES.get(country, ())), key=len, reverse=True)
+    return re.compile(r"(?<!\w)(" + "|".join(re.escape(n) for n in names) + r")(?!\w)")
+
+# Article text is matched case-sensitively ("US" the country, not "us"); queries are not.
+COUNTRY_PATTERNS = {country: _country_pattern(country) for country in COUNTRY_CURRENCIES}
+QUERY_COUNTRY_PATTERNS = {
+    country: re.compile(pattern.pattern, re.IGNORECASE) for country, pattern in COUNTRY_PATTERNS.items()
+}
+
+def canonical_url(url: str) -> str:
+    """
+    Dedup key for an article URL: lowercased host, no fragment, tracking
+    parameters or trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), query, ""))
+
+def countries_in(text: str) -> List[str]:
+    return [country for country, pattern in COUNTRY_PATTERNS.items() if pattern.search(text)]
+
+def parse_query(query: str) -> Tuple[List[str], List[str]]:
+    """
+    Splits a free-text news query into the countries it names and its topic terms.
+    """
+    countries = []
+    for country, pattern in QUERY_COUNTRY_PATTERNS.items():
+        if pattern.search(query):
+            countries.append(country)
+            query = pattern.sub(" ", query)
+    terms = [
+        word for word in re.findall(r"\w+", query.lower())
+        if word not in QUERY_STOPWORDS and not word.isdigit()
+    ]
+    return countries, list(dict.fromkeys(terms))
+
+def _country_term(country: str) -> str:
+    names = (country, *COUNTRY_ALIASES.get(country, ()))
+    return " OR ".join(f'"{name}"' if not name.isalpha() else name for name in names)
+
+def pull_queries(countries: Sequence[str], terms: str = RISK_NEWS_TERMS) -> List[Tuple[List[str], str]]:
+    """
+    Packs countries into NewsAPI queries of the form (A OR B OR ...) AND <terms>,
+    at most NEWS_PULL_MAX_COUNTRIES and NEWS_QUERY_MAX_CHARS each.
+    """
+    queries = []
+    group: List[str] = []
+    for country in countries:
+        candidate = group + [country]
+        q = f"({' OR '.join(map(_country_term, candidate))}) AND {terms}"
+        if group and (len(candidate) > NEWS_PULL_MAX_COUNTRIES or len(q) > NEWS_QUERY_MAX_CHARS):
+            queries.append((group, f"({' OR '.join(map(_country_term, group))}) AND {terms}"))
+            group = [country]
+        else:
+            group = candidate
+    if group:
+        queries.append((group, f"({' OR '.join(map(_country_term, group))}) AND {terms}"))
+    return queries
+
+def _published_at(article: dict) -> float:
+    try:
+        return datetime.fromisoformat(article["publishedAt"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, AttributeError, ValueError):
+        return time.time()
+
+def parse_articles(articles: Iterable[dict]) -> List[Article]:
+    parsed = []
+    for article in articles:
+        if not article.get("url") or not article.get("title"):
+            continue
+        parsed.append(Article(
+            url=article["url"],
+            title=article["title"],
+            source=(article.get("source") or {}).get("name") or "",
+            description=article.get("description") or "",
+            published_at=_published_at(article),
+        ))
+    return parsed
+
+def format_articles(articles: Sequence[Article]) -> str:
+    if not articles:
+        return "No news found."
+    return "\n\n".join(
+        f"Title: {a.title}\nSource: {a.source}\nDescription: {a.description}\nURL: {a.url}"
+        for a in articles
+    )
+
+def freshness(result: SearchResult) -> str:
+    scope = ", ".join(result.countries) if result.countries else "all monitored countries"
+    age_minutes = int((time.time() - result.pulled_at) // 60)
+    note = f"(Indexed news for {scope}, pulled {age_minutes} min ago"
+    if result.articles:
+        newest = datetime.fromtimestamp(max(a.published_at for a in result.articles), timezone.utc)
+        note += f"; newest article published {newest:%Y-%m-%d %H:%M} UTC"
+    return note + ")"
+
+
+class NewsIndex:
+    """
+    Articles from NewsAPI in a local SQLite FTS5 index, deduplicated by URL
+    and tagged with the countries they mention. Like the disk cache, the file
+    is shared by every worker on the host.
+    """
+    def __init__(self, path: str = NEWS_INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def add(self, articles: Sequence[Article], countries: Sequence[str] = ()) -> Tuple[int, int]:
+        """
+        Stores articles not already indexed under the same canonical URL and
+        tags each with the countries it mentions plus `countries`.
+        Returns (new, duplicate) counts.
+        """
+        now = time.time()
+        new = 0
+        with self._lock:
+            for article in articles:
+                row = self._conn.execute(
+                    """
+                    INSERT INTO articles (url, title, source, description, published_at, fetched_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (url) DO NOTHING
+                    RETURNING id
+                    """,
+                    (canonical_url(article.url), article.title, article.source, article.description,
+                     article.published_at, now),
+                ).fetchone()
+                if row is None:
+                    row = self._conn.execute(
+                        "SELECT id FROM articles WHERE url = ?", (canonical_url(article.url),)
+                    ).fetchone()
+                else:
+                    new += 1
+                tags = set(countries_in(f"{article.title}\n{article.description}")) | set(countries)
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO article_countries (country, article_id) VALUES (?, ?)",
+                    [(country, row[0]) for country in tags],
+                )
+            self._conn.commit()
+        return new, len(articles) - new
+
+    def mark_pulled(self, countries: Sequence[str], when: float):
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO pulls (country, pulled_at, articles)
+                VALUES (?, ?, (SELECT COUNT(*) FROM article_countries WHERE country = ?))
+                ON CONFLICT (country) DO UPDATE SET pulled_at = excluded.pulled_at, articles = excluded.articles
+                """,
+                [(country, when, country) for country in countries],
+            )
+            self._conn.commit()
+
+    def pulled_at(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT country, pulled_at FROM pulls"))
+
+    def search(self, countries: Sequence[str], terms: Sequence[str], limit: int = NEWS_RESULTS) -> List[Article]:
+        """
+        Newest articles tagged with any of `countries` (all articles if none)
+        that mention any of `terms` (any article if none).
+        """
+        cutoff = time.time() - NEWS_INDEX_RETENTION_DAYS * 86400
+        clauses = ["a.published_at >= ?"]
+        params: list = [cutoff]
+        if terms:
+            clauses.append("a.id IN (SELECT rowid FROM articles_fts WHERE articles_fts MATCH ?)")
+            params.append(" OR ".join('"' + t.replace('"', "") + '"' for t in terms))
+        if countries:
+            clauses.append(
+                f"a.id IN (SELECT article_id FROM article_countries WHERE country IN ({', '.join('?' * len(countries))}))"
+            )
+            params += list(countries)
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT a.url, a.title, a.source, a.description, a.published_at
+                FROM articles a
+                WHERE {' AND '.join(clauses)}
+                ORDER BY a.published_at DESC
+                LIMIT ?
+                """,
+                params,
+            ).fetchall()
+        return [Article(*row) for row in rows]
+
+    def watermark(self, countries: Sequence[str] = ()) -> int:
+        """
+        Highest article id tagged with any of `countries` (any article if none);
+        it only moves when new articles arrive.
+        """
+        with self._lock:
+            if countries:
+                row = self._conn.execute(
+                    f"SELECT MAX(article_id) FROM article_countries WHERE country IN ({', '.join('?' * len(countries))})",
+                    list(countries),
+                ).fetchone()
+            else:
+                row = self._conn.execute("SELECT MAX(id) FROM articles").fetchone()
+        return row[0] or 0
+
+    def prune(self) -> int:
+        cutoff = time.time() - NEWS_INDEX_RETENTION_DAYS * 86400
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM articles WHERE published_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            articles = self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+            pulls = self._conn.execute("SELECT COUNT(*), MIN(pulled_at), MAX(pulled_at) FROM pulls").fetchone()
+        now = time.time()
+        return {
+            "articles": articles,
+            "countries": pulls[0],
+            "oldest_pull_age": round(now - pulls[1], 1) if pulls[1] else None,
+            "newest_pull_age": round(now - pulls[2], 1) if pulls[2] else None,
+        }
+
+
+_index: Optional[NewsIndex] = None
+_index_lock = threading.Lock()
+_pull_lock: Optional[asyncio.Lock] = None
+# When each country's last pull failed, for backing off (country -> timestamp)
+_failed_at: Dict[str, float] = {}
+
+def get_index() -> NewsIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NewsIndex()
+    return _index
+
+async def fetch_articles(query: str, api_key: str, page_size: int = NEWS_RESULTS) -> List[Article]:
+    """
+    One NewsAPI request, newest first. Raises on API errors.
+    """
+    params = {"q": query, "sortBy": "publishedAt", "apiKey": api_key, "language": "en", "pageSize": page_size}
+    response = await admission.call(admission.newsapi, lambda: get_client().get(NEWS_API_URL, params=params))
+    data = response.json()
+    if data.get("status") != "ok":
+        raise ValueError(f"NewsAPI Error: {data.get('message')}")
+    return parse_articles(data.get("articles", []))
+
+async def pull(countries: Sequence[str], api_key: str) -> int:
+    """
+    Pulls risk news for `countries` with combined queries, one request per
+    group of countries rather than one per country. Returns new articles indexed.
+    """
+    index = get_index()
+
+    async def pull_group(group: List[str], query: str) -> int:
+        started = time.time()
+        try:
+            articles = await fetch_articles(query, api_key, NEWS_INDEX_PAGE_SIZE)
+        except Exception as e:
+            print(f"News index pull failed for {', '.join(group)}: {e}")
+            _failed_at.update(dict.fromkeys(group, time.time()))
+            return 0
+        for country in group:
+            _failed_at.pop(country, None)
+        new, duplicate = await asyncio.to_thread(index.add, articles)
+        await asyncio.to_thread(index.mark_pulled, group, started)
+        metrics.news_index_articles.inc("new", amount=new)
+        metrics.news_index_articles.inc("duplicate", amount=duplicate)
+        return new
+
+    added = sum(await asyncio.gather(*(pull_group(group, q) for group, q in pull_queries(countries))))
+    await asyncio.to_thread(index.prune)
+    return added
+
+async def refresh(countries: Sequence[str], api_key: Optional[str] = None) -> int:
+    """
+    Pulls the countries whose last pull is older than NEWS_INDEX_PULL_INTERVAL,
+    skipping those whose last attempt failed within NEWS_INDEX_PULL_BACKOFF.
+    Concurrent refreshes in one process wait for each other instead of pulling twice.
+    """
+    global _pull_lock
+    api_key = api_key or os.getenv("NEWS_API_KEY")
+    if not NEWS_INDEX_ENABLED or not api_key:
+        return 0
+    if _pull_lock is None:
+        _pull_lock = asyncio.Lock()
+    async with _pull_lock:
+        pulled = await asyncio.to_thread(get_index().pulled_at)
+        now = time.time()
+        stale = [
+            c for c in dict.fromkeys(countries)
+            if now - pulled.get(c, 0) >= NEWS_INDEX_PULL_INTERVAL and now - _failed_at.get(c, 0) >= NEWS_INDEX_PULL_BACKOFF
+        ]
+        return await pull(stale, api_key) if stale else 0
+
+async def search(query: str) -> Optional[SearchResult]:
+    """
+    Answers a news query from the index, or returns None on a miss: the index
+    is disabled, a country in the query wasn't pulled within NEWS_INDEX_MAX_AGE,
+    or nothing matched a topic the pulls don't cover.
+    """
+    if not NEWS_INDEX_ENABLED:
+        return None
+    countries, terms = parse_query(query)
+    index = get_index()
+    pulled = await asyncio.to_thread(index.pulled_at)
+    now = time.time()
+    if countries:
+        if any(now - pulled.get(c, 0) > NEWS_INDEX_MAX_AGE for c in countries):
+            metrics.news_index_lookups.inc("stale")
+            return None
+        pulled_at = min(pulled[c] for c in countries)
+    else:
+        if not terms or not pulled or now - max(pulled.values()) > NEWS_INDEX_MAX_AGE:
+            metrics.news_index_lookups.inc("miss")
+            return None
+        pulled_at = max(pulled.values())
+
+    articles = await asyncio.to_thread(index.search, countries, terms)
+    # An empty answer is only trusted when the pull itself searched for these terms
+    if not articles and not (countries and set(terms) <= set(parse_query(RISK_NEWS_TERMS)[1])):
+        metrics.news_index_lookups.inc("miss")
+        return None
+    metrics.news_index_lookups.inc("hit")
+    return SearchResult(articles, countries, pulled_at)
+
+async def watermark(query: str) -> Optional[int]:
+    """
+    News version for a query: the newest indexed article for the countries it names.
+    """
+    if not NEWS_INDEX_ENABLED:
+        return None
+    return await asyncio.to_thread(get_index().watermark, parse_query(query)[0])
+
+def remember(query: str, articles: Sequence[Article]) -> Tuple[int, int]:
+    """
+    Indexes the articles of an upstream fallback lookup, tagged with the
+    countries the query named.
+    """
+    if not NEWS_INDEX_ENABLED:
+        return 0, 0
+    return get_index().add(articles, parse_query(query)[0])
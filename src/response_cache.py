@@ -0,0 +1,146 @@
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+
+from src import admission, exposure, fx, news_index
+from src.cache import _MISSING, MemoryBackend, TTLCache, normalize_key
+
+# Whole-response cache for stateless /analyze_risk requests and region scans.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+# A stored response is reused while its inputs are unchanged, for at most this long...
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# ...and served stale while one background run refreshes it, up to this age.
+RESPONSE_CACHE_STALE_TTL = float(os.getenv("RESPONSE_CACHE_STALE_TTL", "86400"))
+
+# Fields of a response that belong to the run that produced it, not to the answer
+RUN_FIELDS = {"token_usage", "trace", "thread_id", "turn", "cache", "cache_age"}
+
+Compute = Callable[[], Awaitable[dict]]
+
+
+def normalize_query(query: str) -> str:
+    return normalize_key(query).rstrip(" .?!")
+
+async def input_versions(query: str) -> dict:
+    """
+    What an answer to `query` depends on besides the query itself: ingested
+    data versions, the newest indexed article for the countries it names and
+    the FX snapshot. A part that can't be read is None, which only ever
+    matches another failed read.
+    """
+    data, news = await asyncio.gather(
+        exposure.get_data_versions(), news_index.watermark(query), return_exceptions=True
+    )
+    return {
+        "data": None if isinstance(data, Exception) else data,
+        "news": None if isinstance(news, Exception) else news,
+        "fx": fx.snapshot_time(),
+    }
+
+
+class ResponseCache(TTLCache):
+    """
+    Dashboard payloads (report, score, suppliers) per normalized query, each
+    stored with the input versions it was computed from. A lookup whose
+    versions still match within RESPONSE_CACHE_TTL is a hit. Otherwise the
+    old payload is served as stale while a single background run recomputes
+    it. Entries are evicted least recently used first.
+    """
+    def __init__(self):
+        super().__init__(
+            "responses", ttl=RESPONSE_CACHE_STALE_TTL, backend=MemoryBackend(RESPONSE_CACHE_MAX_ENTRIES)
+        )
+        self.stale_hits = 0
+        self.refreshes = 0
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def store(self, query: str, result: dict, before: dict):
+        """
+        Stores a freshly computed response. `before` are the versions read
+        when the run started.
+        """
+        after = await input_versions(query)
+        # The run's SQL saw the data as of its start; news and FX may have been refreshed by the run itself
+        versions = {**after, "data": before["data"]}
+        payload = {k: v for k, v in result.items() if k not in RUN_FIELDS}
+        self.set(normalize_query(query), {"versions": versions, "created_at": time.time(), "result": payload})
+
+    async def _compute(self, query: str, compute: Compute) -> dict:
+        before = await input_versions(query)
+        result = await compute()
+        await self.store(query, result, before)
+        return result
+
+    def _refresh(self, query: str, key: str, compute: Compute):
+        if key in self._refreshing:
+            return
+        self.refreshes += 1
+
+        def finished(task: asyncio.Task):
+            self._refreshing.pop(key, None)
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Response cache refresh failed for '{query}': {task.exception()}")
+
+        async def refresh():
+            # Someone already has an answer; the refresh yields to interactive work
+            with admission.priority(admission.BACKGROUND):
+                return await self._compute(query, compute)
+
+        task = asyncio.create_task(refresh())
+        task.add_done_callback(finished)
+        self._refreshing[key] = task
+
+    async def lookup(self, query: str, compute: Compute) -> Optional[dict]:
+        """
+        The stored response for `query` marked "hit" or "stale", or None on a
+        miss. A stale response starts a background `compute` that replaces it.
+        """
+        key = normalize_query(query)
+        entry = self.peek(key) if RESPONSE_CACHE_ENABLED else None
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        age = time.time() - entry["created_at"]
+        if age < RESPONSE_CACHE_TTL and entry["versions"] == await input_versions(query):
+            self.stats.hits += 1
+            status = "hit"
+        else:
+            self.stale_hits += 1
+            status = "stale"
+            self._refresh(query, key, compute)
+        return {**entry["result"], "token_usage": [], "cache": status, "cache_age": round(age, 1)}
+
+    async def get_or_compute(self, query: str, compute: Compute, force: bool = False) -> dict:
+        """
+        Serves `query` from the cache, or runs `compute` and stores the result.
+        Concurrent misses for the same query share one run, which carries on
+        for the others if the caller that started it goes away. `force` skips
+        the lookup but still stores the new result.
+        """
+        if not RESPONSE_CACHE_ENABLED:
+            return await compute()
+        if not force:
+            cached = await self.lookup(query, compute)
+            if cached is not None:
+                return cached
+
+        key = normalize_query(query)
+        while True:
+            leader, future = self._join_or_lead(key)
+            if leader:
+                result = await asyncio.shield(self._lead(key, future, lambda: self._compute(query, compute)))
+                return {**result, "cache": "miss"}
+
+            self.stats.coalesced += 1
+            result = await self._follow(future)
+            if result is not _MISSING:
+                return {**result, "token_usage": [], "cache": "shared"}
+
+    def info(self) -> dict:
+        return {**super().info(), "stale_hits": self.stale_hits, "refreshes": self.refreshes}
+
+
+responses = ResponseCache()
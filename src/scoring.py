@@ -0,0 +1,248 @@
+import os
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src import db, fx, news_index
+from src.news_index import RISK_NEWS_TERMS
+from src.tools import search_news
+
+# Shipment statuses that still carry delivery risk.
+OPEN_SHIPMENT_STATUSES = ["Pending", "In Transit", "Delayed"]
+
+# Article count at which the event signal reaches ~63% of its maximum.
+NEWS_SATURATION = float(os.getenv("SCORE_NEWS_SATURATION", "5"))
+# Absolute currency move treated as a maximal FX signal (0.05 = 5%).
+FX_MOVE_SATURATION = float(os.getenv("SCORE_FX_MOVE_SATURATION", "0.05"))
+# Open shipments due within this many days raise urgency.
+DUE_SOON_DAYS = float(os.getenv("SCORE_DUE_SOON_DAYS", "30"))
+HIGH_THRESHOLD = float(os.getenv("SCORE_HIGH_THRESHOLD", "60"))
+MEDIUM_THRESHOLD = float(os.getenv("SCORE_MEDIUM_THRESHOLD", "30"))
+
+# (event weight, FX weight) per category: logistics is exposed to physical
+# disruption, raw materials to price moves, electronics to both.
+CATEGORY_WEIGHTS = {
+    "Electronics": (0.6, 0.4),
+    "Raw Materials": (0.4, 0.6),
+    "Logistics": (0.8, 0.2),
+}
+DEFAULT_CATEGORY_WEIGHTS = (0.6, 0.4)
+
+SUPPLIER_EXPOSURE_QUERY = """
+    SELECT s.id, s.name, s.country, s.category, s.risk_tolerance_score,
+           COALESCE(SUM(sh.value_usd) FILTER (WHERE sh.status = ANY(%s)), 0) AS open_value,
+           MIN(sh.due_date) FILTER (WHERE sh.status = ANY(%s)) - CURRENT_DATE AS days_to_due
+    FROM suppliers s
+    LEFT JOIN shipments sh ON sh.supplier_id = s.id
+    WHERE (%s::text IS NULL OR lower(s.country) = lower(%s::text))
+    GROUP BY s.id
+"""
+
+
+@dataclass
+class SupplierTable:
+    """
+    Column-oriented supplier data, one array element per supplier.
+    """
+    ids: np.ndarray
+    names: np.ndarray
+    countries: np.ndarray
+    categories: np.ndarray
+    tolerance: np.ndarray
+    open_value: np.ndarray
+    days_to_due: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[tuple]) -> "SupplierTable":
+        """
+        Builds the table from SUPPLIER_EXPOSURE_QUERY rows.
+        """
+        if not rows:
+            empty = np.array([], dtype=object)
+            return cls(np.array([], dtype=np.int64), empty, empty, empty,
+                       np.array([]), np.array([]), np.array([]))
+        ids, names, countries, categories, tolerance, open_value, days = zip(*rows)
+        return cls(
+            ids=np.array(ids, dtype=np.int64),
+            names=np.array(names, dtype=object),
+            countries=np.array([c or "" for c in countries], dtype=object),
+            categories=np.array([c or "" for c in categories], dtype=object),
+            tolerance=np.array([5 if t is None else t for t in tolerance], dtype=np.float64),
+            open_value=np.array([0 if v is None else v for v in open_value], dtype=np.float64),
+            days_to_due=np.array([np.nan if d is None else d for d in days], dtype=np.float64),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+
+@dataclass
+class ScoreResult:
+    table: SupplierTable
+    scores: np.ndarray
+    levels: np.ndarray
+    region_scores: Dict[str, float]
+
+    def suppliers(self, limit: int = 10, min_level: str = "Medium") -> List[dict]:
+        """
+        Highest-scoring suppliers at or above `min_level`, in the dashboard's supplier card shape.
+        """
+        floor = {"High": HIGH_THRESHOLD, "Medium": MEDIUM_THRESHOLD, "Low": 0.0}[min_level]
+        order = np.argsort(-self.scores, kind="stable")
+        order = order[self.scores[order] >= floor][:limit]
+        t = self.table
+        return [
+            {
+                "id": int(t.ids[i]),
+                "name": t.names[i],
+                "country": t.countries[i],
+                "category": t.categories[i],
+                "risk_level": self.levels[i],
+                "risk_score": float(self.scores[i]),
+            }
+            for i in order
+        ]
+
+
+def score_suppliers(
+    table: SupplierTable,
+    news_hits: Dict[str, int],
+    fx_moves: Dict[str, float],
+) -> ScoreResult:
+    """
+    Scores every supplier in one vectorized pass.
+
+    A supplier's score (0-100) is the country's hazard (news events and currency
+    moves, weighted by category) scaled by its susceptibility (low risk tolerance,
+    open shipment value and how soon open shipments are due). A region's score
+    blends its worst supplier with the exposure-weighted mean.
+    """
+    n = len(table)
+    if n == 0:
+        return ScoreResult(table, np.zeros(0), np.array([], dtype=object), {})
+
+    region_names, country_idx = np.unique(table.countries, return_inverse=True)
+    category_names, category_idx = np.unique(table.categories, return_inverse=True)
+
+    news = np.array([news_hits.get(c, 0) for c in region_names], dtype=np.float64)[country_idx]
+    moves = np.abs(np.array([fx_moves.get(c, 0.0) for c in region_names], dtype=np.float64))[country_idx]
+    weights = np.array(
+        [CATEGORY_WEIGHTS.get(c, DEFAULT_CATEGORY_WEIGHTS) for c in category_names], dtype=np.float64
+    )[category_idx]
+
+    event_signal = 1.0 - np.exp(-news / NEWS_SATURATION)
+    fx_signal = np.minimum(moves / FX_MOVE_SATURATION, 1.0)
+    hazard = np.clip(weights[:, 0] * event_signal + weights[:, 1] * fx_signal, 0.0, 1.0)
+
+    vulnerability = np.clip((10.0 - table.tolerance) / 9.0, 0.0, 1.0)
+    max_value = table.open_value.max()
+    exposure = np.log1p(table.open_value) / np.log1p(max_value) if max_value > 0 else np.zeros(n)
+    urgency = np.where(
+        np.isnan(table.days_to_due), 0.0,
+        np.clip(1.0 - np.nan_to_num(table.days_to_due) / DUE_SOON_DAYS, 0.0, 1.0),
+    )
+    susceptibility = 0.4 * vulnerability + 0.35 * exposure + 0.25 * urgency
+
+    scores = np.round(100.0 * hazard * (0.4 + 0.6 * susceptibility), 1)
+    levels = np.where(
+        scores >= HIGH_THRESHOLD, "High", np.where(scores >= MEDIUM_THRESHOLD, "Medium", "Low")
+    ).astype(object)
+
+    k = len(region_names)
+    weight = table.open_value + 1.0
+    weighted_mean = (
+        np.bincount(country_idx, weights=scores * weight, minlength=k)
+        / np.bincount(country_idx, weights=weight, minlength=k)
+    )
+    worst = np.zeros(k)
+    np.maximum.at(worst, country_idx, scores)
+    region_scores = np.round(0.5 * worst + 0.5 * weighted_mean, 1)
+
+    return ScoreResult(
+        table=table,
+        scores=scores,
+        levels=levels,
+        region_scores={str(name): float(score) for name, score in zip(region_names, region_scores)},
+    )
+
+# --- Data loading ---
+
+async def load_supplier_table(region: Optional[str] = None) -> SupplierTable:
+    _, rows = await db.fetch_all(
+        SUPPLIER_EXPOSURE_QUERY,
+        (OPEN_SHIPMENT_STATUSES, OPEN_SHIPMENT_STATUSES, region, region),
+    )
+    return SupplierTable.from_rows(rows)
+
+async def _count_news_hits(country: str) -> int:
+    api_key = os.getenv("NEWS_API_KEY")
+    if not api_key:
+        return 0
+    try:
+        return (await search_news(f"{country} {RISK_NEWS_TERMS}", api_key)).count("Title:")
+    except Exception as e:
+        print(f"News signal unavailable for {country}: {e}")
+        return 0
+
+async def _fx_move(country: str) -> float:
+    api_key = os.getenv("EXCHANGE_RATE_API_KEY")
+    currency = fx.COUNTRY_CURRENCIES.get(country)
+    if not api_key or not currency:
+        return 0.0
+    try:
+        # Refreshes the snapshot if it is stale, which is what produces a move
+        await fx.get_snapshot(api_key)
+    except Exception as e:
+        print(f"FX signal unavailable for {country}: {e}")
+        return 0.0
+    return fx.rate_change(currency)
+
+async def gather_signals(countries: Sequence[str]):
+    """
+    Collects per-country event signals through the news and FX caches.
+    Returns (news_hits, fx_moves) dicts keyed by country.
+    """
+    countries = list(dict.fromkeys(countries))
+    # One combined pull covers every stale country instead of a request per country
+    try:
+        await news_index.refresh(countries)
+    except Exception as e:
+        print(f"News index refresh failed: {e}")
+    news = await asyncio.gather(*(_count_news_hits(c) for c in countries))
+    moves = await asyncio.gather(*(_fx_move(c) for c in countries))
+    return dict(zip(countries, news)), dict(zip(countries, moves))
+
+async def assess_region(region: str, limit: int = 10) -> dict:
+    """
+    Scores one region end to end and returns the fields the graph's analyst would produce.
+    """
+    table = await load_supplier_table(region)
+    if len(table) == 0:
+        return {
+            "risk_score": 0.0,
+            "impacted_suppliers": [],
+            "analysis": f"No suppliers on record for {region}.",
+        }
+
+    news_hits, fx_moves = await gather_signals(table.countries.tolist())
+    result = score_suppliers(table, news_hits, fx_moves)
+    impacted = result.suppliers(limit=limit)
+
+    high = int(np.count_nonzero(result.levels == "High"))
+    medium = int(np.count_nonzero(result.levels == "Medium"))
+    at_risk_value = float(table.open_value[result.scores >= MEDIUM_THRESHOLD].sum())
+    country = str(table.countries[0])
+    currency = fx.COUNTRY_CURRENCIES.get(country, "n/a")
+    analysis = (
+        f"Deterministic scoring for {region}: {len(table)} suppliers assessed. "
+        f"{news_hits.get(country, 0)} recent risk-related news articles; "
+        f"local currency ({currency}) moved {fx_moves.get(country, 0.0):+.2%} against USD since the previous snapshot. "
+        f"{high} suppliers rated High and {medium} Medium, with ${at_risk_value:,.0f} of open shipment value at risk."
+    )
+    return {
+        "risk_score": result.region_scores.get(country, 0.0),
+        "impacted_suppliers": impacted,
+        "analysis": analysis,
+    }
@@ -0,0 +1,159 @@
+import os
+import time
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from src import db
+
+# Where conversation checkpoints live: "postgres" (shared by every worker) or "memory" (this process only).
+SESSION_STORE = os.getenv("SESSION_STORE", "postgres")
+# Sessions idle for longer than this are deleted along with their checkpoints.
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(24 * 3600)))
+SESSION_EVICT_INTERVAL = float(os.getenv("SESSION_EVICT_INTERVAL", "600"))
+SESSION_POOL_MAX_SIZE = int(os.getenv("SESSION_POOL_MAX_SIZE", "4"))
+
+_saver = None
+_session_pool: Optional[AsyncConnectionPool] = None
+_graph = None
+_init_lock = asyncio.Lock()
+# In-process bookkeeping for the memory store (thread_id -> (last_used, turns))
+_memory_sessions: Dict[str, tuple] = {}
+# One turn at a time per thread: concurrent turns would fork the conversation
+_turn_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+async def _create_saver():
+    global _session_pool
+    if SESSION_STORE == "postgres":
+        try:
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        except ImportError:
+            print("Warning: langgraph-checkpoint-postgres is not installed; sessions are kept in memory.")
+        else:
+            # The saver needs autocommit and dict rows, so it gets its own small pool
+            pool = AsyncConnectionPool(
+                conninfo=db.get_conninfo(),
+                max_size=SESSION_POOL_MAX_SIZE,
+                kwargs={"autocommit": True, "row_factory": dict_row, "prepare_threshold": 0},
+                name="sentinel-sessions",
+                open=False,
+            )
+            try:
+                await pool.open()
+                saver = AsyncPostgresSaver(pool)
+                await saver.setup()
+            except BaseException:
+                await pool.close()
+                raise
+            # Published only once usable, so a failed setup leaves no half-initialized store behind
+            _session_pool = pool
+            return saver
+
+    from langgraph.checkpoint.memory import InMemorySaver
+    return InMemorySaver()
+
+async def get_saver():
+    global _saver
+    if _saver is None:
+        async with _init_lock:
+            if _saver is None:
+                _saver = await _create_saver()
+    return _saver
+
+def uses_postgres() -> bool:
+    return _session_pool is not None
+
+async def get_session_graph():
+    """
+    The graph compiled with the session checkpointer. Stateless requests keep
+    using graph.get_graph(), which skips checkpoint writes entirely.
+    """
+    global _graph
+    if _graph is None:
+        from src.graph import build_graph
+        _graph = build_graph(checkpointer=await get_saver())
+    return _graph
+
+async def close():
+    global _saver, _session_pool, _graph
+    if _session_pool is not None:
+        await _session_pool.close()
+    _saver, _session_pool, _graph = None, None, None
+
+# --- Session bookkeeping ---
+
+async def _touch(thread_id: str) -> int:
+    """
+    Records a turn for `thread_id` and returns its turn number (1 for a new session).
+    """
+    if not uses_postgres():
+        _, turns = _memory_sessions.get(thread_id, (0.0, 0))
+        _memory_sessions[thread_id] = (time.time(), turns + 1)
+        return turns + 1
+    _, rows = await db.fetch_all(
+        """
+        INSERT INTO agent_sessions (thread_id) VALUES (%s)
+        ON CONFLICT (thread_id) DO UPDATE
+            SET last_used_at = now(), turns = agent_sessions.turns + 1
+        RETURNING turns
+        """,
+        (thread_id,),
+    )
+    return rows[0][0]
+
+@asynccontextmanager
+async def turn(thread_id: str):
+    """
+    Serializes turns within a session and yields the turn number.
+    """
+    lock = _turn_locks.get(thread_id)
+    if lock is None:
+        lock = _turn_locks[thread_id] = asyncio.Lock()
+    async with lock:
+        await get_saver()
+        yield await _touch(thread_id)
+
+async def delete_session(thread_id: str):
+    saver = await get_saver()
+    await saver.adelete_thread(thread_id)
+    if uses_postgres():
+        await db.fetch_all("DELETE FROM agent_sessions WHERE thread_id = %s", (thread_id,))
+    else:
+        _memory_sessions.pop(thread_id, None)
+
+async def evict_expired() -> int:
+    """
+    Deletes sessions idle for longer than SESSION_TTL. Returns how many were removed.
+    """
+    saver = await get_saver()
+    if uses_postgres():
+        _, rows = await db.fetch_all(
+            "DELETE FROM agent_sessions WHERE last_used_at < now() - make_interval(secs => %s) RETURNING thread_id",
+            (SESSION_TTL,),
+        )
+        expired = [row[0] for row in rows]
+    else:
+        cutoff = time.time() - SESSION_TTL
+        expired = [t for t, (last_used, _) in _memory_sessions.items() if last_used < cutoff]
+        for thread_id in expired:
+            _memory_sessions.pop(thread_id, None)
+    for thread_id in expired:
+        await saver.adelete_thread(thread_id)
+    return len(expired)
+
+async def run_eviction():
+    while True:
+        await asyncio.sleep(SESSION_EVICT_INTERVAL)
+        try:
+            evicted = await evict_expired()
+            if evicted:
+                print(f"Evicted {evicted} idle sessions.")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Session eviction failed: {e}")
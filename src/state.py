@@ -2,10 +2,25 @@ from typing import TypedDict, Annotated, List, Dict, Any
 import operator
 from langchain_core.messages import AnyMessage
 
+from src.compaction import compact_history
+
+def add_and_compact(left: list[AnyMessage], right: list[AnyMessage]) -> list[AnyMessage]:
+    """
+    Appends new messages, then keeps the history within the token budget
+    (oversized tool outputs digested, superseded tool rounds dropped).
+    """
+    return compact_history(left + right)
+
 class AgentState(TypedDict):
-    messages: Annotated[list[AnyMessage], operator.add]
+    messages: Annotated[list[AnyMessage], add_and_compact]
     risk_score: float
     impacted_suppliers: List[dict]
     analysis: str
     report_draft: str
     next_step: str
+    # Set by the supervisor for templated "check risks for <region>" queries
+    region: str
+    # Data-fetcher rounds in the current turn, checked against FETCH_MAX_LLM_CALLS
+    fetch_rounds: int
+    # One entry per LLM call: node, message count, estimated and reported tokens
+    token_usage: Annotated[List[dict], operator.add]
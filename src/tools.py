@@ -1,111 +1,232 @@
+import io
 import os
-import requests
-import psycopg2
-from typing import List, Dict, Any
+import csv
+import time
+import asyncio
 from langchain_core.tools import tool
 from dotenv import load_dotenv
 
+from src import contracts, db, fx, news_index
+from src.cache import TTLCache, make_backend, normalize_key
+from src.compaction import CHARS_PER_TOKEN, TOOL_OUTPUT_MAX_TOKENS
+
 load_dotenv()
 
+# News results change slowly relative to how often the dashboard asks for them.
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "900"))
+NEWS_CACHE_MAX_ENTRIES = int(os.getenv("NEWS_CACHE_MAX_ENTRIES", "256"))
+# "memory" (default) or "disk" to share a warm cache across restarts and workers
+NEWS_CACHE_BACKEND = os.getenv("NEWS_CACHE_BACKEND", "memory")
+
+# Hard caps on what a single sql_tool call may return to the model. By default the
+# character cap stays inside the compaction budget, leaving room for the last row and the summary.
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "200"))
+SQL_MAX_CHARS = int(os.getenv("SQL_MAX_CHARS", str(TOOL_OUTPUT_MAX_TOKENS * CHARS_PER_TOKEN - 2000)))
+# When a result is capped, summarize the full result set with an aggregate query.
+SQL_AUTO_AGGREGATE = os.getenv("SQL_AUTO_AGGREGATE", "true").lower() == "true"
+
+# Postgres type OIDs that get SUM/AVG (numeric) or MIN/MAX (temporal) in aggregate summaries
+NUMERIC_TYPE_OIDS = {20, 21, 23, 700, 701, 1700}
+TEMPORAL_TYPE_OIDS = {1082, 1114, 1184}
+
+news_cache = TTLCache(
+    "news",
+    ttl=NEWS_CACHE_TTL,
+    backend=make_backend("news", NEWS_CACHE_BACKEND, NEWS_CACHE_MAX_ENTRIES),
+)
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+async def _summarize_result(query: str, columns) -> str:
+    """
+    Describes the full (uncapped) result: total row count plus per-column
+    aggregates. Falls back to the count alone if the aggregate query fails.
+    """
+    selects = ["COUNT(*)"]
+    labels = []
+    if SQL_AUTO_AGGREGATE:
+        for column in columns:
+            name = _quote_ident(column.name)
+            if column.name == "id" or column.name.endswith("_id"):
+                continue
+            if column.type_code in NUMERIC_TYPE_OIDS:
+                selects += [f"SUM({name})", f"MIN({name})", f"MAX({name})", f"AVG({name})"]
+                labels.append((column.name, ("sum", "min", "max", "avg")))
+            elif column.type_code in TEMPORAL_TYPE_OIDS:
+                selects += [f"MIN({name})", f"MAX({name})"]
+                labels.append((column.name, ("min", "max")))
+
+    for select_list, column_labels in ((selects, labels), (["COUNT(*)"], [])):
+        try:
+            async with db.server_cursor(f"SELECT {', '.join(select_list)} FROM ({query}) AS sub") as cur:
+                row = await cur.fetchone()
+        except Exception:
+            continue
+        parts = [f"{row[0]} total rows"]
+        position = 1
+        for name, stats in column_labels:
+            values = []
+            for stat in stats:
+                value = row[position]
+                position += 1
+                if stat == "avg" and value is not None:
+                    value = round(float(value), 2)
+                values.append(f"{stat}={value}")
+            parts.append(f"{name}: {', '.join(values)}")
+        return "; ".join(parts)
+    return "total row count unavailable"
+
 @tool
-def sql_tool(query: str) -> str:
+async def sql_tool(query: str) -> str:
     """
     Executes a read-only SQL query on the PostgreSQL database to find suppliers or shipments.
     Useful for finding suppliers by country, category, or checking shipment status.
     The available tables are:
     - suppliers (id, name, country, category, risk_tolerance_score)
     - shipments (id, supplier_id, value_usd, status, due_date)
+    Results are returned as CSV (header first). Large results are capped and summarized,
+    so prefer aggregate queries (COUNT, SUM, GROUP BY) over selecting every row.
     """
     try:
         # Basic safety check to prevent modification
         if not query.strip().lower().startswith("select"):
             return "Error: Only SELECT queries are allowed."
 
-        conn = psycopg2.connect(
-            host=os.getenv("POSTGRES_HOST"),
-            database=os.getenv("POSTGRES_DB"),
-            user=os.getenv("POSTGRES_USER"),
-            password=os.getenv("POSTGRES_PASSWORD"),
-            port=os.getenv("POSTGRES_PORT")
-        )
-        cur = conn.cursor()
-        cur.execute(query)
-        results = cur.fetchall()
-        
-        # Get column names
-        colnames = [desc[0] for desc in cur.description]
-        
-        cur.close()
-        conn.close()
-        
-        # Format results as a list of dictionaries
-        formatted_results = []
-        for row in results:
-            formatted_results.append(dict(zip(colnames, row)))
-            
-        return str(formatted_results)
+        query = query.strip().rstrip(";")
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        row_count = 0
+        truncated = False
+
+        # Rows are streamed from a server-side cursor and encoded as they arrive,
+        # so memory stays bounded no matter how large the table is.
+        async with db.server_cursor(query) as cur:
+            columns = cur.description
+            writer.writerow([column.name for column in columns])
+            async for row in cur:
+                if row_count >= SQL_MAX_ROWS or buffer.tell() >= SQL_MAX_CHARS:
+                    truncated = True
+                    break
+                writer.writerow(["" if value is None else value for value in row])
+                row_count += 1
+
+        if not truncated:
+            return f"{buffer.getvalue()}({row_count} rows)"
+
+        summary = await _summarize_result(query, columns)
+        return f"{buffer.getvalue()}[truncated: showing first {row_count} rows; {summary}]"
         
     except Exception as e:
         return f"Database Error: {e}"
 
+async def _fetch_news(query: str, api_key: str) -> str:
+    """
+    Calls NewsAPI and formats the articles. Raises on API errors so they are never cached.
+    The articles are added to the local index so later lookups can be answered from it.
+    """
+    articles = await news_index.fetch_articles(query, api_key)
+    try:
+        await asyncio.to_thread(news_index.remember, query, articles)
+    except Exception as e:
+        print(f"Warning: could not index news for '{query}': {e}")
+    return news_index.format_articles(articles)
+
+async def search_news(query: str, api_key: str, with_freshness: bool = False) -> str:
+    """
+    News lookup answered from the local index when it covers the query, otherwise
+    from NewsAPI through the cache; identical concurrent lookups share a single
+    upstream request. `with_freshness` appends when the index was last pulled.
+    """
+    try:
+        found = await news_index.search(query)
+    except Exception as e:
+        print(f"Warning: news index lookup failed: {e}")
+        found = None
+    if found is not None:
+        text = news_index.format_articles(found.articles)
+        return f"{text}\n\n{news_index.freshness(found)}" if with_freshness else text
+    return await news_cache.aget_or_load(normalize_key(query), lambda: _fetch_news(query, api_key))
+
 @tool
-def news_tool(query: str) -> str:
+async def news_tool(query: str) -> str:
     """
-    Fetches live news articles from NewsAPI.org based on a search query.
+    Fetches recent news articles based on a search query, from a local index of
+    NewsAPI.org articles that is refreshed periodically, or live when the index
+    doesn't cover the query.
     Useful for finding events like typhoons, strikes, or political unrest in specific countries.
     """
     api_key = os.getenv("NEWS_API_KEY")
     if not api_key:
         return "Error: NEWS_API_KEY not found."
         
-    url = f"https://newsapi.org/v2/everything?q={query}&sortBy=publishedAt&apiKey={api_key}&language=en&pageSize=5"
-    
     try:
-        response = requests.get(url)
-        data = response.json()
-        
-        if data.get("status") != "ok":
-            return f"NewsAPI Error: {data.get('message')}"
-            
-        articles = data.get("articles", [])
-        if not articles:
-            return "No news found."
-            
-        results = []
-        for article in articles:
-            results.append(f"Title: {article['title']}\nSource: {article['source']['name']}\nDescription: {article['description']}\nURL: {article['url']}")
-            
-        return "\n\n".join(results)
+        return await search_news(query, api_key, with_freshness=True)
         
+    except ValueError as e:
+        return str(e)
     except Exception as e:
         return f"Error fetching news: {e}"
 
 @tool
-def fx_tool(base_currency: str = "USD", target_currency: str = "JPY") -> str:
+async def fx_tool(base_currency: str = "USD", target_currency: str = "JPY", pairs: str = "") -> str:
     """
     Fetches the current exchange rate between two currencies.
     Useful for checking financial risks related to currency fluctuations.
+    `target_currency` may be a comma-separated list (e.g. "JPY,TWD,UAH"), and
+    `pairs` can request arbitrary cross rates in the same call (e.g. "JPY/TWD, EUR/USD").
     """
     api_key = os.getenv("EXCHANGE_RATE_API_KEY")
     if not api_key:
         return "Error: EXCHANGE_RATE_API_KEY not found."
         
-    url = f"https://v6.exchangerate-api.com/v6/{api_key}/latest/{base_currency}"
-    
     try:
-        response = requests.get(url)
-        data = response.json()
+        # One cached table answers every pair; cross rates are derived locally
+        snapshot = await fx.get_snapshot(api_key)
         
-        if data.get("result") != "success":
-            return f"FX API Error: {data.get('error-type')}"
-            
-        rates = data.get("conversion_rates", {})
-        rate = rates.get(target_currency)
+        results = []
+        for base, target in fx.parse_pairs(base_currency, target_currency, pairs):
+            rate = fx.cross_rate(snapshot, base, target)
+            if rate:
+                results.append(f"1 {base} = {round(rate, 6)} {target}")
+            else:
+                results.append(f"Rate for {base}/{target} not found.")
         
-        if rate:
-            return f"1 {base_currency} = {rate} {target_currency}"
-        else:
-            return f"Rate for {target_currency} not found."
+        if not results:
+            return "No currency pairs requested."
+        
+        age_minutes = int((time.time() - snapshot["fetched_at"]) // 60)
+        results.append(f"(Rates as of {age_minutes} min ago)")
+        return "\n".join(results)
             
+    except ValueError as e:
+        return str(e)
     except Exception as e:
         return f"Error fetching exchange rate: {e}"
+
+@tool
+async def contract_search(query: str, supplier_ids: str = "", country: str = "") -> str:
+    """
+    Searches supplier contracts for relevant clauses (price renegotiation thresholds,
+    force majeure, penalties, termination terms).
+    `supplier_ids` is a comma-separated list of supplier ids (e.g. "3,7,12"), usually
+    taken from sql_tool results; each listed supplier gets its own best-matching clauses.
+    `country` restricts the search to contracts for suppliers in that country.
+    """
+    try:
+        ids = [int(part) for part in supplier_ids.replace(" ", "").split(",") if part]
+    except ValueError:
+        return "Error: supplier_ids must be a comma-separated list of integers."
+
+    try:
+        if ids and not country:
+            by_supplier = await contracts.search_contracts_by_supplier(query, ids)
+            clauses = [clause for found in by_supplier.values() for clause in found]
+        else:
+            clauses = await contracts.search_contracts(query, ids, [country] if country else [])
+    except Exception as e:
+        return f"Error searching contracts: {e}"
+
+    if not clauses:
+        return "No matching contract clauses found."
+    return contracts.format_clauses(clauses)
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from src.cache import TTLCache
+
+
+def test_leader_timeout_does_not_cancel_followers():
+    cache = TTLCache("test_leader_timeout", ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "value"
+
+    async def main():
+        leader = asyncio.create_task(asyncio.wait_for(cache.aget_or_load("key", loader), timeout=0.05))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(asyncio.wait_for(cache.aget_or_load("key", loader), timeout=1))
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        assert await follower == "value"
+
+    asyncio.run(main())
+    assert len(calls) == 1
+    assert cache.stats.coalesced == 1
+
+
+def test_cancelled_load_hands_over_to_a_follower():
+    cache = TTLCache("test_cancelled_load", ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        if len(calls) == 1:
+            # Cancels the shared load itself, not just the leader waiting on it
+            next(iter(cache._loads)).cancel()
+            await asyncio.sleep(1)
+        return "value"
+
+    async def main():
+        leader = asyncio.create_task(cache.aget_or_load("key", loader))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.aget_or_load("key", loader))
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await follower == "value"
+
+    asyncio.run(main())
+    assert len(calls) == 2
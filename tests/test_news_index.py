@@ -0,0 +1,36 @@
+import asyncio
+
+from src import news_index
+
+
+def test_failed_pull_backs_off(tmp_path, monkeypatch):
+    monkeypatch.setattr(news_index, "_index", news_index.NewsIndex(str(tmp_path / "news.sqlite")))
+    monkeypatch.setattr(news_index, "_failed_at", {})
+    monkeypatch.setattr(news_index, "_pull_lock", None)
+    now = [1_000_000.0]
+    monkeypatch.setattr(news_index.time, "time", lambda: now[0])
+    calls = []
+
+    async def fetch_articles(query, api_key, page_size=news_index.NEWS_RESULTS):
+        calls.append(query)
+        if len(calls) == 1:
+            raise ValueError("NewsAPI Error: rateLimited")
+        return []
+
+    monkeypatch.setattr(news_index, "fetch_articles", fetch_articles)
+
+    async def refresh():
+        return await news_index.refresh(["Japan"], api_key="key")
+
+    asyncio.run(refresh())
+    assert len(calls) == 1
+
+    # Within the backoff the failed country is not pulled again
+    now[0] += news_index.NEWS_INDEX_PULL_BACKOFF / 2
+    asyncio.run(refresh())
+    assert len(calls) == 1
+
+    now[0] += news_index.NEWS_INDEX_PULL_BACKOFF
+    asyncio.run(refresh())
+    assert len(calls) == 2
+    assert "Japan" not in news_index._failed_at